@@ -8,7 +8,7 @@ import pathlib
 import typing as ty
 import collections
 from enum import Enum
-from voluptuous import Schema
+from voluptuous import Required, Schema
 
 import yaml
 
@@ -27,18 +27,43 @@ class ConfigActions(Enum):
 class Config(collections.abc.MutableMapping):
     """Configuration of aiida-testing package."""
 
-    schema = Schema({'mock_code': Schema({str: str})})
-
-    def __init__(self, config=None):
+    schema = Schema({
+        'mock_code': {
+            str: str
+        },
+        'mock_code_concurrency': {
+            'capacity': int,
+            'weights': {
+                str: int
+            }
+        },
+        'mock_code_hash_rules': {
+            str: {
+                'substitutions': [{
+                    Required('pattern'): str,
+                    'replacement': str,
+                    'files': [str]
+                }],
+                'drop_lines': [{
+                    Required('pattern'): str,
+                    'files': [str]
+                }],
+                'name_only': [str],
+                'exclude': [str],
+            }
+        },
+    })
+
+    def __init__(self, config: ty.Optional[ty.Dict[str, ty.Any]] = None) -> None:
         self._dict = config or {}
         self.validate()
 
-    def validate(self):
+    def validate(self) -> ty.Any:
         """Validate configuration dictionary."""
         return self.schema(self._dict)
 
     @classmethod
-    def from_file(cls):
+    def from_file(cls) -> 'Config':
         """
         Parses the configuration file ``.aiida-testing-config.yml``.
 
@@ -46,7 +71,7 @@ class Config(collections.abc.MutableMapping):
         directories.
         """
         cwd = pathlib.Path(os.getcwd())
-        config: ty.Dict[str, str]
+        config: ty.Dict[str, ty.Any]
         for dir_path in [cwd, *cwd.parents]:
             config_file_path = (dir_path / CONFIG_FILE_NAME)
             if config_file_path.exists():
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the ``aiida-mock-code`` executable.
+
+This package is kept separate from :mod:`aiida_testing.mock_code`, whose
+fixtures import ``pytest`` and the AiiDA ORM, and may only import modules
+from the standard library, such that the executable starts quickly.
+"""
+
+import logging
+
+# The standard output and error of the executable are outputs of the
+# calculation, so messages are only logged if a log file is configured.
+logging.getLogger(__name__).addHandler(logging.NullHandler())
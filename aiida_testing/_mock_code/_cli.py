@@ -0,0 +1,950 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Implements the executable for running a mock AiiDA code.
+"""
+
+import os
+import sys
+import json
+import stat
+import shutil
+import hashlib
+import subprocess
+import typing as ty
+import time
+import logging
+import functools
+import contextlib
+from pathlib import Path
+
+from ._env_keys import EnvKeys
+from ._digest_cache import DigestCache
+from ._storage import (
+    StorageLayout, ObjectStore, MANIFEST_FILE, INPUTS_DIR, OBJECT_HASH_ALGORITHM, read_manifest,
+    write_manifest, store_file, get_temporary_dir, remove_temporary_dirs, verify_result_dir,
+    quarantine_result_dir
+)
+from ._transfer import RestoreMode, RestoreError, transfer_file, create_dirs, run_transfers
+from ._pack import PackFile
+from ._index import EntryIndex, get_entry_size
+from ._matching import PathMatcher
+from ._hash_rules import HashRules
+from ._hashing import (
+    SUBMIT_FILE, LEGACY_HASH_ALGORITHM, split_hash_algorithm, get_hash, iter_input_files,
+    strip_submit_content
+)
+from ._locking import EntryLock, LockTimeoutError, DEFAULT_LOCK_TIMEOUT
+from ._limiter import ExecutionSlots
+from ._warm import queue_missing_result
+from ._timing import PhaseTimer, get_children_cpu_time
+
+#: Path of the file describing the calculation in the working directory, written by AiiDA.
+CALCINFO_FILE = '.aiida/calcinfo.json'
+
+LOGGER = logging.getLogger(__name__)
+
+
+def main(argv: ty.Optional[ty.List[str]] = None) -> None:
+    """
+    Run the ``aiida-mock-code`` executable, unless its run was delegated to
+    the mock code server, see :func:`aiida_testing._mock_code._main.main`.
+
+    When called from an AiiDA submit script (i.e. the mock code
+    environment variables are set), the mock code is run and all
+    command line arguments are those of the actual code. Otherwise,
+    the command line arguments select a maintenance command for
+    data directories.
+    """
+    if EnvKeys.LABEL.value in os.environ:
+        run()
+        return
+
+    # imported here to keep the start-up time of the executable low
+    from ._commands import run_command  # pylint: disable=import-outside-toplevel,cyclic-import
+    run_command(argv)
+
+
+def run() -> None:
+    """
+    Run the mock AiiDA code. If the corresponding result exists, it is
+    simply copied over to the current working directory. Otherwise,
+    the code will replace the executable in the aiidasubmit file,
+    launch the "real" code, and then copy the results into the data
+    directory.
+
+    If the ``AIIDA_MOCK_TIMINGS_FILE`` environment variable is set, the
+    time spent in each phase of the run is appended to that file.
+    """
+    timer = PhaseTimer()
+    try:
+        _run(timer)
+    finally:
+        timings_file = os.environ.get(EnvKeys.TIMINGS_FILE.value)
+        if timings_file:
+            try:
+                timer.write(timings_file)
+            except OSError as exc:
+                LOGGER.warning("Could not write the timings to '%s': %s", timings_file, exc)
+
+
+class RunSettings(ty.NamedTuple):
+    """
+    Settings of a run of the mock code, as exported by the submit script.
+    """
+    label: str
+    data_dir: Path
+    executable_path: str
+    ignore_files: ty.List[str]
+    ignore_paths: ty.List[str]
+    regenerate_data: bool
+    hash_algorithm: str
+    digest_cache_path: ty.Optional[str]
+    storage_layout: StorageLayout
+    restore_mode: RestoreMode
+    use_index: bool
+    transfer_workers: int
+    lock_timeout: float
+    verify_results: bool
+    concurrency_capacity: int
+    concurrency_weight: int
+    queue_misses: bool
+    store_inputs: bool
+    retrieve_patterns: ty.Optional[ty.List[str]]
+    hash_rules: ty.Optional[HashRules]
+    #: configuration of the hash rules, stored with the inputs of recorded results
+    hash_rules_config: ty.Optional[ty.Dict[str, ty.Any]]
+    hash_workers: int
+    record_runtime: bool
+
+    @classmethod
+    def from_env(cls, env: ty.Mapping[str, str], work_dir: Path) -> 'RunSettings':
+        """
+        Read the settings from the environment variables of the mock code.
+
+        :param env: Environment variables of the mock code.
+        :param work_dir: Working directory of the calculation.
+        """
+        hash_rules_json = env.get(EnvKeys.HASH_RULES.value)
+        hash_rules_config = json.loads(hash_rules_json) if hash_rules_json else None
+        return cls(
+            label=env[EnvKeys.LABEL.value],
+            data_dir=Path(env[EnvKeys.DATA_DIR.value]),
+            executable_path=env[EnvKeys.EXECUTABLE_PATH.value],
+            ignore_files=env[EnvKeys.IGNORE_FILES.value].split(':'),
+            ignore_paths=env[EnvKeys.IGNORE_PATHS.value].split(':'),
+            regenerate_data=env[EnvKeys.REGENERATE_DATA.value] == 'True',
+            hash_algorithm=env.get(EnvKeys.HASH_ALGORITHM.value) or LEGACY_HASH_ALGORITHM,
+            digest_cache_path=env.get(EnvKeys.DIGEST_CACHE.value),
+            storage_layout=StorageLayout(
+                env.get(EnvKeys.STORAGE_LAYOUT.value) or StorageLayout.DIRECTORY.value
+            ),
+            restore_mode=RestoreMode(env.get(EnvKeys.RESTORE_MODE.value) or RestoreMode.COPY.value),
+            use_index=env.get(EnvKeys.INDEX.value) == 'True',
+            transfer_workers=int(env.get(EnvKeys.TRANSFER_WORKERS.value) or 1),
+            lock_timeout=float(env.get(EnvKeys.LOCK_TIMEOUT.value) or DEFAULT_LOCK_TIMEOUT),
+            verify_results=env.get(EnvKeys.VERIFY_RESULTS.value) == 'True',
+            concurrency_capacity=int(env.get(EnvKeys.CONCURRENCY_CAPACITY.value) or 0),
+            concurrency_weight=int(env.get(EnvKeys.CONCURRENCY_WEIGHT.value) or 1),
+            queue_misses=env.get(EnvKeys.QUEUE_MISSES.value) == 'True',
+            store_inputs=env.get(EnvKeys.STORE_INPUTS.value) == 'True',
+            retrieve_patterns=get_retrieve_patterns(env, work_dir),
+            hash_rules=HashRules(**hash_rules_config) if hash_rules_config else None,
+            hash_rules_config=hash_rules_config,
+            hash_workers=int(env.get(EnvKeys.HASH_WORKERS.value) or 1),
+            record_runtime=env.get(EnvKeys.RECORD_RUNTIME.value) == 'True',
+        )
+
+
+def _run(timer: PhaseTimer) -> None:
+    """
+    Run the mock AiiDA code, see :func:`run`.
+
+    :param timer: Timer of the phases of the run.
+    """
+    with timer.phase('env'):
+        settings = RunSettings.from_env(os.environ, Path('.'))
+        configure_logging(os.environ.get(EnvKeys.LOG_FILE.value))
+    timer.info['label'] = settings.label
+    timer.info['regenerate'] = settings.regenerate_data
+
+    # the digests of the input files are stored with a recorded result
+    input_digests: ty.Dict[str, str] = {}
+    with timer.phase('lookup'):
+        pack = PackFile.open(settings.data_dir)
+        index = EntryIndex(settings.data_dir) if settings.use_index else None
+        res_dir = _lookup_result_dir(settings, pack, index, timer, input_digests)
+    timer.info['entry_name'] = res_dir.name
+
+    if settings.verify_results and not settings.regenerate_data and res_dir.is_dir():
+        _quarantine_incomplete_result(res_dir, index, timer)
+
+    regenerate_data = settings.regenerate_data
+    lock = None
+    if regenerate_data or not (res_dir.exists() or (pack is not None and res_dir.name in pack)):
+        # only one process records a result, the others wait and then use it
+        lock = EntryLock(
+            settings.data_dir,
+            res_dir.name,
+            timeout=settings.lock_timeout if settings.lock_timeout > 0 else None
+        )
+        if _acquire_lock(lock, timer) and res_dir.exists():
+            LOGGER.info("Using '%s', which was recorded by another process.", res_dir.name)
+            regenerate_data = False
+
+    try:
+        if regenerate_data and (res_dir.exists() or res_dir.is_symlink()):
+            if res_dir.is_symlink():
+                res_dir.unlink()
+            else:
+                shutil.rmtree(res_dir)
+
+        # result directories take precedence over (and replace, when regenerating) packed results
+        if pack is not None and (regenerate_data or res_dir.exists() or res_dir.name not in pack):
+            pack.close()
+            pack = None
+
+        if not res_dir.exists() and pack is None:
+            _record_result(settings, res_dir, index, timer, input_digests)
+        else:
+            _restore_result(settings, res_dir, pack, index, timer)
+    finally:
+        if lock is not None:
+            lock.release()
+
+    if index is not None:
+        index.close()
+
+
+def _quarantine_incomplete_result(
+    res_dir: Path, index: ty.Optional[EntryIndex], timer: PhaseTimer
+) -> None:
+    """
+    Verify a result directory against its manifest, and quarantine it if it is incomplete.
+    """
+    with timer.phase('verify'):
+        problems = verify_result_dir(res_dir)
+    if problems:
+        LOGGER.warning(
+            "Quarantining incomplete result '%s': %s.", res_dir.name, ', '.join(problems)
+        )
+        quarantine_result_dir(res_dir)
+        if index is not None:
+            index.remove(res_dir.name)
+
+
+def _acquire_lock(lock: EntryLock, timer: PhaseTimer) -> bool:
+    """
+    Acquire the lock of a result, and exit if it is not acquired within its timeout.
+
+    :return: Whether the lock was held by another process, see :meth:`.EntryLock.acquire`.
+    """
+    try:
+        with timer.phase('lock'):
+            return lock.acquire()
+    except LockTimeoutError as exc:
+        timer.info['outcome'] = 'timeout'
+        sys.exit(str(exc))
+
+
+def _lookup_result_dir(
+    settings: RunSettings, pack: ty.Optional[PackFile], index: ty.Optional[EntryIndex],
+    timer: PhaseTimer, input_digests: ty.Dict[str, str]
+) -> Path:
+    """
+    Get the result directory for the inputs in the current working directory, see
+    :func:`find_result_dir`, using the digest cache of the mock code if configured.
+    """
+    with DigestCache(settings.digest_cache_path
+                     ) if settings.digest_cache_path else _null_context() as digest_cache:
+        return find_result_dir(
+            data_dir=settings.data_dir,
+            label=settings.label,
+            hash_algorithm=settings.hash_algorithm,
+            allow_legacy=not settings.regenerate_data,
+            digest_cache=digest_cache,
+            pack=pack,
+            index=index,
+            timer=timer,
+            hash_rules=settings.hash_rules,
+            hash_workers=settings.hash_workers,
+            input_digests=input_digests
+        )
+
+
+def _restore_result(
+    settings: RunSettings, res_dir: Path, pack: ty.Optional[PackFile],
+    index: ty.Optional[EntryIndex], timer: PhaseTimer
+) -> None:
+    """
+    Restore an existing result to the current working directory, see
+    :func:`restore_result`, and exit if it can not be restored.
+    """
+    try:
+        restore_result(
+            res_dir=res_dir,
+            dest_dir=Path('.'),
+            label=settings.label,
+            restore_mode=settings.restore_mode,
+            pack=pack,
+            index=index,
+            max_workers=settings.transfer_workers,
+            timer=timer,
+            retrieve_patterns=settings.retrieve_patterns
+        )
+    except RestoreError as exc:
+        sys.exit(str(exc))
+
+
+def _record_result(
+    settings: RunSettings, res_dir: Path, index: ty.Optional[EntryIndex], timer: PhaseTimer,
+    input_digests: ty.Dict[str, str]
+) -> None:
+    """
+    Run the actual code in the current working directory, and publish its
+    outputs as the result directory.
+
+    The outputs are backed up to a temporary directory, which is published
+    by renaming it once all files and the manifest are written.
+
+    :param settings: Settings of the mock code.
+    :param res_dir: Result directory in the data directory.
+    :param index: If given, the result is recorded in this index.
+    :param timer: Timer of the phases of the run.
+    :param input_digests: Digests of the input files, which are stored in the manifest.
+    """
+    executable_path = settings.executable_path
+    if settings.queue_misses and not (executable_path and shutil.which(executable_path)):
+        queue_missing_result(res_dir, Path('.'))
+        timer.info['outcome'] = 'queued'
+        sys.exit(
+            "No existing output, and no executable specified. The inputs were queued, "
+            "use 'aiida-mock-code warm' to record them."
+        )
+    if not executable_path:
+        timer.info['outcome'] = 'missing'
+        sys.exit(
+            "No existing output, and no executable specified. Use 'aiida-mock-code "
+            f"explain-miss {os.getcwd()}' to compare the inputs to the existing results."
+        )
+
+    for path in remove_temporary_dirs(res_dir):
+        LOGGER.info("Removed '%s' left behind by an interrupted recording.", path.name)
+    tmp_dir = get_temporary_dir(res_dir)
+    try:
+        metadata = _store_inputs(settings, tmp_dir, timer, input_digests)
+
+        # replace executable path in submit file and run calculation
+        LOGGER.info("Recording '%s' by running '%s'.", res_dir.name, executable_path)
+        replace_submit_file(executable_path=executable_path)
+        runtime = _execute(settings, timer)
+        if settings.record_runtime:
+            metadata['runtime'] = runtime
+        if settings.retrieve_patterns is not None:
+            metadata['retrieve'] = settings.retrieve_patterns
+
+        with timer.phase('store'):
+            copy_files(
+                src_dir=Path('.'),
+                dest_dir=tmp_dir,
+                ignore_files=settings.ignore_files,
+                ignore_paths=settings.ignore_paths,
+                object_store=ObjectStore(settings.data_dir)
+                if settings.storage_layout == StorageLayout.CAS else None,
+                metadata=metadata,
+                max_workers=settings.transfer_workers,
+                retrieve_patterns=settings.retrieve_patterns
+            )
+            os.rename(tmp_dir, res_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    timer.info['outcome'] = 'recorded'
+    timer.info['bytes'] = get_entry_size(res_dir)
+    if index is not None:
+        index.record(
+            settings.label,
+            *split_result_dir_name(res_dir.name, settings.label),
+            entry_name=res_dir.name,
+            size=get_entry_size(res_dir),
+            runtime=runtime,
+            executable=executable_path
+        )
+
+
+def _store_inputs(
+    settings: RunSettings, tmp_dir: Path, timer: PhaseTimer, input_digests: ty.Dict[str, str]
+) -> ty.Dict[str, ty.Any]:
+    """
+    Store the inputs of a result being recorded, if configured, and get the
+    entries of its manifest describing them.
+    """
+    metadata: ty.Dict[str, ty.Any] = {}
+    if settings.store_inputs:
+        with timer.phase('store'):
+            input_files = store_input_files(
+                src_dir=Path('.'),
+                dest_dir=tmp_dir / INPUTS_DIR,
+                max_workers=settings.transfer_workers
+            )
+        metadata['inputs'] = {'label': settings.label, 'files': input_files}
+        if settings.hash_rules_config is not None:
+            # the keys of the stored inputs are computed with the same rules
+            metadata['inputs']['hash_rules'] = settings.hash_rules_config
+    metadata['input_digests'] = {
+        'algorithm': split_hash_algorithm(settings.hash_algorithm)[0],
+        'files': input_digests
+    }
+    return metadata
+
+
+def _execute(settings: RunSettings, timer: PhaseTimer) -> float:
+    """
+    Run the submit script of the actual code, and get its runtime in seconds.
+
+    The CPU time of the code is added to the information of the ``timer``.
+    """
+    # limit the number of cores used by actual codes running concurrently
+    with timer.phase('slots'):
+        slots = ExecutionSlots(settings.concurrency_capacity, weight=settings.concurrency_weight)
+        slots.acquire()
+    try:
+        with timer.phase('execute'):
+            start_time = time.monotonic()
+            cpu_time = get_children_cpu_time()
+            subprocess.call(['bash', SUBMIT_FILE])
+            runtime = time.monotonic() - start_time
+            timer.info['execute_cpu'] = get_children_cpu_time() - cpu_time
+    finally:
+        slots.release()
+    return runtime
+
+
+def restore_result(  # pylint: disable=too-many-arguments
+    res_dir: Path,
+    dest_dir: Path,
+    label: str,
+    restore_mode: RestoreMode = RestoreMode.COPY,
+    pack: ty.Optional[PackFile] = None,
+    index: ty.Optional[EntryIndex] = None,
+    max_workers: int = 1,
+    timer: ty.Optional[PhaseTimer] = None,
+    retrieve_patterns: ty.Optional[ty.List[str]] = None
+) -> None:
+    """
+    Restore an existing result to the destination directory, and record its use.
+
+    A warning is logged if the result only holds the files matching some retrieve
+    patterns, and these do not include all of the requested ``retrieve_patterns``.
+
+    :param res_dir: Result directory in the data directory.
+    :param dest_dir: Destination directory.
+    :param label: Label of the mock code.
+    :param restore_mode: How the files are transferred, see :class:`.RestoreMode`.
+    :param pack: If given, the result is extracted from this packfile, which is closed afterwards.
+    :param index: If given, the use of the result is recorded in this index.
+    :param max_workers: Maximum number of files transferred concurrently.
+    :param timer: If given, the restore is counted as its 'restore' phase, and the outcome,
+        size and recorded runtime are added to its information.
+    :param retrieve_patterns: If given, only the files matching these patterns are restored.
+    """
+    timer = timer or PhaseTimer()
+    LOGGER.info("Restoring '%s'.", res_dir.name)
+    if pack is not None:
+        stored_patterns = pack.get_retrieve_patterns(res_dir.name)
+    else:
+        stored_patterns = (read_manifest(res_dir) or {}).get('retrieve')
+    if stored_patterns is not None and (
+        retrieve_patterns is None or not set(retrieve_patterns) <= set(stored_patterns)
+    ):
+        LOGGER.warning(
+            "Result '%s' only holds the files matching %s, regenerate it to store more files.",
+            res_dir.name, ', '.join(stored_patterns)
+        )
+    with timer.phase('restore'):
+        restore_files(
+            res_dir=res_dir,
+            dest_dir=dest_dir,
+            restore_mode=restore_mode,
+            pack=pack,
+            max_workers=max_workers,
+            retrieve_patterns=retrieve_patterns
+        )
+    timer.info['outcome'] = 'restored'
+    if pack is not None:
+        timer.info['bytes'] = sum(
+            pack.get_object_info(file_info['digest'])['size']
+            for file_info in pack.get_files(res_dir.name).values()
+        )
+        timer.info['recorded_runtime'] = pack.get_runtime(res_dir.name)
+        pack.close()
+    else:
+        timer.info['bytes'] = get_entry_size(res_dir)
+        timer.info['recorded_runtime'] = (read_manifest(res_dir) or {}).get('runtime')
+    if index is not None:
+        index.hit(
+            label,
+            *split_result_dir_name(res_dir.name, label),
+            entry_name=res_dir.name,
+            res_dir=res_dir
+        )
+
+
+def get_retrieve_patterns(env: ty.Mapping[str, str], work_dir: Path) -> ty.Optional[ty.List[str]]:
+    """
+    Get the patterns of the output files which are recorded and restored,
+    or ``None`` if all output files are.
+
+    Unless the patterns are given explicitly, they are read from the
+    ``retrieve_list`` and ``retrieve_temporary_list`` of the calculation,
+    in which items ``[remote path, local path, depth]`` contribute their
+    remote path.
+
+    :param env: Environment variables of the mock code.
+    :param work_dir: Working directory of the calculation.
+    """
+    if env.get(EnvKeys.RETRIEVE_ONLY.value) != 'True':
+        return None
+    patterns = [
+        pattern for pattern in env.get(EnvKeys.RETRIEVE_PATTERNS.value, '').split(':') if pattern
+    ]
+    if patterns:
+        return patterns
+
+    try:
+        with open(work_dir / CALCINFO_FILE) as handle:
+            calcinfo = json.load(handle)
+    except FileNotFoundError:
+        LOGGER.warning(
+            "No '%s' in the working directory, all output files are used.", CALCINFO_FILE
+        )
+        return None
+    items = (calcinfo.get('retrieve_list') or []) + (calcinfo.get('retrieve_temporary_list') or [])
+    for item in items:
+        pattern = item if isinstance(item, str) else item[0]
+        if pattern not in patterns:
+            patterns.append(pattern)
+    return patterns
+
+
+def find_result_dir(  # pylint: disable=too-many-arguments
+    data_dir: Path,
+    label: str,
+    hash_algorithm: str,
+    allow_legacy: bool = True,
+    digest_cache: ty.Optional[DigestCache] = None,
+    pack: ty.Optional[PackFile] = None,
+    index: ty.Optional[EntryIndex] = None,
+    timer: ty.Optional[PhaseTimer] = None,
+    directory: Path = Path('.'),
+    hash_rules: ty.Optional[HashRules] = None,
+    hash_workers: int = 1,
+    input_digests: ty.Optional[ty.Dict[str, str]] = None
+) -> Path:
+    """
+    Get the result directory for the inputs in a directory.
+
+    The returned directory is named after the configured hash algorithm,
+    and does not necessarily exist. If it does not exist, but a directory
+    named after the legacy MD5 hash does, an alias to the legacy directory
+    is created such that subsequent lookups only need a single hashing pass.
+
+    :param data_dir: Directory containing the mock code results.
+    :param label: Label of the mock code.
+    :param hash_algorithm: Name of the hash algorithm used for new results.
+    :param allow_legacy: Whether to fall back to the legacy MD5 directory.
+    :param digest_cache: Cache for the digests of individual files.
+    :param pack: Packfile of the data directory. Results in the packfile are
+        found under the same name as the corresponding result directory.
+    :param index: Index of the data directory, which is consulted if no
+        result directory of the expected name exists.
+    :param timer: If given, the time spent hashing is counted as its 'hash' phase.
+    :param directory: Directory containing the inputs, by default the current working directory.
+    :param hash_rules: Rules normalizing or excluding input files.
+    :param hash_workers: Maximum number of files hashed concurrently with the per-file scheme.
+    :param input_digests: If given, the digests of the input files computed while hashing
+        with ``hash_algorithm`` are added to this dict, see :func:`get_hash`.
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase('hash'):
+        hash_digest = get_hash(
+            hash_algorithm=hash_algorithm,
+            digest_cache=digest_cache,
+            directory=directory,
+            hash_rules=hash_rules,
+            max_workers=hash_workers,
+            input_digests=input_digests
+        ).hexdigest()
+    res_dir = data_dir / get_result_dir_name(
+        label=label, hash_algorithm=hash_algorithm, hash_digest=hash_digest
+    )
+    if _result_exists(res_dir, pack) or not allow_legacy:
+        return res_dir
+
+    if index is not None:
+        entry_name = index.lookup(label, hash_algorithm, hash_digest)
+        if entry_name is not None and _result_exists(data_dir / entry_name, pack):
+            return data_dir / entry_name
+
+    if hash_algorithm == LEGACY_HASH_ALGORITHM:
+        return res_dir
+    return _find_legacy_result_dir(res_dir, label, pack, timer, directory, hash_rules)
+
+
+def _result_exists(res_dir: Path, pack: ty.Optional[PackFile]) -> bool:
+    """Check whether a result exists as a directory or in the packfile."""
+    return res_dir.exists() or (pack is not None and res_dir.name in pack)
+
+
+def _find_legacy_result_dir(  # pylint: disable=too-many-arguments
+    res_dir: Path, label: str, pack: ty.Optional[PackFile], timer: PhaseTimer, directory: Path,
+    hash_rules: ty.Optional[HashRules]
+) -> Path:
+    """
+    Get the result directory named after the legacy MD5 hash if it exists, and
+    create the alias ``res_dir`` to it, see :func:`find_result_dir`.
+    """
+    with timer.phase('hash'):
+        legacy_hash_digest = get_hash(
+            hash_algorithm=LEGACY_HASH_ALGORITHM, directory=directory, hash_rules=hash_rules
+        ).hexdigest()
+    legacy_res_dir = res_dir.parent / get_result_dir_name(
+        label=label, hash_algorithm=LEGACY_HASH_ALGORITHM, hash_digest=legacy_hash_digest
+    )
+    if pack is not None and not legacy_res_dir.is_dir() and legacy_res_dir.name in pack:
+        return legacy_res_dir
+    if legacy_res_dir.is_dir():
+        try:
+            res_dir.symlink_to(legacy_res_dir.name, target_is_directory=True)
+        except OSError:
+            # the alias is only an optimization, e.g. another process
+            # may have created it concurrently
+            return legacy_res_dir
+    return res_dir
+
+
+def get_result_dir_name(label: str, hash_algorithm: str, hash_digest: str) -> str:
+    """
+    Get the name of the result directory for a given label and hash.
+
+    For backwards compatibility, the hash algorithm is not part of the
+    name for MD5 hashes.
+    """
+    if hash_algorithm == LEGACY_HASH_ALGORITHM:
+        return f"mock-{label}-{hash_digest}"
+    return f"mock-{label}-{hash_algorithm}-{hash_digest}"
+
+
+def split_result_dir_name(name: str, label: str) -> ty.Tuple[str, str]:
+    """
+    Get the hash algorithm and digest from the name of a result directory,
+    the inverse of :func:`get_result_dir_name`.
+    """
+    prefix = f"mock-{label}-"
+    if not name.startswith(prefix):
+        raise ValueError(f"'{name}' is not a result directory for label '{label}'.")
+    hash_algorithm, _, hash_digest = name[len(prefix):].rpartition('-')
+    return hash_algorithm or LEGACY_HASH_ALGORITHM, hash_digest
+
+
+def configure_logging(log_file: ty.Optional[str]) -> None:
+    """
+    Append the log messages of the mock code executable to the given file.
+
+    :param log_file: Path of the log file. If empty or ``None``, nothing is logged.
+    """
+    if not log_file:
+        return
+    logger = logging.getLogger(__package__)
+    log_file = os.path.abspath(log_file)
+    if any(getattr(handler, 'baseFilename', None) == log_file for handler in logger.handlers):
+        return
+    handler = logging.FileHandler(log_file)
+    handler.setFormatter(
+        logging.Formatter('%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+    )
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+@contextlib.contextmanager
+def _null_context() -> ty.Iterator[None]:
+    yield None
+
+
+def replace_submit_file(executable_path: str) -> None:
+    """
+    Replace the executable specified in the AiiDA submit file, and
+    strip the AIIDA_MOCK environment variables.
+    """
+    with open(SUBMIT_FILE, 'r') as submit_file:
+        submit_file_content = submit_file.read()
+
+    submit_file_res_lines = []
+    for line in submit_file_content.splitlines():
+        if 'export AIIDA_MOCK' in line:
+            continue
+        if 'aiida-mock-code' in line:
+            submit_file_res_lines.append(
+                f"'{executable_path}' " + line.split("aiida-mock-code'")[1]
+            )
+        else:
+            submit_file_res_lines.append(line)
+    with open(SUBMIT_FILE, 'w') as submit_file:
+        submit_file.write('\n'.join(submit_file_res_lines))
+
+
+def restore_files(  # pylint: disable=too-many-arguments
+    res_dir: Path,
+    dest_dir: Path,
+    restore_mode: RestoreMode = RestoreMode.COPY,
+    pack: ty.Optional[PackFile] = None,
+    max_workers: int = 1,
+    retrieve_patterns: ty.Optional[ty.Iterable[str]] = None
+) -> None:
+    """Copy the stored outputs of a result directory to the destination directory.
+
+    :param res_dir: Result directory in the data directory
+    :param dest_dir: Destination directory
+    :param restore_mode: How the files are transferred, see :class:`.RestoreMode`.
+    :param pack: If given, the outputs are extracted from this packfile instead.
+    :param max_workers: Maximum number of files transferred concurrently.
+    :param retrieve_patterns: If given, only the files matching these patterns
+        (or in directories matching them) are restored.
+    :raises RestoreError: If the result directory contains a file which is not a regular file.
+    """
+    matcher = None
+    if retrieve_patterns is not None:
+        matcher = PathMatcher(ignore_files=(), ignore_paths=(), retrieve_paths=retrieve_patterns)
+
+    def _is_restored(name: str) -> bool:
+        return matcher is None or not matcher.is_excluded_file(name, name.rpartition('/')[2])
+
+    if pack is not None:
+        files = {
+            name: file_info
+            for name, file_info in pack.get_files(res_dir.name).items() if _is_restored(name)
+        }
+        _remove_top_level_dirs(dest_dir, files)
+        pack.extract(res_dir.name, dest_dir, max_workers=max_workers, names=files)
+        return
+
+    manifest = read_manifest(res_dir)
+    if manifest is not None and manifest.get('layout') == StorageLayout.CAS.value:
+        object_store = ObjectStore(res_dir.parent)
+        files = {
+            name: file_info
+            for name, file_info in manifest['files'].items() if _is_restored(name)
+        }
+        _remove_top_level_dirs(dest_dir, files)
+        create_dirs((dest_dir / name).parent for name in files)
+        tasks = [
+            functools.partial(
+                object_store.restore,
+                file_info['digest'],
+                dest_dir / name,
+                mode=file_info.get('mode'),
+                restore_mode=restore_mode
+            ) for name, file_info in files.items()
+        ]
+        run_transfers(tasks, max_workers=max_workers)
+        return
+
+    dirs_to_create, transfers = _get_restore_tasks(res_dir, dest_dir, restore_mode, matcher)
+    create_dirs(dirs_to_create)
+    run_transfers(transfers, max_workers=max_workers)
+
+
+def _get_restore_tasks(
+    res_dir: Path, dest_dir: Path, restore_mode: RestoreMode, matcher: ty.Optional[PathMatcher]
+) -> ty.Tuple[ty.List[Path], ty.List[ty.Callable[[], ty.Any]]]:
+    """
+    Get the directories to create and the transfers of the files which restore
+    a result directory with the directory layout, see :func:`restore_files`.
+
+    Subdirectories are restored including their empty directories, and
+    their files keep their metadata in the plain copy mode. Only the
+    directories of restored files are created when filtering them.
+    """
+    def _is_restored(name: str) -> bool:
+        return matcher is None or not matcher.is_excluded_file(name, name.rpartition('/')[2])
+
+    dirs_to_create = []
+    tasks: ty.List[ty.Callable[[], ty.Any]] = []
+    for path in sorted(res_dir.iterdir()):
+        if path.name in (MANIFEST_FILE, INPUTS_DIR):
+            continue
+        if path.is_dir():
+            if matcher is None:
+                shutil.rmtree(dest_dir / path.name, ignore_errors=True)
+            for relative_dir, filenames in _walk_result_subdir(path, res_dir):
+                if matcher is None:
+                    dirs_to_create.append(dest_dir / relative_dir)
+                else:
+                    filenames = [
+                        filename for filename in filenames
+                        if _is_restored(Path(relative_dir, filename).as_posix())
+                    ]
+                    if filenames:
+                        dirs_to_create.append(dest_dir / relative_dir)
+                tasks.extend(
+                    _get_subdir_transfer(
+                        res_dir / relative_dir / filename, dest_dir / relative_dir /
+                        filename, restore_mode
+                    ) for filename in filenames
+                )
+        elif path.is_file():
+            if not _is_restored(path.name):
+                continue
+            tasks.append(
+                functools.partial(
+                    transfer_file, path, dest_dir / path.name, restore_mode=restore_mode
+                )
+            )
+        else:
+            raise RestoreError(f"Can not copy '{path.name}'.")
+    return dirs_to_create, tasks
+
+
+def _get_subdir_transfer(src_path: Path, dest_path: Path,
+                         restore_mode: RestoreMode) -> ty.Callable[[], ty.Any]:
+    """Get the transfer of a file in a subdirectory, which keeps its metadata in the plain copy mode."""
+    if restore_mode == RestoreMode.COPY:
+        return functools.partial(shutil.copy2, src_path, dest_path)
+    return functools.partial(transfer_file, src_path, dest_path, restore_mode=restore_mode)
+
+
+def _walk_result_subdir(path: Path, res_dir: Path) -> ty.Iterator[ty.Tuple[str, ty.List[str]]]:
+    """Iterate over the directories in a subdirectory of a result directory, with their files, in sorted order."""
+    for dirpath, dirnames, filenames in os.walk(path, followlinks=True):
+        dirnames.sort()
+        yield os.path.relpath(dirpath, res_dir), sorted(filenames)
+
+
+def _remove_top_level_dirs(dest_dir: Path, files: ty.Iterable[str]) -> None:
+    """Remove the directories of the destination that are replaced by restored directories."""
+    for top_level_dir in {Path(name).parts[0] for name in files if len(Path(name).parts) > 1}:
+        shutil.rmtree(dest_dir / top_level_dir, ignore_errors=True)
+
+
+def copy_files(  # pylint: disable=too-many-arguments
+    src_dir: Path,
+    dest_dir: Path,
+    ignore_files: ty.Iterable[str],
+    ignore_paths: ty.Iterable[str],
+    object_store: ty.Optional[ObjectStore] = None,
+    metadata: ty.Optional[ty.Dict[str, ty.Any]] = None,
+    max_workers: int = 1,
+    retrieve_patterns: ty.Optional[ty.Iterable[str]] = None
+) -> None:
+    """Copy files from source to destination directory while ignoring certain files/folders.
+
+    The destination directory also contains a manifest listing the SHA-256 digest and permissions
+    of the copied files.
+
+    :param src_dir: Source directory
+    :param dest_dir: Destination directory
+    :param ignore_files: A list of file names (UNIX shell style patterns allowed) which are not copied to the
+        destination.
+    :param ignore_paths: A list of paths (UNIX shell style patterns allowed) which are not copied to the destination.
+    :param object_store: If given, the files are added to the object store instead, and the destination
+        directory only contains a manifest referencing them.
+    :param metadata: Additional entries of the manifest, e.g. the runtime of the actual code
+        or the description of the stored inputs.
+    :param max_workers: Maximum number of files copied concurrently.
+    :param retrieve_patterns: If given, only the files matching these patterns (or in directories
+        matching them) are copied, e.g. the ``retrieve_list`` of the calculation.
+    """
+    relative_file_paths = _list_output_files(
+        src_dir,
+        PathMatcher(
+            ignore_files=ignore_files, ignore_paths=ignore_paths, retrieve_paths=retrieve_patterns
+        )
+    )
+    if object_store is not None:
+        layout = StorageLayout.CAS
+        tasks = [
+            functools.partial(object_store.add, src_dir / relative_file_path)
+            for relative_file_path in relative_file_paths
+        ]
+    else:
+        layout = StorageLayout.DIRECTORY
+        create_dirs((dest_dir / relative_file_path).parent
+                    for relative_file_path in relative_file_paths)
+        tasks = [
+            functools.partial(
+                store_file, src_dir / relative_file_path, dest_dir / relative_file_path
+            ) for relative_file_path in relative_file_paths
+        ]
+    digests = run_transfers(tasks, max_workers=max_workers)
+
+    manifest_files = {
+        relative_file_path: {
+            'digest': digest,
+            'mode': stat.S_IMODE((src_dir / relative_file_path).stat().st_mode),
+        }
+        for relative_file_path, digest in zip(relative_file_paths, digests)
+    }
+    manifest = {**(metadata or {}), 'layout': layout.value, 'files': manifest_files}
+    os.makedirs(dest_dir, exist_ok=True)
+    write_manifest(dest_dir, manifest)
+
+
+def _list_output_files(src_dir: Path, matcher: PathMatcher) -> ty.List[str]:
+    """Get the relative POSIX paths of the files in a directory which are not excluded by the matcher."""
+    # A pattern such as '**' excludes the source directory itself.
+    walk: ty.Iterable[ty.Tuple[str, ty.List[str], ty.List[str]]]
+    walk = [] if matcher.is_excluded_dir('') else os.walk(src_dir)
+
+    relative_file_paths: ty.List[str] = []
+    for dirpath, dirnames, filenames in walk:
+        relative_dir = os.path.relpath(dirpath, src_dir)
+        prefix = '' if relative_dir == '.' else relative_dir.replace(os.sep, '/') + '/'
+
+        # Excluded directories are pruned, so their content is never listed.
+        dirnames[:] = sorted(
+            dirname for dirname in dirnames if not matcher.is_excluded_dir(prefix + dirname)
+        )
+        relative_file_paths.extend(
+            prefix + filename for filename in sorted(filenames)
+            if not matcher.is_excluded_file(prefix + filename, filename)
+        )
+    return relative_file_paths
+
+
+def store_input_files(src_dir: Path, dest_dir: Path, max_workers: int = 1) -> ty.Dict[str, ty.Any]:
+    """Copy the files which determine the key of a calculation, such that the key can be computed again.
+
+    As when hashing, the ``.aiida`` directory is skipped, and the submit file is stored normalized
+    by :func:`strip_submit_content`, i.e. without machine-specific paths.
+
+    :param src_dir: Working directory of the calculation, before running the actual code.
+    :param dest_dir: Destination directory
+    :param max_workers: Maximum number of files copied concurrently.
+    :return: The SHA-256 digest and permissions of the stored files, by relative path.
+    """
+    relative_file_paths = [path.relative_to(src_dir) for path in iter_input_files(src_dir)]
+    os.makedirs(dest_dir, exist_ok=True)
+    create_dirs((dest_dir / relative_file_path).parent
+                for relative_file_path in relative_file_paths)
+    tasks = [
+        functools.partial(
+            _store_submit_file if relative_file_path.name == SUBMIT_FILE else store_file,
+            src_dir / relative_file_path, dest_dir / relative_file_path
+        ) for relative_file_path in relative_file_paths
+    ]
+    digests = run_transfers(tasks, max_workers=max_workers)
+    return {
+        relative_file_path.as_posix(): {
+            'digest': digest,
+            'mode': stat.S_IMODE((src_dir / relative_file_path).stat().st_mode),
+        }
+        for relative_file_path, digest in zip(relative_file_paths, digests)
+    }
+
+
+def _store_submit_file(src: Path, dest: Path) -> str:
+    """Store the normalized content of a submit file, and return its SHA-256 digest."""
+    content = strip_submit_content(src.read_bytes())
+    dest.write_bytes(content)
+    return hashlib.new(OBJECT_HASH_ALGORITHM, content).hexdigest()
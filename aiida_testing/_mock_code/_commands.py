@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the maintenance commands of the ``aiida-mock-code`` executable,
+which manage data directories outside of calculations.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import typing as ty
+from pathlib import Path
+
+from ._env_keys import EnvKeys
+from ._storage import iter_temporary_dirs
+from ._pack import pack_data_dir, unpack_data_dir
+from ._index import EntryIndex
+from ._hash_rules import HashRules
+from ._hashing import SUBMIT_FILE
+from ._locking import EntryLock, LockTimeoutError
+from ._warm import get_pending_entries, warm_data_dir
+from ._rehash import rehash_data_dir, verify_data_dir
+from ._explain import explain_miss, format_explanation
+from ._in_process import read_submit_env
+
+__all__ = (
+    'run_command', 'get_parser', 'explain_entries', 'warm_entries', 'report_entries',
+    'prune_entries'
+)
+
+
+def run_command(argv: ty.Optional[ty.List[str]] = None) -> None:
+    """
+    Run the maintenance command selected by the command line arguments.
+
+    :param argv: Command line arguments, by default those of the process.
+    """
+    args = get_parser().parse_args(argv)
+
+    if args.command == 'pack':
+        entry_names = pack_data_dir(args.data_dir, keep=args.keep)
+        print(f"Packed {len(entry_names)} result directories.")
+    elif args.command == 'unpack':
+        entry_names = unpack_data_dir(args.data_dir, keep=args.keep)
+        print(f"Extracted {len(entry_names)} result directories.")
+    elif args.command == 'report':
+        report_entries(args.data_dir, label=args.label)
+    elif args.command == 'prune':
+        prune_entries(
+            args.data_dir, unused_days=args.unused_days, label=args.label, dry_run=args.dry_run
+        )
+    elif args.command == 'warm':
+        warm_entries(args.data_dir, jobs=args.jobs)
+    elif args.command == 'rehash':
+        renamed = rehash_data_dir(
+            args.data_dir,
+            hash_algorithm=args.hash_algorithm,
+            rename=args.rename,
+            max_workers=args.jobs
+        )
+        for entry_name, new_name in renamed.items():
+            print(f"{'Renamed' if args.rename else 'Aliased'} '{entry_name}' to '{new_name}'.")
+        print(f"Updated {len(renamed)} result directories.")
+    elif args.command == 'verify':
+        problems = verify_data_dir(args.data_dir, max_workers=args.jobs)
+        for entry_name, entry_problems in problems.items():
+            print(f"'{entry_name}': {', '.join(entry_problems)}.")
+        if problems:
+            sys.exit(1)
+    elif args.command == 'explain-miss':
+        explain_entries(
+            args.sandbox_dir, data_dir=args.data_dir, label=args.label, max_entries=args.entries
+        )
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Get the parser of the command line arguments of the maintenance commands."""
+    parser = argparse.ArgumentParser(
+        prog='aiida-mock-code', description='Maintenance commands for mock code data directories.'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    for command, help_text in (
+        ('pack', 'Pack the result directories of a data directory into a single packfile.'),
+        ('unpack', 'Extract the packfile of a data directory into result directories.'),
+    ):
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument('data_dir', type=Path, help='Path of the data directory.')
+        subparser.add_argument(
+            '--keep', action='store_true', help='Do not remove the converted files.'
+        )
+    subparser = subparsers.add_parser(
+        'report', help='List the indexed results of a data directory.'
+    )
+    subparser.add_argument('data_dir', type=Path, help='Path of the data directory.')
+    subparser.add_argument('--label', help='Only list results of this label.')
+    subparser = subparsers.add_parser(
+        'prune', help='Remove indexed results which have not been used for some time.'
+    )
+    subparser.add_argument('data_dir', type=Path, help='Path of the data directory.')
+    subparser.add_argument(
+        '--unused-days',
+        type=float,
+        required=True,
+        help='Remove results not used in this number of days.'
+    )
+    subparser.add_argument('--label', help='Only remove results of this label.')
+    subparser.add_argument(
+        '--dry-run', action='store_true', help='Only list the results which would be removed.'
+    )
+    subparser = subparsers.add_parser(
+        'warm',
+        help='Record the queued inputs of missing results, using the executables configured in '
+        '.aiida-testing-config.yml.'
+    )
+    subparser.add_argument('data_dir', type=Path, help='Path of the data directory.')
+    subparser.add_argument(
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Maximum number of codes running concurrently (default: number of CPUs).'
+    )
+    subparser = subparsers.add_parser(
+        'rehash',
+        help='Compute the keys of the results with stored inputs again, and alias or rename them '
+        'accordingly.'
+    )
+    subparser.add_argument('data_dir', type=Path, help='Path of the data directory.')
+    subparser.add_argument(
+        '--hash-algorithm',
+        help='Hash algorithm of the new keys (default: the hash algorithm of each result).'
+    )
+    subparser.add_argument(
+        '--rename',
+        action='store_true',
+        help='Rename the result directories, instead of creating aliases.'
+    )
+    subparser.add_argument(
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes computing keys (default: number of CPUs).'
+    )
+    subparser = subparsers.add_parser(
+        'verify',
+        help='Check the stored files of the results against their manifests, and their names '
+        'against the keys of their stored inputs.'
+    )
+    subparser.add_argument('data_dir', type=Path, help='Path of the data directory.')
+    subparser.add_argument(
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes verifying results (default: number of CPUs).'
+    )
+    subparser = subparsers.add_parser(
+        'explain-miss',
+        help='Compare the inputs of a calculation whose result is missing to those of the nearest '
+        'existing results of its mock code.'
+    )
+    subparser.add_argument(
+        'sandbox_dir', type=Path, help='Path of the working directory of the calculation.'
+    )
+    subparser.add_argument(
+        '--data-dir',
+        type=Path,
+        help='Path of the data directory (default: as in the submit script of the calculation).'
+    )
+    subparser.add_argument(
+        '--label',
+        help='Label of the mock code (default: as in the submit script of the calculation).'
+    )
+    subparser.add_argument(
+        '--entries', type=int, default=3, help='Number of results listed (default: 3).'
+    )
+    return parser
+
+
+def explain_entries(
+    sandbox_dir: Path,
+    data_dir: ty.Optional[Path] = None,
+    label: ty.Optional[str] = None,
+    max_entries: int = 3
+) -> None:
+    """
+    Print the differences between the inputs of a calculation and the nearest existing results.
+
+    The data directory and label default to those exported by the submit script
+    of the calculation, whose hash rules are applied to the inputs.
+    """
+    submit_file = sandbox_dir / SUBMIT_FILE
+    env = read_submit_env(submit_file) if submit_file.is_file() else {}
+    if data_dir is None or label is None:
+        if EnvKeys.LABEL.value not in env:
+            sys.exit(
+                f"'{submit_file}' does not run a mock code, specify the data directory and label."
+            )
+        data_dir = data_dir or Path(env[EnvKeys.DATA_DIR.value])
+        label = label or env[EnvKeys.LABEL.value]
+
+    comparisons = explain_miss(
+        sandbox_dir,
+        data_dir,
+        label,
+        max_entries=max_entries,
+        hash_rules=HashRules.from_json(env.get(EnvKeys.HASH_RULES.value))
+    )
+    if not comparisons:
+        print(f"No results of '{label}' with known input files in '{data_dir}'.")
+        return
+    print(f"Nearest results of '{label}' in '{data_dir}':")
+    print(format_explanation(comparisons))
+
+
+def warm_entries(data_dir: Path, jobs: int = 1) -> None:
+    """
+    Record the queued inputs of a data directory, and print the outcome.
+
+    The executables are read from the ``.aiida-testing-config.yml`` in
+    the current working directory or one of its parents.
+    """
+    # only maintenance commands may import the configuration, which needs yaml
+    from .._config import Config  # pylint: disable=import-outside-toplevel
+
+    executables = {
+        label: path
+        for label, path in Config.from_file().get('mock_code', {}).items()
+        if path and shutil.which(path)
+    }
+    for entry in get_pending_entries(data_dir):
+        if entry['env'][EnvKeys.LABEL.value] not in executables:
+            print(
+                f"Skipping '{entry['entry_name']}': no executable configured for "
+                f"'{entry['env'][EnvKeys.LABEL.value]}'."
+            )
+    results = warm_data_dir(data_dir, executables=executables, max_workers=jobs)
+    for entry_name, error in results.items():
+        print(f"Failed to record '{entry_name}': {error}" if error else f"Recorded '{entry_name}'.")
+    if any(results.values()):
+        sys.exit(1)
+
+
+def report_entries(data_dir: Path, label: ty.Optional[str] = None) -> None:
+    """Print the indexed results of a data directory."""
+    with EntryIndex(data_dir) as index:
+        entries = index.get_entries(label=label)
+
+    def _format_time(timestamp: ty.Optional[float]) -> str:
+        return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp)) if timestamp else '-'
+
+    print(
+        f"{'result':<60} {'size [B]':>12} {'runtime [s]':>12} {'hits':>6} {'created':>16} {'last hit':>16}"
+    )
+    for entry in entries:
+        print(
+            f"{entry['entry_name']:<60} {entry['size'] if entry['size'] is not None else '-':>12} "
+            f"{format(entry['runtime'], '.1f') if entry['runtime'] is not None else '-':>12} "
+            f"{entry['hits']:>6} {_format_time(entry['created']):>16} {_format_time(entry['last_hit']):>16}"
+        )
+    print(
+        f"{len(entries)} results, {sum(entry['size'] or 0 for entry in entries)} bytes, "
+        f"{sum(entry['runtime'] or 0 for entry in entries):.1f} s of recorded runtime."
+    )
+
+
+def prune_entries(
+    data_dir: Path,
+    unused_days: float,
+    label: ty.Optional[str] = None,
+    dry_run: bool = False
+) -> ty.List[str]:
+    """
+    Remove the result directories which, according to the index, have
+    not been used for some time. Packed results are not removed.
+
+    The temporary directories left behind by interrupted recordings are
+    removed as well, unless their result is being recorded.
+
+    :param data_dir: Data directory containing the results.
+    :param unused_days: Remove results not used in this number of days.
+    :param label: Only remove results of this label.
+    :param dry_run: Only print the results which would be removed.
+    :return: Names of the removed result directories.
+    """
+    removed = []
+    with EntryIndex(data_dir) as index:
+        for entry in index.get_entries(label=label, unused_since=time.time() - unused_days * 86400):
+            res_dir = data_dir / entry['entry_name']
+            if not res_dir.is_dir() or res_dir.is_symlink():
+                continue
+            print(f"{'Would remove' if dry_run else 'Removing'} '{entry['entry_name']}'.")
+            removed.append(entry['entry_name'])
+            if not dry_run:
+                shutil.rmtree(res_dir)
+                index.remove(entry['entry_name'])
+    if not dry_run:
+        for path in data_dir.glob('mock-*'):
+            if path.is_symlink() and os.readlink(path) in removed:
+                path.unlink()
+    for entry_name, path in iter_temporary_dirs(data_dir):
+        lock = EntryLock(data_dir, entry_name, timeout=0)
+        try:
+            lock.acquire()
+        except LockTimeoutError:
+            continue
+        try:
+            print(f"{'Would remove' if dry_run else 'Removing'} '{path.name}'.")
+            if not dry_run:
+                shutil.rmtree(path, ignore_errors=True)
+        finally:
+            lock.release()
+    return removed
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Implements a persistent cache for the digests of mock code input files.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import typing as ty
+from pathlib import Path
+
+__all__ = ('DigestCache', 'get_default_digest_cache_path')
+
+#: Default maximum number of digests kept in the cache.
+DEFAULT_MAX_ENTRIES = 100000
+
+#: Seconds to wait for a lock held by another process.
+LOCK_TIMEOUT = 30.
+
+StatKey = ty.Tuple[str, int, int, int, int, int]
+
+
+def get_default_digest_cache_path() -> Path:
+    """
+    Get the default location of the digest cache, inside the user cache directory.
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(cache_home) / 'aiida-testing' / 'mock-code-digests.sqlite'
+
+
+class DigestCache:
+    """
+    Persistent cache for file digests, stored in an SQLite database.
+
+    Digests are keyed by the resolved path of a file together with its
+    size, modification / change time, inode and device, such that any
+    modification of the file invalidates the cached digest. The database
+    can be shared between concurrent processes, and the cache can be used
+    from several threads; if it can not be accessed, the cache is silently
+    disabled.
+
+    :param path: Path of the database file.
+    :param max_entries: Maximum number of digests to keep. When exceeded,
+        the least recently used digests are evicted.
+    """
+    def __init__(self, path: ty.Union[str, Path], max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._hits: ty.List[ty.Tuple[float, str, str]] = []
+        self._new: ty.List[ty.Tuple[str, str, str, float]] = []
+        self._connection: ty.Optional[sqlite3.Connection]
+        # serializes the lookups of threads hashing files concurrently
+        self._lock = threading.Lock()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                str(self.path), timeout=LOCK_TIMEOUT, check_same_thread=False
+            )
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            with self._connection:
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS digests ('
+                    'key TEXT NOT NULL, algorithm TEXT NOT NULL, digest TEXT NOT NULL, '
+                    'last_used REAL NOT NULL, PRIMARY KEY (key, algorithm))'
+                )
+        except (OSError, sqlite3.Error):
+            self._connection = None
+
+    @staticmethod
+    def get_key(path: Path) -> ty.Optional[str]:
+        """
+        Get the key identifying the current state of a file, or ``None`` if it can not be determined.
+        """
+        try:
+            real_path = os.path.realpath(path)
+            stat = os.stat(real_path)
+        except OSError:
+            return None
+        key: StatKey = (
+            real_path, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino, stat.st_dev
+        )
+        return repr(key)
+
+    def get(self, key: ty.Optional[str], algorithm: str) -> ty.Optional[str]:
+        """
+        Get the cached hex digest for a file key, or ``None`` if it is not cached.
+        """
+        if self._connection is None or key is None:
+            return None
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    'SELECT digest FROM digests WHERE key = ? AND algorithm = ?', (key, algorithm)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        self._hits.append((time.time(), key, algorithm))
+        return ty.cast(str, row[0])
+
+    def set(self, key: ty.Optional[str], algorithm: str, digest: str) -> None:
+        """
+        Add the hex digest of a file to the cache. It is written to the database on :meth:`close`.
+        """
+        if self._connection is None or key is None:
+            return
+        self._new.append((key, algorithm, digest, time.time()))
+
+    def close(self) -> None:
+        """
+        Write new digests to the database, evict old digests, and close the connection.
+        """
+        if self._connection is None:
+            return
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO digests (key, algorithm, digest, last_used) VALUES (?, ?, ?, ?)',
+                    self._new
+                )
+                self._connection.executemany(
+                    'UPDATE digests SET last_used = ? WHERE key = ? AND algorithm = ?', self._hits
+                )
+                if self._new:
+                    self._connection.execute(
+                        'DELETE FROM digests WHERE rowid IN (SELECT rowid FROM digests '
+                        'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries, )
+                    )
+        except sqlite3.Error:
+            pass
+        finally:
+            self._connection.close()
+            self._connection = None
+            self._hits.clear()
+            self._new.clear()
+
+    def __enter__(self) -> 'DigestCache':
+        return self
+
+    def __exit__(self, *args: ty.Any) -> None:
+        self.close()
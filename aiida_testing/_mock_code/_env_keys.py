@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Defines the environment variable names for the mock code execution.
+"""
+
+from enum import Enum
+
+
+class EnvKeys(Enum):
+    """
+    An enum containing the environment variables defined for
+    the mock code execution.
+    """
+    LABEL = 'AIIDA_MOCK_LABEL'
+    DATA_DIR = 'AIIDA_MOCK_DATA_DIR'
+    EXECUTABLE_PATH = 'AIIDA_MOCK_EXECUTABLE_PATH'
+    IGNORE_FILES = 'AIIDA_MOCK_IGNORE_FILES'
+    IGNORE_PATHS = 'AIIDA_MOCK_IGNORE_PATHS'
+    REGENERATE_DATA = 'AIIDA_MOCK_REGENERATE_DATA'
+    HASH_ALGORITHM = 'AIIDA_MOCK_HASH_ALGORITHM'
+    DIGEST_CACHE = 'AIIDA_MOCK_DIGEST_CACHE'
+    STORAGE_LAYOUT = 'AIIDA_MOCK_STORAGE_LAYOUT'
+    RESTORE_MODE = 'AIIDA_MOCK_RESTORE_MODE'
+    SERVER_SOCKET = 'AIIDA_MOCK_SERVER_SOCKET'
+    INDEX = 'AIIDA_MOCK_INDEX'
+    TRANSFER_WORKERS = 'AIIDA_MOCK_TRANSFER_WORKERS'
+    LOCK_TIMEOUT = 'AIIDA_MOCK_LOCK_TIMEOUT'
+    LOG_FILE = 'AIIDA_MOCK_LOG_FILE'
+    VERIFY_RESULTS = 'AIIDA_MOCK_VERIFY_RESULTS'
+    CONCURRENCY_CAPACITY = 'AIIDA_MOCK_CONCURRENCY_CAPACITY'
+    CONCURRENCY_WEIGHT = 'AIIDA_MOCK_CONCURRENCY_WEIGHT'
+    QUEUE_MISSES = 'AIIDA_MOCK_QUEUE_MISSES'
+    STORE_INPUTS = 'AIIDA_MOCK_STORE_INPUTS'
+    TIMINGS_FILE = 'AIIDA_MOCK_TIMINGS_FILE'
+    RETRIEVE_ONLY = 'AIIDA_MOCK_RETRIEVE_ONLY'
+    RETRIEVE_PATTERNS = 'AIIDA_MOCK_RETRIEVE_PATTERNS'
+    HASH_RULES = 'AIIDA_MOCK_HASH_RULES'
+    HASH_WORKERS = 'AIIDA_MOCK_HASH_WORKERS'
+    RECORD_RUNTIME = 'AIIDA_MOCK_RECORD_RUNTIME'
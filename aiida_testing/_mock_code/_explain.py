@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the ``explain-miss`` command, which compares the inputs of a
+calculation whose result is missing to those of the existing results of
+the same mock code, file by file.
+"""
+
+import difflib
+import typing as ty
+from pathlib import Path
+
+from ._hashing import SUBMIT_FILE, get_input_digests, strip_submit_content, validate_hash_algorithm
+from ._storage import INPUTS_DIR, OBJECT_HASH_ALGORITHM, read_manifest
+from ._pack import PackFile
+from ._hash_rules import HashRules
+
+__all__ = ('explain_miss', 'format_explanation')
+
+#: Maximum number of lines of the difference shown for each changed input file.
+MAX_DIFF_LINES = 20
+
+
+def explain_miss(
+    sandbox_dir: ty.Union[str, Path],
+    data_dir: ty.Union[str, Path],
+    label: str,
+    max_entries: int = 3,
+    hash_rules: ty.Optional[HashRules] = None
+) -> ty.List[ty.Dict[str, ty.Any]]:
+    """
+    Compare the inputs of a calculation to those of the existing results with the same label.
+
+    Only results recorded with the digests of their input files (or with
+    their stored inputs) can be compared. The results are ranked by the
+    number of differing input files.
+
+    :param sandbox_dir: Working directory of the calculation, before running the code.
+    :param data_dir: Data directory containing the results.
+    :param label: Label of the mock code.
+    :param max_entries: Maximum number of results returned.
+    :param hash_rules: Rules normalizing or excluding the input files of the mock code.
+    :return: The nearest results, each with the names of the input files
+        which only exist in the calculation (``added``), which only exist in
+        the result (``removed``), and which differ (``changed``), and the
+        differences of the changed files whose stored input is text (``diffs``).
+    """
+    sandbox_dir = Path(sandbox_dir)
+    data_dir = Path(data_dir)
+    comparisons = _compare_entries(sandbox_dir, data_dir, label, hash_rules)
+    comparisons.sort(
+        key=lambda comparison: (
+            sum(len(comparison[key])
+                for key in ('added', 'removed', 'changed')), comparison['entry_name']
+        )
+    )
+    comparisons = comparisons[:max_entries]
+    for comparison in comparisons:
+        comparison['diffs'] = {}
+        for name in comparison['changed']:
+            diff = _get_diff(
+                data_dir / comparison['entry_name'] / INPUTS_DIR / name, sandbox_dir / name
+            )
+            if diff is not None:
+                comparison['diffs'][name] = diff
+    return comparisons
+
+
+def _compare_entries(
+    sandbox_dir: Path, data_dir: Path, label: str, hash_rules: ty.Optional[HashRules]
+) -> ty.List[ty.Dict[str, ty.Any]]:
+    """
+    Compare the input digests of a calculation to those of all results of a label,
+    see :func:`explain_miss`.
+    """
+    comparisons: ty.List[ty.Dict[str, ty.Any]] = []
+    sandbox_digests: ty.Dict[ty.Tuple[str, bool], ty.Dict[str, str]] = {}
+    pack = PackFile.open(data_dir)
+    try:
+        for entry_name in _get_entry_names(data_dir, label, pack):
+            entry_digests = _get_entry_input_digests(data_dir / entry_name, pack)
+            if entry_digests is None:
+                continue
+            algorithm, files, normalized = entry_digests
+            if (algorithm, normalized) not in sandbox_digests:
+                sandbox_digests[algorithm, normalized] = get_input_digests(
+                    algorithm, directory=sandbox_dir, hash_rules=hash_rules if normalized else None
+                )
+            digests = sandbox_digests[algorithm, normalized]
+            comparisons.append({
+                'entry_name':
+                entry_name,
+                'added':
+                sorted(set(digests) - set(files)),
+                'removed':
+                sorted(set(files) - set(digests)),
+                'changed':
+                sorted(name for name in set(digests) & set(files) if digests[name] != files[name]),
+            })
+    finally:
+        if pack is not None:
+            pack.close()
+    return comparisons
+
+
+def format_explanation(comparisons: ty.List[ty.Dict[str, ty.Any]]) -> str:
+    """
+    Format the comparisons returned by :func:`explain_miss` for display.
+    """
+    lines = []
+    for comparison in comparisons:
+        num_differences = sum(len(comparison[key]) for key in ('added', 'removed', 'changed'))
+        lines.append(f"'{comparison['entry_name']}': {num_differences} differing input file(s)")
+        if not num_differences:
+            lines.append(
+                '  all input files are equal, the result was recorded with different '
+                "settings (e.g. another hash algorithm, see 'aiida-mock-code rehash')"
+            )
+        for key, description in (
+            ('added', 'only in the calculation'),
+            ('removed', 'only in the result'),
+            ('changed', 'changed'),
+        ):
+            for name in comparison[key]:
+                lines.append(f'  {description}: {name}')
+                lines.extend(f'    {line}' for line in comparison['diffs'].get(name, []))
+    return '\n'.join(lines)
+
+
+def _get_entry_names(data_dir: Path, label: str, pack: ty.Optional[PackFile]) -> ty.List[str]:
+    """Get the names of the results of a label, skipping aliases."""
+    entry_names = {
+        path.name
+        for path in data_dir.glob(f'mock-{label}-*') if path.is_dir() and not path.is_symlink()
+    }
+    if pack is not None:
+        entry_names.update(pack.entry_names())
+    return sorted(name for name in entry_names if _is_entry_of_label(name, label))
+
+
+def _is_entry_of_label(entry_name: str, label: str) -> bool:
+    """
+    Check whether a result belongs to a label. The names of the results of
+    other labels may start with the same prefix, e.g. ``mock-diff-broken-*``
+    for the label ``diff``, but do not contain a valid hash algorithm.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from ._cli import split_result_dir_name
+
+    try:
+        hash_algorithm, _ = split_result_dir_name(entry_name, label)
+        validate_hash_algorithm(hash_algorithm)
+    except ValueError:
+        return False
+    return True
+
+
+def _get_entry_input_digests(
+    res_dir: Path, pack: ty.Optional[PackFile]
+) -> ty.Optional[ty.Tuple[str, ty.Dict[str, str], bool]]:
+    """
+    Get the hash algorithm and digests of the input files of a result, and
+    whether the hash rules were applied to them, or ``None`` if they are
+    not known.
+
+    Result directories take precedence over packed results.
+    """
+    if res_dir.is_dir():
+        manifest = read_manifest(res_dir) or {}
+        input_digests = manifest.get('input_digests')
+        if input_digests is None and 'inputs' in manifest:
+            # the digests of the stored inputs are those of the (unnormalized) files
+            return OBJECT_HASH_ALGORITHM, {
+                name: file_info['digest']
+                for name, file_info in manifest['inputs']['files'].items()
+            }, False
+    elif pack is not None:
+        input_digests = pack.get_input_digests(res_dir.name)
+    else:
+        return None
+    if input_digests is None:
+        return None
+    return input_digests['algorithm'], input_digests['files'], True
+
+
+def _get_diff(stored_path: Path, path: Path) -> ty.Optional[ty.List[str]]:
+    """
+    Get the (truncated) unified diff of a stored input file and the
+    corresponding input file of the calculation, if both are text.
+    """
+    if not stored_path.is_file():
+        return None
+    content = path.read_bytes()
+    # the submit file is stored normalized
+    if path.name == SUBMIT_FILE:
+        content = strip_submit_content(content)
+    try:
+        stored_lines = stored_path.read_bytes().decode().splitlines()
+        lines = content.decode().splitlines()
+    except UnicodeDecodeError:
+        return None
+    diff = list(
+        difflib.unified_diff(stored_lines, lines, 'result', 'calculation', n=1, lineterm='')
+    )
+    if len(diff) > MAX_DIFF_LINES:
+        diff = diff[:MAX_DIFF_LINES] + [f'... ({len(diff) - MAX_DIFF_LINES} more lines)']
+    return diff
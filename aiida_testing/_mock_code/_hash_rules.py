@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the rules applied to the inputs of a mock code when computing
+their key, as configured for each code label in the ``mock_code_hash_rules``
+section of ``.aiida-testing-config.yml``.
+"""
+
+import re
+import json
+import typing as ty
+
+from ._matching import compile_path_patterns
+
+__all__ = ('HashRules', )
+
+
+class HashRules:
+    """
+    Rules normalizing the input files of a mock code before they are hashed,
+    e.g. to remove timestamps or absolute paths which change between runs.
+
+    Each line of a file matching a line rule is first dropped if it matches
+    one of the ``drop_lines`` patterns, and then passed through the matching
+    ``substitutions`` in order. The files are read line by line, so the line
+    rules should be restricted to text files via their ``files`` patterns.
+
+    All ``files`` patterns are relative paths (UNIX shell style patterns allowed)
+    which match a file if they match its path or one of its parent directories.
+
+    :param substitutions: Regular expression substitutions, as dicts with the
+        ``pattern``, its ``replacement`` (default: empty) and optionally the
+        ``files`` to which they apply (default: all files).
+    :param drop_lines: Regular expressions of the lines to drop, as dicts with
+        the ``pattern`` and optionally the ``files``.
+    :param name_only: Files which are keyed by their name and size instead of
+        their content, e.g. large files which never change.
+    :param exclude: Files which are not hashed at all.
+    """
+    def __init__(
+        self,
+        substitutions: ty.Iterable[ty.Mapping[str, ty.Any]] = (),
+        drop_lines: ty.Iterable[ty.Mapping[str, ty.Any]] = (),
+        name_only: ty.Iterable[str] = (),
+        exclude: ty.Iterable[str] = ()
+    ):
+        # each line rule is the files it applies to, its pattern and its replacement,
+        # with drop rules first and replacement ``None``
+        self._line_rules: ty.List[ty.Tuple[ty.Optional[ty.Pattern[str]], ty.Pattern[bytes],
+                                           ty.Optional[bytes]]] = []
+        for rule in drop_lines:
+            self._line_rules.append(
+                (self._compile_files(rule), re.compile(rule['pattern'].encode()), None)
+            )
+        for rule in substitutions:
+            self._line_rules.append((
+                self._compile_files(rule), re.compile(rule['pattern'].encode()),
+                rule.get('replacement', '').encode()
+            ))
+        self._name_only_regex = compile_path_patterns(name_only)
+        self._exclude_regex = compile_path_patterns(exclude)
+
+    @staticmethod
+    def _compile_files(rule: ty.Mapping[str, ty.Any]) -> ty.Optional[ty.Pattern[str]]:
+        return compile_path_patterns(rule['files']) if 'files' in rule else None
+
+    @classmethod
+    def from_json(cls, text: ty.Optional[str]) -> ty.Optional['HashRules']:
+        """
+        Create the rules from their JSON representation, as passed to the mock
+        code executable. Returns ``None`` if ``text`` is empty.
+        """
+        if not text:
+            return None
+        return cls(**json.loads(text))
+
+    def is_excluded(self, relative_path: str) -> bool:
+        """Check whether a file is not hashed at all."""
+        return self._exclude_regex.match(relative_path) is not None
+
+    def is_name_only(self, relative_path: str) -> bool:
+        """Check whether a file is keyed by its name and size instead of its content."""
+        return self._name_only_regex.match(relative_path) is not None
+
+    def applies_to(self, relative_path: str) -> bool:
+        """Check whether a file is hashed differently than by its plain content."""
+        return self.is_name_only(relative_path) or bool(self._get_line_rules(relative_path))
+
+    def _get_line_rules(
+        self, relative_path: str
+    ) -> ty.List[ty.Tuple[ty.Pattern[bytes], ty.Optional[bytes]]]:
+        return [(pattern, replacement) for files, pattern, replacement in self._line_rules
+                if files is None or files.match(relative_path)]
+
+    def normalize_lines(self, relative_path: str, lines: ty.Iterable[bytes]) -> ty.Iterator[bytes]:
+        """
+        Apply the line rules of a file to its lines.
+
+        :param relative_path: POSIX path of the file, relative to the working directory.
+        :param lines: Lines of the file, including their line endings.
+        """
+        line_rules = self._get_line_rules(relative_path)
+        for line in lines:
+            for pattern, replacement in line_rules:
+                if replacement is None:
+                    if pattern.search(line):
+                        break
+                else:
+                    line = pattern.sub(replacement, line)
+            else:
+                yield line
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the hashing of the input files of a mock code, which gives the
+key of its result.
+"""
+
+import os
+import hashlib
+import functools
+import typing as ty
+from pathlib import Path
+
+from ._digest_cache import DigestCache
+from ._hash_rules import HashRules
+from ._transfer import run_transfers
+
+__all__ = (
+    'SUBMIT_FILE', 'LEGACY_HASH_ALGORITHM', 'get_hasher', 'validate_hash_algorithm',
+    'split_hash_algorithm', 'get_hash', 'get_input_digests', 'iter_input_files', 'get_file_digest',
+    'update_input_hash', 'update_file_hash', 'iter_sorted_files', 'strip_submit_content'
+)
+
+SUBMIT_FILE = '_aiidasubmit.sh'
+
+#: Size of the chunks in which input files are read when hashing.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+#: Hash algorithm of the original ``mock-<label>-<digest>`` data directory layout.
+LEGACY_HASH_ALGORITHM = 'md5'
+
+#: Suffix of hash algorithm names which select the per-file ("tree") hashing scheme.
+TREE_HASH_SUFFIX = '-tree'
+
+
+def get_hasher(hash_algorithm: str = LEGACY_HASH_ALGORITHM) -> 'hashlib._Hash':
+    """
+    Create a new hash object for the given algorithm.
+
+    Supports the algorithms of :mod:`hashlib` and, if the ``xxhash``
+    package is installed, ``xxh3_64``, ``xxh3_128`` and ``xxh64``.
+    """
+    if hash_algorithm.startswith('xx'):
+        try:
+            import xxhash  # pylint: disable=import-outside-toplevel
+        except ImportError as exc:
+            raise ValueError(
+                f"Hash algorithm '{hash_algorithm}' requires the 'xxhash' package."
+            ) from exc
+        try:
+            return getattr(xxhash, hash_algorithm)()  # type: ignore
+        except AttributeError as exc:
+            raise ValueError(f"Unknown hash algorithm '{hash_algorithm}'.") from exc
+    return hashlib.new(hash_algorithm)
+
+
+def validate_hash_algorithm(hash_algorithm: str) -> None:
+    """
+    Raise a ``ValueError`` if the given hash algorithm is unknown or not available.
+    """
+    get_hasher(split_hash_algorithm(hash_algorithm)[0])
+
+
+def split_hash_algorithm(hash_algorithm: str) -> ty.Tuple[str, bool]:
+    """
+    Split a hash algorithm name into the name of the underlying
+    algorithm, and whether the per-file hashing scheme is used.
+    """
+    if hash_algorithm.endswith(TREE_HASH_SUFFIX):
+        return hash_algorithm[:-len(TREE_HASH_SUFFIX)], True
+    return hash_algorithm, False
+
+
+def get_hash(  # pylint: disable=too-many-arguments
+    hash_algorithm: str = LEGACY_HASH_ALGORITHM,
+    digest_cache: ty.Optional[DigestCache] = None,
+    directory: Path = Path('.'),
+    hash_rules: ty.Optional[HashRules] = None,
+    max_workers: int = 1,
+    input_digests: ty.Optional[ty.Dict[str, str]] = None
+) -> 'hashlib._Hash':
+    """
+    Get the hash for the inputs in a directory, by default the current working directory.
+
+    Files are read in chunks of ``HASH_CHUNK_SIZE`` bytes, such that
+    the memory use does not depend on the size of the input files.
+
+    Two hashing schemes are supported: By default, the file names and
+    contents are fed into a single hash in sorted order. If the name of
+    the algorithm ends in ``-tree`` (e.g. ``blake2b-tree``), each file
+    is hashed separately, and the result is the hash of the lines
+    ``<relative path>\0<file digest>\n`` in sorted order. Only the
+    latter scheme can re-use file digests from the ``digest_cache``,
+    and hash files concurrently, which gives the same result.
+
+    In both schemes, the ``hash_rules`` of the mock code are applied to the
+    files while they are read.
+
+    :param hash_algorithm: Name of the hash algorithm, see :func:`get_hasher`.
+    :param digest_cache: Cache for the digests of individual files.
+    :param directory: Directory containing the inputs.
+    :param hash_rules: Rules normalizing or excluding input files.
+    :param max_workers: Maximum number of files hashed concurrently with the per-file scheme.
+    :param input_digests: If given, the digest of each input file (see :func:`get_input_digests`)
+        is added to this dict. With the single hash scheme, the files are still read only once.
+    """
+    algorithm, per_file = split_hash_algorithm(hash_algorithm)
+    hasher = get_hasher(algorithm)
+    if per_file:
+        file_digests = get_input_digests(
+            algorithm,
+            digest_cache=digest_cache,
+            directory=directory,
+            hash_rules=hash_rules,
+            max_workers=max_workers
+        )
+        for name, file_digest in file_digests.items():
+            hasher.update(f'{name}\0{file_digest}\n'.encode())
+        if input_digests is not None:
+            input_digests.update(file_digests)
+        return hasher
+
+    for path in iter_input_files(directory, hash_rules=hash_rules):
+        name = path.relative_to(directory).as_posix()
+        hasher.update(path.name.encode())
+        if input_digests is None:
+            update_input_hash(hasher, path, name, hash_rules)
+        else:
+            file_hasher = get_hasher(algorithm)
+            update_input_hash(
+                ty.cast('hashlib._Hash', _HashTee(hasher, file_hasher)), path, name, hash_rules
+            )
+            input_digests[name] = file_hasher.hexdigest()
+    return hasher
+
+
+class _HashTee:  # pylint: disable=too-few-public-methods
+    """Feeds the data into several hash objects at once."""
+    def __init__(self, *hashers: 'hashlib._Hash'):
+        self._hashers = hashers
+
+    def update(self, data: bytes) -> None:
+        """Feed the data into all hash objects."""
+        for hasher in self._hashers:
+            hasher.update(data)
+
+
+def get_input_digests(
+    hash_algorithm: str = LEGACY_HASH_ALGORITHM,
+    digest_cache: ty.Optional[DigestCache] = None,
+    directory: Path = Path('.'),
+    hash_rules: ty.Optional[HashRules] = None,
+    max_workers: int = 1
+) -> ty.Dict[str, str]:
+    """
+    Get the digest of each input file in a directory, by relative path in sorted order.
+
+    These are the leaves of the per-file hashing scheme of :func:`get_hash`.
+    They are stored with each recorded result, such that the inputs of a
+    missing result can be compared to those of the existing results file by
+    file (see :func:`~aiida_testing._mock_code._explain.explain_miss`).
+
+    :param hash_algorithm: Name of the hash algorithm. The ``-tree`` suffix is ignored.
+    :param digest_cache: Cache for the digests of individual files.
+    :param directory: Directory containing the inputs.
+    :param hash_rules: Rules normalizing or excluding input files.
+    :param max_workers: Maximum number of files hashed concurrently, in a thread pool.
+    """
+    algorithm = split_hash_algorithm(hash_algorithm)[0]
+    names = []
+    tasks = []
+    for path in iter_input_files(directory, hash_rules=hash_rules):
+        name = path.relative_to(directory).as_posix()
+        names.append(name)
+        if hash_rules is not None and hash_rules.applies_to(name):
+            # the digests of normalized files depend on the rules, and are hence not cached
+            tasks.append(
+                functools.partial(_get_normalized_digest, path, name, algorithm, hash_rules)
+            )
+        else:
+            tasks.append(
+                functools.partial(get_file_digest, path, algorithm, digest_cache=digest_cache)
+            )
+    # the digests keep the order of the files, independent of the order in which they finish
+    return dict(zip(names, run_transfers(tasks, max_workers=max_workers)))
+
+
+def _get_normalized_digest(
+    path: Path, relative_path: str, algorithm: str, hash_rules: HashRules
+) -> str:
+    """Get the hex digest of an input file, as normalized by the hash rules."""
+    hasher = get_hasher(algorithm)
+    update_input_hash(hasher, path, relative_path, hash_rules)
+    return hasher.hexdigest()
+
+
+def iter_input_files(directory: Path,
+                     hash_rules: ty.Optional[HashRules] = None) -> ty.Iterator[Path]:
+    """
+    Iterate over the input files of a calculation in sorted order, skipping the ``.aiida``
+    directory and the files excluded by the ``hash_rules``.
+    """
+    for path in iter_sorted_files(directory):
+        relative_path = path.relative_to(directory)
+        if relative_path.match('.aiida/**'):
+            continue
+        if hash_rules is None or not hash_rules.is_excluded(relative_path.as_posix()):
+            yield path
+
+
+def get_file_digest(
+    path: Path, algorithm: str, digest_cache: ty.Optional[DigestCache] = None
+) -> str:
+    """
+    Get the hex digest of a single input file.
+
+    :param path: Path of the file.
+    :param algorithm: Name of the hash algorithm, see :func:`get_hasher`.
+    :param digest_cache: Cache for the digests of individual files.
+    """
+    # the submit file is normalized before hashing, and hence not cached
+    if digest_cache is None or path.name == SUBMIT_FILE:
+        hasher = get_hasher(algorithm)
+        update_file_hash(hasher, path)
+        return hasher.hexdigest()
+
+    key = digest_cache.get_key(path)
+    digest = digest_cache.get(key, algorithm)
+    if digest is not None:
+        return digest
+    hasher = get_hasher(algorithm)
+    update_file_hash(hasher, path)
+    digest = hasher.hexdigest()
+    # do not cache the digest if the file was modified while hashing
+    if digest_cache.get_key(path) == key:
+        digest_cache.set(key, algorithm, digest)
+    return digest
+
+
+def update_input_hash(
+    hasher: 'hashlib._Hash',
+    path: Path,
+    relative_path: str,
+    hash_rules: ty.Optional[HashRules] = None
+) -> None:
+    """
+    Feed an input file into a hash object, applying the ``hash_rules`` of the mock code.
+
+    Files hashed by name only are represented by their size.
+    """
+    if hash_rules is None or not hash_rules.applies_to(relative_path):
+        update_file_hash(hasher, path)
+    elif hash_rules.is_name_only(relative_path):
+        hasher.update(f'\0size:{path.stat().st_size}'.encode())
+    else:
+        update_file_hash(
+            hasher, path, normalize=functools.partial(hash_rules.normalize_lines, relative_path)
+        )
+
+
+def update_file_hash(
+    hasher: 'hashlib._Hash',
+    path: Path,
+    normalize: ty.Optional[ty.Callable[[ty.Iterable[bytes]], ty.Iterable[bytes]]] = None
+) -> None:
+    """
+    Feed the content of an input file into a hash object.
+
+    :param normalize: Function normalizing the lines of the file. If given,
+        the file is read line by line instead of in chunks.
+    """
+    if path.name == SUBMIT_FILE:
+        content = strip_submit_content(path.read_bytes())
+        for line in normalize(content.splitlines(keepends=True)) if normalize else [content]:
+            hasher.update(line)
+        return
+    with open(path, 'rb') as file_obj:
+        chunks = normalize(file_obj
+                           ) if normalize else iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b'')
+        for chunk in chunks:
+            hasher.update(chunk)
+
+
+def iter_sorted_files(directory: Path) -> ty.Iterator[Path]:
+    """
+    Iterate over all files in a directory and its subdirectories.
+
+    The order is consistent with ``sorted(directory.glob('**/*'))``,
+    but only the entries of a single directory are kept in memory at
+    a time. As with ``glob``, symbolic links to directories are not
+    followed.
+    """
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_sorted_files(directory / entry.name)
+        elif entry.is_file():
+            yield directory / entry.name
+
+
+def strip_submit_content(aiidasubmit_content_bytes: bytes) -> bytes:
+    """
+    Helper function to strip content which changes between
+    test runs from the aiidasubmit file.
+    """
+    aiidasubmit_content = aiidasubmit_content_bytes.decode()
+    lines: ty.Iterable[str] = aiidasubmit_content.splitlines()
+    # Strip lines containing the aiida_testing.mock_code environment variables.
+    lines = (line for line in lines if 'export AIIDA_MOCK' not in line)
+    # Remove abspath of the aiida-mock-code, but keep cmdline
+    # arguments.
+    lines = (line.split("aiida-mock-code'")[-1] for line in lines)
+    return '\n'.join(lines).encode()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Implements restoring existing results in the process submitting the
+calculations, e.g. the test process, without running their submit
+script and the ``aiida-mock-code`` executable.
+"""
+
+import logging
+import typing as ty
+from pathlib import Path
+
+from ._env_keys import EnvKeys
+from ._digest_cache import DigestCache
+from ._storage import verify_result_dir
+from ._transfer import RestoreError
+from ._pack import PackFile
+from ._index import EntryIndex
+from ._timing import PhaseTimer
+
+__all__ = ('read_submit_env', 'restore_in_process')
+
+#: Prefix of the lines of the submit script exporting the mock code settings.
+_EXPORT_PREFIX = 'export AIIDA_MOCK_'
+
+LOGGER = logging.getLogger(__name__)
+
+
+def read_submit_env(submit_file: Path) -> ty.Dict[str, str]:
+    """
+    Get the mock code environment variables exported by a submit script.
+
+    :param submit_file: Path of the submit script.
+    """
+    # imported here to keep the start-up time of the executable low
+    import shlex  # pylint: disable=import-outside-toplevel
+
+    env = {}
+    for line in submit_file.read_text().splitlines():
+        line = line.strip()
+        if line.startswith(_EXPORT_PREFIX):
+            key, _, value = line[len('export '):].partition('=')
+            env[key] = ''.join(shlex.split(value))
+    return env
+
+
+def restore_in_process(work_dir: ty.Union[str, Path], submit_file: str) -> bool:
+    """
+    Restore the existing result of a calculation to its working directory,
+    as the mock code executable would, but in the current process.
+
+    The mock code settings are read from the submit script. Nothing is
+    done if the submit script does not run a mock code, if test data is
+    regenerated, or if the result does not exist, does not pass the
+    verification or can not be restored; the submit script then needs to
+    be run as usual.
+
+    :param work_dir: Working directory of the calculation.
+    :param submit_file: Name of the submit script in the working directory.
+    :return: Whether the result was restored.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from ._cli import RunSettings, configure_logging, find_result_dir, restore_result, _null_context
+
+    work_dir = Path(work_dir)
+    timer = PhaseTimer()
+    with timer.phase('env'):
+        env = read_submit_env(work_dir / submit_file)
+        if EnvKeys.LABEL.value not in env or env.get(EnvKeys.REGENERATE_DATA.value) == 'True':
+            return False
+        settings = RunSettings.from_env(env, work_dir)
+        configure_logging(env.get(EnvKeys.LOG_FILE.value))
+    timer.info.update(label=settings.label, regenerate=False, in_process=True)
+
+    with timer.phase('lookup'):
+        pack = PackFile.open(settings.data_dir)
+        index = EntryIndex(settings.data_dir) if settings.use_index else None
+        with DigestCache(settings.digest_cache_path
+                         ) if settings.digest_cache_path else _null_context() as digest_cache:
+            res_dir = find_result_dir(
+                data_dir=settings.data_dir,
+                label=settings.label,
+                hash_algorithm=settings.hash_algorithm,
+                digest_cache=digest_cache,
+                pack=pack,
+                index=index,
+                timer=timer,
+                directory=work_dir,
+                hash_rules=settings.hash_rules,
+                hash_workers=settings.hash_workers
+            )
+    timer.info['entry_name'] = res_dir.name
+
+    try:
+        # result directories take precedence over packed results
+        if pack is not None and (res_dir.exists() or res_dir.name not in pack):
+            pack.close()
+            pack = None
+        if not res_dir.exists() and pack is None:
+            return False
+        # incomplete results are quarantined and recorded again by the mock code executable
+        if settings.verify_results and res_dir.is_dir():
+            with timer.phase('verify'):
+                if verify_result_dir(res_dir):
+                    return False
+
+        try:
+            restore_result(
+                res_dir=res_dir,
+                dest_dir=work_dir,
+                label=settings.label,
+                restore_mode=settings.restore_mode,
+                pack=pack,
+                index=index,
+                max_workers=settings.transfer_workers,
+                timer=timer,
+                retrieve_patterns=settings.retrieve_patterns
+            )
+        except RestoreError as exc:
+            # the mock code executable reports the error as the outcome of the calculation
+            LOGGER.warning("Could not restore '%s' in-process: %s", res_dir.name, exc)
+            return False
+        pack = None
+    finally:
+        if pack is not None:
+            pack.close()
+        if index is not None:
+            index.close()
+
+    if env.get(EnvKeys.TIMINGS_FILE.value):
+        timer.write(env[EnvKeys.TIMINGS_FILE.value])
+    return True
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Implements an index of the results stored in a data directory.
+"""
+
+import os
+import time
+import sqlite3
+import typing as ty
+from pathlib import Path
+
+from ._storage import StorageLayout, ObjectStore, MANIFEST_FILE, INPUTS_DIR, read_manifest
+
+__all__ = ('EntryIndex', 'get_entry_size', 'get_default_hits_path')
+
+#: Name of the index database in the data directory.
+INDEX_FILE = '.mock-index.sqlite'
+
+#: Seconds to wait for a lock held by another process.
+LOCK_TIMEOUT = 30.
+
+#: Columns of the ``entries`` table, as returned by :meth:`EntryIndex.get_entries`
+#: together with the ``HIT_COLUMNS`` of the hit statistics.
+ENTRY_COLUMNS = (
+    'label', 'hash_algorithm', 'digest', 'entry_name', 'size', 'created', 'runtime', 'executable'
+)
+
+#: Columns of the ``hits`` table of the hit statistics, for each result.
+HIT_COLUMNS = ('last_hit', 'hits')
+
+
+def get_default_hits_path() -> Path:
+    """
+    Get the default location of the hit statistics of indexed results, inside the user cache directory.
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(cache_home) / 'aiida-testing' / 'mock-code-hits.sqlite'
+
+
+def get_entry_size(res_dir: Path) -> ty.Optional[int]:
+    """
+    Get the total size in bytes of the output files stored for a result directory.
+    """
+    if not res_dir.is_dir():
+        return None
+    manifest = read_manifest(res_dir)
+    if manifest is not None and manifest.get('layout') == StorageLayout.CAS.value:
+        object_store = ObjectStore(res_dir.parent)
+        return sum(
+            object_store.get_path(file_info['digest']).stat().st_size
+            for file_info in manifest['files'].values()
+        )
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(res_dir):
+        if dirpath == str(res_dir) and INPUTS_DIR in dirnames:
+            dirnames.remove(INPUTS_DIR)
+        size += sum(
+            os.path.getsize(os.path.join(dirpath, filename)) for filename in filenames
+            if filename != MANIFEST_FILE
+        )
+    return size
+
+
+class EntryIndex:
+    """
+    Index of the results stored in a data directory, in an SQLite database.
+
+    For each result, keyed by the label, hash algorithm and digest, the
+    index stores the name of the result directory, the size of the
+    stored outputs, when it was created, and the runtime and path of the
+    executable that produced it. The index is only written when results
+    are recorded or removed, and when results recorded without the index
+    are first used.
+
+    How often and when each result was last used is not stored in the
+    data directory, which is usually under version control, but in a
+    database of hit statistics of the current user.
+
+    The index uses the default rollback journal, which leaves no files
+    besides the database in the data directory, and can be shared between
+    concurrent processes. Since the index is optional, errors when
+    accessing the databases are ignored.
+
+    :param data_dir: Data directory containing the results.
+    :param hits_path: Path of the database of hit statistics, by default
+        :func:`get_default_hits_path`.
+    """
+    def __init__(self, data_dir: ty.Union[str, Path], hits_path: ty.Optional[Path] = None):
+        self.path = Path(data_dir) / INDEX_FILE
+        self.hits_path = get_default_hits_path() if hits_path is None else Path(hits_path)
+        self._data_dir_key = str(Path(data_dir).resolve())
+        try:
+            self.hits_path.parent.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass
+        self._connection = _connect(
+            self.path, 'DELETE', 'CREATE TABLE IF NOT EXISTS entries ('
+            'label TEXT NOT NULL, hash_algorithm TEXT NOT NULL, digest TEXT NOT NULL, '
+            'entry_name TEXT NOT NULL, size INTEGER, created REAL, runtime REAL, executable TEXT, '
+            'PRIMARY KEY (label, hash_algorithm, digest))'
+        )
+        self._hits_connection = _connect(
+            self.hits_path, 'WAL', 'CREATE TABLE IF NOT EXISTS hits ('
+            'data_dir TEXT NOT NULL, entry_name TEXT NOT NULL, last_hit REAL, '
+            'hits INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (data_dir, entry_name))'
+        )
+
+    def close(self) -> None:
+        """Close the database connections."""
+        for connection in (self._connection, self._hits_connection):
+            if connection is not None:
+                connection.close()
+        self._connection = None
+        self._hits_connection = None
+
+    def __enter__(self) -> 'EntryIndex':
+        return self
+
+    def __exit__(self, *args: ty.Any) -> None:
+        self.close()
+
+    def _execute(self, sql: str,
+                 parameters: ty.Sequence[ty.Any] = ()) -> ty.List[ty.Tuple[ty.Any, ...]]:
+        return _execute(self._connection, sql, parameters)
+
+    def _execute_hits(
+        self, sql: str, parameters: ty.Sequence[ty.Any] = ()
+    ) -> ty.List[ty.Tuple[ty.Any, ...]]:
+        return _execute(self._hits_connection, sql, parameters)
+
+    def lookup(self, label: str, hash_algorithm: str, digest: str) -> ty.Optional[str]:
+        """Get the name of the result directory for the given key, or ``None`` if it is not indexed."""
+        rows = self._execute(
+            'SELECT entry_name FROM entries WHERE label = ? AND hash_algorithm = ? AND digest = ?',
+            (label, hash_algorithm, digest)
+        )
+        return ty.cast(str, rows[0][0]) if rows else None
+
+    def record(  # pylint: disable=too-many-arguments
+        self,
+        label: str,
+        hash_algorithm: str,
+        digest: str,
+        entry_name: str,
+        size: ty.Optional[int],
+        runtime: ty.Optional[float],
+        executable: ty.Optional[str],
+    ) -> None:
+        """Add a newly recorded result to the index, replacing any previous result for the same key."""
+        self._execute(
+            'INSERT OR REPLACE INTO entries '
+            '(label, hash_algorithm, digest, entry_name, size, created, runtime, executable) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (label, hash_algorithm, digest, entry_name, size, time.time(), runtime, executable)
+        )
+        self._execute_hits(
+            'DELETE FROM hits WHERE data_dir = ? AND entry_name = ?',
+            (self._data_dir_key, entry_name)
+        )
+
+    def hit(
+        self, label: str, hash_algorithm: str, digest: str, entry_name: str, res_dir: Path
+    ) -> None:
+        """
+        Count a use of a result in the hit statistics. Results which are not
+        indexed yet (e.g. recorded without the index) are added to the index.
+        """
+        if self._connection is not None and self.lookup(label, hash_algorithm, digest) is None:
+            self._execute(
+                'INSERT OR IGNORE INTO entries (label, hash_algorithm, digest, entry_name, size) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (label, hash_algorithm, digest, entry_name, get_entry_size(res_dir))
+            )
+        if self._hits_connection is None:
+            return
+        now = time.time()
+        try:
+            with self._hits_connection:
+                cursor = self._hits_connection.execute(
+                    'UPDATE hits SET last_hit = ?, hits = hits + 1 '
+                    'WHERE data_dir = ? AND entry_name = ?', (now, self._data_dir_key, entry_name)
+                )
+                if cursor.rowcount == 0:
+                    self._hits_connection.execute(
+                        'INSERT OR IGNORE INTO hits (data_dir, entry_name, last_hit, hits) '
+                        'VALUES (?, ?, ?, 1)', (self._data_dir_key, entry_name, now)
+                    )
+        except sqlite3.Error:
+            pass
+
+    def remove(self, entry_name: str) -> None:
+        """Remove all keys referring to the given result directory from the index."""
+        self._execute('DELETE FROM entries WHERE entry_name = ?', (entry_name, ))
+        self._execute_hits(
+            'DELETE FROM hits WHERE data_dir = ? AND entry_name = ?',
+            (self._data_dir_key, entry_name)
+        )
+
+    def get_entries(self,
+                    label: ty.Optional[str] = None,
+                    unused_since: ty.Optional[float] = None) -> ty.List[ty.Dict[str, ty.Any]]:
+        """
+        Get the indexed results, as dictionaries with the keys ``ENTRY_COLUMNS``
+        and ``HIT_COLUMNS``.
+
+        :param label: Only return results of this label.
+        :param unused_since: Only return results which were not used (or,
+            if never used, not created) since this POSIX timestamp.
+        """
+        where = ' WHERE label = ?' if label is not None else ''
+        rows = self._execute(
+            f"SELECT {', '.join(ENTRY_COLUMNS)} FROM entries{where} ORDER BY label, entry_name",
+            () if label is None else (label, )
+        )
+        hits = {
+            row[0]: row[1:]
+            for row in self._execute_hits(
+                f"SELECT entry_name, {', '.join(HIT_COLUMNS)} FROM hits WHERE data_dir = ?",
+                (self._data_dir_key, )
+            )
+        }
+        entries = []
+        for row in rows:
+            entry = dict(zip(ENTRY_COLUMNS, row))
+            entry.update(zip(HIT_COLUMNS, hits.get(entry['entry_name'], (None, 0))))
+            if unused_since is None or (entry['last_hit'] or entry['created'] or 0) < unused_since:
+                entries.append(entry)
+        return entries
+
+
+def _connect(path: Path, journal_mode: str, schema: str) -> ty.Optional[sqlite3.Connection]:
+    """
+    Open an SQLite database with the given journal mode and create its table,
+    or return ``None`` if the database can not be opened.
+    """
+    try:
+        connection = sqlite3.connect(str(path), timeout=LOCK_TIMEOUT)
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        connection.execute(f'PRAGMA journal_mode={journal_mode}')
+        with connection:
+            connection.execute(schema)
+    except sqlite3.Error:
+        connection.close()
+        return None
+    return connection
+
+
+def _execute(
+    connection: ty.Optional[sqlite3.Connection], sql: str, parameters: ty.Sequence[ty.Any] = ()
+) -> ty.List[ty.Tuple[ty.Any, ...]]:
+    """Execute an SQL statement in a transaction, returning no rows on errors."""
+    if connection is None:
+        return []
+    try:
+        with connection:
+            return connection.execute(sql, parameters).fetchall()
+    except sqlite3.Error:
+        return []
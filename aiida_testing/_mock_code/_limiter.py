@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Implements a semaphore shared by all processes on a machine, which
+limits the number of cores used by concurrently running actual codes.
+"""
+
+import os
+import time
+import logging
+import tempfile
+import typing as ty
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore  # pylint: disable=invalid-name
+
+__all__ = ('ExecutionSlots', 'get_default_slots_dir')
+
+#: Seconds between attempts to acquire the slots.
+POLL_INTERVAL = 0.2
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_default_slots_dir() -> Path:
+    """
+    Get the directory containing the slot files shared by all processes of the current user.
+    """
+    return Path(tempfile.gettempdir()) / f'aiida-mock-code-slots-{os.getuid()}'
+
+
+class ExecutionSlots:
+    """
+    Counting semaphore of ``capacity`` slots, shared between processes.
+
+    Each slot is a file ``slot-<n>`` in ``slots_dir``, which is taken by
+    holding an exclusive ``flock`` on it, so slots of processes that die
+    are released by the operating system. A code with a ``weight`` of
+    several cores takes as many slots at once; it only holds the slots
+    once all of them are available, so that waiting codes never block
+    each other.
+
+    On platforms without ``fcntl``, the semaphore is a no-op.
+
+    :param capacity: Total number of slots, e.g. the number of cores to use.
+        If zero, the number of running codes is not limited.
+    :param weight: Number of slots taken by the code, e.g. the number of
+        cores it uses. Weights larger than the capacity take all slots.
+    :param slots_dir: Directory containing the slot files.
+    """
+    def __init__(self, capacity: int, weight: int = 1, slots_dir: ty.Optional[Path] = None):
+        self.capacity = capacity
+        self.weight = min(max(weight, 1), capacity)
+        self.slots_dir = get_default_slots_dir() if slots_dir is None else Path(slots_dir)
+        self._fds: ty.List[int] = []
+
+    def acquire(self) -> float:
+        """
+        Acquire the slots, waiting until enough slots are available.
+
+        :return: Seconds waited for the slots.
+        """
+        if fcntl is None or self.capacity <= 0:
+            return 0.
+        self.slots_dir.mkdir(parents=True, exist_ok=True)
+        start_time = time.monotonic()
+        # start at a different slot in each process, to reduce contention
+        offset = os.getpid() % self.capacity
+        waiting = False
+        while True:
+            for idx in range(self.capacity):
+                fd = os.open(
+                    self.slots_dir / f'slot-{(offset + idx) % self.capacity}',
+                    os.O_RDWR | os.O_CREAT, 0o666
+                )
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+                self._fds.append(fd)
+                if len(self._fds) == self.weight:
+                    return time.monotonic() - start_time
+            self.release()
+            if not waiting:
+                LOGGER.info(
+                    "Waiting for %d of %d slots in '%s'.", self.weight, self.capacity,
+                    self.slots_dir
+                )
+                waiting = True
+            time.sleep(POLL_INTERVAL)
+
+    def release(self) -> None:
+        """Release the slots."""
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+    def __enter__(self) -> 'ExecutionSlots':
+        self.acquire()
+        return self
+
+    def __exit__(self, *args: ty.Any) -> None:
+        self.release()
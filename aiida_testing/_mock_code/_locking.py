@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the locking of result directories, so that only one process
+runs the actual code to record a result.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import logging
+import tempfile
+import typing as ty
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore  # pylint: disable=invalid-name
+
+__all__ = ('EntryLock', 'LockTimeoutError', 'get_default_locks_dir')
+
+#: Default number of seconds to wait for a result recorded by another process.
+DEFAULT_LOCK_TIMEOUT = 3600.
+
+#: Seconds between attempts to acquire a lock held by another process.
+POLL_INTERVAL = 0.1
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_default_locks_dir(data_dir: ty.Union[str, Path]) -> Path:
+    """
+    Get the directory containing the lock files of a data directory, which is
+    shared by all processes of the current user. It is a temporary directory,
+    so that no lock files are created in the (version controlled) data directory.
+    """
+    data_dir_digest = hashlib.sha256(str(Path(data_dir).resolve()).encode()).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f'aiida-mock-code-locks-{os.getuid()}' / data_dir_digest
+
+
+class LockTimeoutError(Exception):
+    """
+    Raised when a lock can not be acquired within the timeout.
+    """
+
+
+class EntryLock:
+    """
+    Advisory lock on a result directory, held while its result is recorded.
+
+    The lock is an exclusive ``flock`` on ``<locks_dir>/<entry_name>.lock``,
+    which is released by the operating system if the holding process dies.
+    The lock file contains the PID and host name of the holder. A lock
+    held by a process on the same host which no longer exists (e.g. the
+    lock file descriptor was inherited by an orphaned process) is stale,
+    and is broken by removing the lock file.
+
+    On platforms without ``fcntl``, the lock is a no-op.
+
+    :param data_dir: Data directory containing the results.
+    :param entry_name: Name of the result directory.
+    :param timeout: Seconds to wait for the lock, or ``None`` to wait indefinitely.
+    :param locks_dir: Directory containing the lock files, by default
+        :func:`get_default_locks_dir` of the data directory.
+    """
+    def __init__(
+        self,
+        data_dir: ty.Union[str, Path],
+        entry_name: str,
+        timeout: ty.Optional[float] = DEFAULT_LOCK_TIMEOUT,
+        locks_dir: ty.Optional[Path] = None
+    ):
+        if locks_dir is None:
+            locks_dir = get_default_locks_dir(data_dir)
+        self.path = Path(locks_dir) / f'{entry_name}.lock'
+        self.entry_name = entry_name
+        self.timeout = timeout
+        self._fd: ty.Optional[int] = None
+
+    def acquire(self) -> bool:
+        """
+        Acquire the lock, waiting for other processes holding it.
+
+        :return: Whether the lock was held by another process, i.e. whether
+            the result may have been recorded while waiting.
+        :raises LockTimeoutError: If the lock is not acquired within the timeout.
+        """
+        # fcntl is not available on Windows
+        if sys.platform == 'win32':  # pragma: no cover
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        start_time = time.monotonic()
+        waited = False
+        stale_holder = None
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+            else:
+                # the lock file may have been removed as stale while opening it
+                if self._is_current(fd):
+                    break
+                os.close(fd)
+                continue
+
+            holder = self._read_holder()
+            if not waited:
+                LOGGER.info(
+                    "Waiting for '%s', which is being recorded by process %s on '%s'.",
+                    self.entry_name, holder.get('pid'), holder.get('host')
+                )
+                waited = True
+            # the holder must be seen twice, since a new holder writes its
+            # information only after acquiring the lock
+            if holder and holder == stale_holder:
+                LOGGER.warning(
+                    "Breaking stale lock of '%s' held by process %s, which no longer exists.",
+                    self.entry_name, holder.get('pid')
+                )
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                stale_holder = None
+                continue
+            stale_holder = holder if self._is_stale(holder) else None
+            if self.timeout is not None and time.monotonic() - start_time > self.timeout:
+                raise LockTimeoutError(
+                    f"Timed out after {self.timeout} s waiting for '{self.entry_name}' to be "
+                    f"recorded by process {holder.get('pid')} on '{holder.get('host')}'."
+                )
+            time.sleep(POLL_INTERVAL)
+
+        self._fd = fd
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps({'pid': os.getpid(), 'host': socket.gethostname()}).encode())
+        return waited
+
+    def release(self) -> None:
+        """Release the lock."""
+        if self._fd is not None:
+            os.ftruncate(self._fd, 0)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> 'EntryLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *args: ty.Any) -> None:
+        self.release()
+
+    def _is_current(self, fd: int) -> bool:
+        """Check whether the file descriptor refers to the current lock file."""
+        try:
+            path_stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        fd_stat = os.fstat(fd)
+        return (fd_stat.st_ino, fd_stat.st_dev) == (path_stat.st_ino, path_stat.st_dev)
+
+    def _read_holder(self) -> ty.Dict[str, ty.Any]:
+        """Read the PID and host name of the process holding the lock."""
+        try:
+            with open(self.path) as handle:
+                return ty.cast(ty.Dict[str, ty.Any], json.load(handle))
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _is_stale(holder: ty.Dict[str, ty.Any]) -> bool:
+        """Check whether the holder is a process on this host which no longer exists."""
+        if holder.get('host') != socket.gethostname() or not isinstance(holder.get('pid'), int):
+            return False
+        try:
+            os.kill(holder['pid'], 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
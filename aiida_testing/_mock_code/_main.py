@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the entry point of the ``aiida-mock-code`` executable.
+
+If the mock code server is running, the run of the mock code is delegated
+to it before the modules running the mock code are imported.
+"""
+
+import os
+import sys
+import typing as ty
+
+from ._env_keys import EnvKeys
+from ._server import request_run
+
+__all__ = ('main', )
+
+
+def main(argv: ty.Optional[ty.List[str]] = None) -> None:
+    """
+    Entry point of the ``aiida-mock-code`` executable.
+
+    Runs the mock code in the mock code server if it is configured and
+    running, and otherwise calls :func:`aiida_testing._mock_code._cli.main`.
+    """
+    socket_path = os.environ.get(EnvKeys.SERVER_SOCKET.value)
+    if EnvKeys.LABEL.value in os.environ and socket_path:
+        exit_code = request_run(socket_path)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    # imported here to keep the start-up time of the executable low
+    from ._cli import main as cli_main  # pylint: disable=import-outside-toplevel
+    cli_main(argv)
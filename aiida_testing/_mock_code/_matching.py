@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the matching of output files against the ignore patterns of a mock code.
+"""
+
+import re
+import fnmatch
+import typing as ty
+
+__all__ = ('PathMatcher', 'compile_path_patterns')
+
+
+def _translate_segment(segment: str) -> str:
+    """
+    Translate a single path segment with UNIX shell style wildcards
+    into a regular expression which does not match ``/``.
+    """
+    res = ''
+    idx, length = 0, len(segment)
+    while idx < length:
+        char = segment[idx]
+        idx += 1
+        if char == '*':
+            res += '[^/]*'
+        elif char == '?':
+            res += '[^/]'
+        elif char == '[':
+            end = idx
+            if end < length and segment[end] == '!':
+                end += 1
+            if end < length and segment[end] == ']':
+                end += 1
+            while end < length and segment[end] != ']':
+                end += 1
+            if end >= length:
+                res += '\\['
+            else:
+                chars = segment[idx:end].replace('\\', '\\\\')
+                idx = end + 1
+                if chars[0] == '!':
+                    chars = '^/' + chars[1:]
+                elif chars[0] == '^':
+                    chars = '\\' + chars
+                res += f'[{chars}]'
+        else:
+            res += re.escape(char)
+    return res
+
+
+def _translate_path(pattern: str) -> ty.Tuple[ty.Optional[str], bool]:
+    """
+    Translate a relative path pattern, as accepted by :meth:`pathlib.Path.glob`,
+    into a regular expression matching relative POSIX paths.
+
+    :return: The regular expression (or ``None`` if the pattern is empty),
+        and whether the pattern only matches directories (if it ends in ``**``).
+    """
+    if pattern.startswith('/'):
+        raise ValueError(f"Ignore pattern '{pattern}' must be a relative path.")
+    segments = [segment for segment in pattern.split('/') if segment not in ('', '.')]
+    if not segments:
+        return None, False
+
+    pieces = []
+    for idx, segment in enumerate(segments):
+        is_last = idx == len(segments) - 1
+        if segment == '**':
+            # zero or more directories
+            pieces.append('(?:[^/]+(?:/[^/]+)*)?' if is_last else '(?:[^/]+/)*')
+        else:
+            pieces.append(_translate_segment(segment) + ('' if is_last else '/'))
+    regex = ''.join(pieces)
+    dir_only = segments[-1] == '**'
+    if dir_only and len(segments) > 1:
+        # a trailing '**' also matches the directory itself
+        regex = ''.join(pieces[:-1])[:-1] + '(?:/[^/]+)*'
+    return regex, dir_only
+
+
+def compile_path_patterns(patterns: ty.Iterable[str]) -> ty.Pattern[str]:
+    """
+    Compile relative paths (UNIX shell style patterns allowed) into a single
+    regular expression, which matches the relative POSIX paths that, or one
+    of whose parent directories, match one of the patterns. An empty list of
+    patterns matches no paths.
+    """
+    regexes = [regex for regex, _ in map(_translate_path, patterns) if regex is not None]
+    return re.compile(f"(?:{'|'.join(regexes) or '(?!)'})(?:/.*)?\\Z")
+
+
+class PathMatcher:
+    """
+    Matches the paths of output files against the ignore patterns of a
+    mock code, with all patterns compiled into a single regular expression.
+
+    A path is excluded if it, or any of its parent directories, matches
+    one of the ``ignore_paths`` (the same paths as selected by
+    ``Path.glob(pattern)`` for each pattern), or if its file name matches
+    one of the ``ignore_files``. The ``.aiida`` directory is always excluded.
+    If ``retrieve_paths`` are given, files are also excluded unless they,
+    or one of their parent directories, match one of them.
+
+    :param ignore_files: File names (UNIX shell style patterns allowed) to ignore.
+    :param ignore_paths: Relative paths (UNIX shell style patterns allowed) to ignore.
+    :param retrieve_paths: Relative paths (UNIX shell style patterns allowed) to keep,
+        like the ``retrieve_list`` of a calculation.
+    """
+    def __init__(
+        self,
+        ignore_files: ty.Iterable[str],
+        ignore_paths: ty.Iterable[str],
+        retrieve_paths: ty.Optional[ty.Iterable[str]] = None
+    ):
+        file_regexes = [fnmatch.translate(pattern) for pattern in ignore_files if pattern]
+        self._file_name_regex = re.compile('|'.join(file_regexes)) if file_regexes else None
+
+        any_regexes: ty.List[str] = []
+        dir_regexes = ['\\.aiida']
+        for pattern in ignore_paths:
+            regex, dir_only = _translate_path(pattern)
+            if regex is not None:
+                (dir_regexes if dir_only else any_regexes).append(regex)
+        self._path_regex = re.compile(f"(?:{'|'.join(any_regexes)})\\Z") if any_regexes else None
+        self._dir_regex = re.compile(f"(?:{'|'.join(any_regexes + dir_regexes)})\\Z")
+
+        self._retrieve_regex = None
+        if retrieve_paths is not None:
+            self._retrieve_regex = compile_path_patterns(retrieve_paths)
+
+    def is_excluded_dir(self, relative_dir: str) -> bool:
+        """
+        Check whether a directory (and hence all its content) is excluded.
+        Parent directories are not checked, since they are pruned first.
+
+        :param relative_dir: POSIX path of the directory, relative to the
+            source directory, or the empty string for the source directory.
+        """
+        return self._dir_regex.match(relative_dir) is not None
+
+    def is_excluded_file(self, relative_path: str, filename: str) -> bool:
+        """
+        Check whether a file in a directory which is not excluded is excluded.
+
+        :param relative_path: POSIX path of the file, relative to the source directory.
+        :param filename: Name of the file.
+        """
+        if self._file_name_regex is not None and self._file_name_regex.match(filename):
+            return True
+        if self._retrieve_regex is not None and self._retrieve_regex.match(relative_path) is None:
+            return True
+        return self._path_regex is not None and self._path_regex.match(relative_path) is not None
@@ -0,0 +1,623 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the packed storage of mock code results, where all result
+directories of a data directory are stored in a single packfile.
+"""
+
+import os
+import json
+import mmap
+import zlib
+import struct
+import uuid
+import functools
+import shutil
+import hashlib
+import tempfile
+import typing as ty
+from pathlib import Path
+
+from ._transfer import create_dirs, run_transfers
+from ._storage import (
+    MANIFEST_FILE, INPUTS_DIR, OBJECTS_DIR, StorageLayout, ObjectStore, read_manifest,
+    write_manifest
+)
+
+__all__ = ('PackFile', 'pack_data_dir', 'unpack_data_dir', 'rename_pack_entries')
+
+#: Name of the index of the packfile in the data directory.
+PACK_INDEX_FILE = '.mock-data.idx'
+
+#: Prefix of the name of the packfile, which is unique for each version
+#: of the packfile and referenced from the index.
+PACK_FILE_PREFIX = '.mock-data-'
+
+#: Version of the packfile format.
+PACK_VERSION = 2
+
+#: Magic bytes at the start of the index.
+INDEX_MAGIC = b'MOCKIDX\0'
+
+_CHUNK_SIZE = 1024 * 1024
+
+#: Header of the index: magic bytes, version, name of the packfile, number of
+#: entry and object records, and offset and length of the names of the results.
+_HEADER = struct.Struct('<8sI64sIIQQ')
+
+#: Number of bytes of the SHA-256 digest of the name of a result by which it is keyed.
+_NAME_KEY_SIZE = 16
+
+#: Record of a result or alias: the first bytes of the SHA-256 digest of its
+#: name, and the offset and length of its JSON description in the index.
+_ENTRY_RECORD = struct.Struct(f'<{_NAME_KEY_SIZE}sQI')
+
+#: Record of an object: its SHA-256 digest, its offset and length in the
+#: packfile, and its uncompressed size.
+_OBJECT_RECORD = struct.Struct('<32sQQQ')
+
+
+class PackFile:  # pylint: disable=too-many-instance-attributes
+    """
+    Read access to the packfile of a data directory.
+
+    The packfile is a concatenation of zlib-compressed objects, each
+    stored once per content. The index maps the name of each result
+    directory to its files, and the digest of each file to the offset
+    and length of the object in the packfile. Both files are
+    memory-mapped, such that opening the packfile does not depend on
+    the number of results, and only the objects of the requested result
+    directory are read.
+
+    The index consists of two tables of fixed-width records, sorted by
+    key such that they are binary-searched: one keyed by (a digest of)
+    the name of each result or alias, pointing to its JSON description
+    in the index, and one keyed by the digest of each object.
+
+    Since a new packfile is written under a new name, and the index
+    referencing it is replaced atomically, readers always see a
+    consistent pair of index and packfile.
+
+    :param data_dir: Data directory containing the packfile.
+    """
+    def __init__(self, data_dir: ty.Union[str, Path]):
+        self.data_dir = Path(data_dir)
+        with open(self.data_dir / PACK_INDEX_FILE, 'rb') as handle:
+            self._index = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (
+                magic, version, pack_name, self._num_entries, self._num_objects, names_offset,
+                names_length
+            ) = _HEADER.unpack_from(self._index)
+        except struct.error:
+            magic = version = None
+        if magic != INDEX_MAGIC or version != PACK_VERSION:
+            self._index.close()
+            raise ValueError(
+                f"Unsupported packfile index '{self.data_dir / PACK_INDEX_FILE}' (version "
+                f"{version}), unpack it with the aiida-testing version which packed it."
+            )
+        self._objects_offset = _HEADER.size + self._num_entries * _ENTRY_RECORD.size
+        self._names_slice = slice(names_offset, names_offset + names_length)
+        self._entry_cache: ty.Dict[str, ty.Optional[ty.Dict[str, ty.Any]]] = {}
+        self.pack_path = self.data_dir / pack_name.rstrip(b'\0').decode()
+        self._mmap: ty.Optional[mmap.mmap] = None
+        with open(self.pack_path, 'rb') as handle:
+            if os.fstat(handle.fileno()).st_size > 0:
+                self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open(cls, data_dir: ty.Union[str, Path]) -> ty.Optional['PackFile']:
+        """Open the packfile of a data directory, or return ``None`` if it does not have one."""
+        if not (Path(data_dir) / PACK_INDEX_FILE).is_file():
+            return None
+        return cls(data_dir)
+
+    def close(self) -> None:
+        """Close the packfile."""
+        if self._mmap is not None:
+            self._mmap.close()
+        self._index.close()
+
+    def __enter__(self) -> 'PackFile':
+        return self
+
+    def __exit__(self, *args: ty.Any) -> None:
+        self.close()
+
+    def __contains__(self, entry_name: object) -> bool:
+        return isinstance(entry_name, str) and self._lookup(entry_name) is not None
+
+    def _search(self, offset: int, count: int, record: struct.Struct,
+                key: bytes) -> ty.Optional[ty.Tuple[ty.Any, ...]]:
+        """Binary-search a table of the index for the record starting with ``key``."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            start = offset + middle * record.size
+            middle_key = self._index[start:start + len(key)]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return record.unpack_from(self._index, start)
+        return None
+
+    def _lookup(self, name: str) -> ty.Optional[ty.Dict[str, ty.Any]]:
+        """Get the description of a result or alias, or ``None`` if there is none."""
+        if name not in self._entry_cache:
+            entry = None
+            found = self._search(
+                _HEADER.size, self._num_entries, _ENTRY_RECORD, _get_name_key(name)
+            )
+            if found is not None:
+                entry = json.loads(self._index[found[1]:found[1] + found[2]].decode())
+                # the key is only a part of the digest of the name
+                if entry['name'] != name:
+                    entry = None
+            self._entry_cache[name] = entry
+        return self._entry_cache[name]
+
+    def get_entry(self, entry_name: str) -> ty.Dict[str, ty.Any]:
+        """
+        Get the description of a result: its ``files``, and the ``runtime``, ``retrieve``
+        patterns, ``input_digests`` and stored ``inputs`` as in its manifest, if known.
+
+        :raises KeyError: If the packfile does not contain the result or an alias of that name.
+        """
+        entry = self._lookup(entry_name)
+        if entry is not None and 'alias' in entry:
+            entry = self._lookup(entry['alias'])
+        if entry is None:
+            raise KeyError(entry_name)
+        return entry
+
+    def _get_names(self) -> ty.Dict[str, ty.Any]:
+        return ty.cast(ty.Dict[str, ty.Any], json.loads(self._index[self._names_slice].decode()))
+
+    def entry_names(self) -> ty.List[str]:
+        """Get the names of all result directories in the packfile, excluding aliases."""
+        return ty.cast(ty.List[str], self._get_names()['entries'])
+
+    @property
+    def aliases(self) -> ty.Dict[str, str]:
+        """Mapping of alias names to the names of result directories."""
+        return ty.cast(ty.Dict[str, str], self._get_names()['aliases'])
+
+    def get_files(self, entry_name: str) -> ty.Dict[str, ty.Dict[str, ty.Any]]:
+        """Get the files of a result directory, as mapping of relative path to digest and mode."""
+        return ty.cast(ty.Dict[str, ty.Dict[str, ty.Any]], self.get_entry(entry_name)['files'])
+
+    def get_runtime(self, entry_name: str) -> ty.Optional[float]:
+        """Get the runtime of the actual code which recorded a result, if it is known."""
+        return ty.cast(ty.Optional[float], self.get_entry(entry_name).get('runtime'))
+
+    def get_retrieve_patterns(self, entry_name: str) -> ty.Optional[ty.List[str]]:
+        """Get the patterns of the files a result holds, or ``None`` if it holds all output files."""
+        return ty.cast(ty.Optional[ty.List[str]], self.get_entry(entry_name).get('retrieve'))
+
+    def get_inputs(self, entry_name: str) -> ty.Optional[ty.Dict[str, ty.Any]]:
+        """
+        Get the stored inputs of a result, as in its manifest (the label, the files
+        as mapping of relative path to digest and mode, and the hash rules), if any.
+        """
+        return ty.cast(ty.Optional[ty.Dict[str, ty.Any]], self.get_entry(entry_name).get('inputs'))
+
+    def get_input_digests(self, entry_name: str) -> ty.Optional[ty.Dict[str, ty.Any]]:
+        """Get the hash algorithm and digests of the input files of a result, if they are known."""
+        return ty.cast(
+            ty.Optional[ty.Dict[str, ty.Any]],
+            self.get_entry(entry_name).get('input_digests')
+        )
+
+    def get_objects(self) -> ty.Dict[str, ty.Dict[str, ty.Any]]:
+        """Get the offset, length and uncompressed size of all objects, by digest."""
+        objects = {}
+        for position in range(self._num_objects):
+            digest, offset, length, size = _OBJECT_RECORD.unpack_from(
+                self._index, self._objects_offset + position * _OBJECT_RECORD.size
+            )
+            objects[digest.hex()] = {'offset': offset, 'length': length, 'size': size}
+        return objects
+
+    def iter_raw_chunks(self, digest: str) -> ty.Iterator[bytes]:
+        """Iterate over the stored (compressed) content of an object."""
+        obj = self.get_object_info(digest)
+        for start in range(obj['offset'], obj['offset'] + obj['length'], _CHUNK_SIZE):
+            assert self._mmap is not None
+            yield self._mmap[start:min(start + _CHUNK_SIZE, obj['offset'] + obj['length'])]
+
+    def get_object_info(self, digest: str) -> ty.Dict[str, ty.Any]:
+        """
+        Get the offset, length and uncompressed size of an object.
+
+        :raises KeyError: If the packfile does not contain the object.
+        """
+        found = self._search(
+            self._objects_offset, self._num_objects, _OBJECT_RECORD, bytes.fromhex(digest)
+        )
+        if found is None:
+            raise KeyError(digest)
+        return {'offset': found[1], 'length': found[2], 'size': found[3]}
+
+    def extract_file(self, digest: str, dest_path: Path, mode: ty.Optional[int] = None) -> None:
+        """
+        Extract a single object from the packfile.
+
+        :param digest: Digest of the object.
+        :param dest_path: Destination path of the file.
+        :param mode: Permission bits to set on the destination file.
+        """
+        if os.path.lexists(dest_path) and not os.path.isdir(dest_path):
+            os.unlink(dest_path)
+        with open(dest_path, 'wb') as dest_file:
+            for chunk in self.iter_chunks(digest):
+                dest_file.write(chunk)
+        if mode is not None:
+            os.chmod(dest_path, mode)
+
+    def iter_chunks(self, digest: str) -> ty.Iterator[bytes]:
+        """Iterate over the (decompressed) content of an object."""
+        decompressor = zlib.decompressobj()
+        for chunk in self.iter_raw_chunks(digest):
+            yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+
+    def verify_entry(self, entry_name: str) -> ty.List[str]:
+        """
+        Check that the stored files of a result, including its stored inputs,
+        match their digests.
+
+        :return: Descriptions of the missing or modified files.
+        """
+        problems = []
+        for prefix, files in (('', self.get_files(entry_name)),
+                              ('input ', (self.get_inputs(entry_name) or {}).get('files', {}))):
+            for name, file_info in sorted(files.items()):
+                hasher = hashlib.sha256()
+                try:
+                    for chunk in self.iter_chunks(file_info['digest']):
+                        hasher.update(chunk)
+                except KeyError:
+                    problems.append(f"{prefix}'{name}' is missing")
+                    continue
+                except zlib.error:
+                    # corrupt objects do not match their digest
+                    pass
+                if hasher.hexdigest() != file_info['digest']:
+                    problems.append(f"{prefix}'{name}' does not match its digest")
+        return problems
+
+    def extract(
+        self,
+        entry_name: str,
+        dest_dir: Path,
+        max_workers: int = 1,
+        names: ty.Optional[ty.Iterable[str]] = None
+    ) -> None:
+        """
+        Extract the files of a result directory to the destination directory.
+
+        :param entry_name: Name of the result directory.
+        :param dest_dir: Destination directory.
+        :param max_workers: Maximum number of files extracted concurrently.
+        :param names: Relative paths of the files to extract, by default all files.
+        """
+        files = self.get_files(entry_name)
+        if names is not None:
+            files = {name: files[name] for name in names}
+        create_dirs((dest_dir / name).parent for name in files)
+        tasks = [
+            functools.partial(
+                self.extract_file, file_info['digest'], dest_dir / name, mode=file_info.get('mode')
+            ) for name, file_info in files.items()
+        ]
+        run_transfers(tasks, max_workers=max_workers)
+
+
+class _PackWriter:
+    """Writes objects to a new packfile, storing each content once."""
+    def __init__(self, pack_path: Path):
+        self.pack_path = pack_path
+        self.objects: ty.Dict[str, ty.Dict[str, ty.Any]] = {}
+        self._file = open(pack_path, 'wb')  # pylint: disable=consider-using-with
+
+    def add(self, chunks: ty.Iterable[bytes]) -> str:
+        """Add an object from its content, and return its digest."""
+        offset = self._file.tell()
+        hasher = hashlib.sha256()
+        compressor = zlib.compressobj()
+        size = 0
+        for chunk in chunks:
+            hasher.update(chunk)
+            size += len(chunk)
+            self._file.write(compressor.compress(chunk))
+        self._file.write(compressor.flush())
+        digest = hasher.hexdigest()
+        if digest in self.objects:
+            self._file.seek(offset)
+            self._file.truncate()
+        else:
+            self.objects[digest] = {
+                'offset': offset,
+                'length': self._file.tell() - offset,
+                'size': size
+            }
+        return digest
+
+    def add_compressed(self, digest: str, size: int, raw_chunks: ty.Iterable[bytes]) -> None:
+        """Add an object from its compressed content, as stored in another packfile."""
+        if digest in self.objects:
+            return
+        offset = self._file.tell()
+        for chunk in raw_chunks:
+            self._file.write(chunk)
+        self.objects[digest] = {
+            'offset': offset,
+            'length': self._file.tell() - offset,
+            'size': size
+        }
+
+    def close(self) -> None:
+        """Close the packfile."""
+        self._file.close()
+
+
+def _iter_file_chunks(path: Path) -> ty.Iterator[bytes]:
+    with open(path, 'rb') as handle:
+        yield from iter(lambda: handle.read(_CHUNK_SIZE), b'')
+
+
+def _iter_entry_files(res_dir: Path) -> ty.Iterator[ty.Tuple[str, Path, int]]:
+    """Iterate over the relative path, stored path and mode of the files of a result directory."""
+    manifest = read_manifest(res_dir)
+    if manifest is not None and manifest.get('layout') == StorageLayout.CAS.value:
+        object_store = ObjectStore(res_dir.parent)
+        for name, file_info in sorted(manifest['files'].items()):
+            yield name, object_store.get_path(file_info['digest']), file_info['mode']
+        return
+    for path in sorted(res_dir.glob('**/*')):
+        name = path.relative_to(res_dir).as_posix()
+        # the stored inputs are not restored, and are packed separately
+        if path.is_file() and name != MANIFEST_FILE and not name.startswith(INPUTS_DIR + '/'):
+            yield name, path, path.stat().st_mode & 0o7777
+
+
+def _copy_packed_entry(writer: _PackWriter, pack: PackFile,
+                       entry_name: str) -> ty.Dict[str, ty.Any]:
+    """Copy the objects of a packed result to a new packfile, and return its entry of the index."""
+    entry = {key: value for key, value in pack.get_entry(entry_name).items() if key != 'name'}
+    for file_info in [*entry['files'].values(), *(entry['inputs'] or {}).get('files', {}).values()]:
+        writer.add_compressed(
+            file_info['digest'],
+            pack.get_object_info(file_info['digest'])['size'],
+            pack.iter_raw_chunks(file_info['digest'])
+        )
+    return entry
+
+
+def _pack_result_dir(writer: _PackWriter, res_dir: Path) -> ty.Dict[str, ty.Any]:
+    """Add the files of a result directory to a new packfile, and return its entry of the index."""
+    manifest = read_manifest(res_dir) or {}
+    entry: ty.Dict[str, ty.Any] = {
+        'files': {
+            name: {
+                'digest': writer.add(_iter_file_chunks(path)),
+                'mode': mode
+            }
+            for name, path, mode in _iter_entry_files(res_dir)
+        },
+        'runtime': manifest.get('runtime'),
+        'retrieve': manifest.get('retrieve'),
+        'input_digests': manifest.get('input_digests'),
+        'inputs': None
+    }
+    if 'inputs' in manifest:
+        # the stored inputs are packed as well, such that the keys can be computed again
+        entry['inputs'] = {
+            **manifest['inputs'], 'files': {
+                name: {
+                    **file_info, 'digest':
+                    writer.add(_iter_file_chunks(res_dir / INPUTS_DIR / name))
+                }
+                for name, file_info in manifest['inputs']['files'].items()
+            }
+        }
+    return entry
+
+
+def pack_data_dir(data_dir: ty.Union[str, Path], keep: bool = False) -> ty.List[str]:
+    """
+    Pack the result directories of a data directory into its packfile.
+
+    Entries that are already packed are kept, unless a result directory
+    of the same name exists, which takes precedence.
+
+    :param data_dir: Data directory containing the result directories.
+    :param keep: If True, the result directories are not removed after packing.
+    :return: Names of the result directories that were packed.
+    """
+    data_dir = Path(data_dir)
+    res_dirs = sorted(
+        path for path in data_dir.glob('mock-*') if path.is_dir() and not path.is_symlink()
+    )
+    aliases = {
+        path.name: os.readlink(path)
+        for path in data_dir.glob('mock-*') if path.is_symlink() and path.is_dir()
+    }
+    entries: ty.Dict[str, ty.Dict[str, ty.Any]] = {}
+
+    pack = PackFile.open(data_dir)
+    pack_name = f'{PACK_FILE_PREFIX}{uuid.uuid4().hex}.pack'
+    writer = _PackWriter(data_dir / pack_name)
+    try:
+        if pack is not None:
+            aliases = {**pack.aliases, **aliases}
+            for entry_name in pack.entry_names():
+                if not (data_dir / entry_name).is_dir():
+                    entries[entry_name] = _copy_packed_entry(writer, pack, entry_name)
+        for res_dir in res_dirs:
+            entries[res_dir.name] = _pack_result_dir(writer, res_dir)
+    except BaseException:
+        writer.close()
+        os.unlink(data_dir / pack_name)
+        raise
+    finally:
+        if pack is not None:
+            pack.close()
+    writer.close()
+
+    # replacing the index publishes the new packfile
+    _write_index(data_dir, pack_name, entries=entries, aliases=aliases, objects=writer.objects)
+    if pack is not None:
+        os.unlink(pack.pack_path)
+
+    if not keep:
+        for path in data_dir.glob('mock-*'):
+            if path.is_symlink():
+                path.unlink()
+        for res_dir in res_dirs:
+            shutil.rmtree(res_dir)
+        shutil.rmtree(data_dir / OBJECTS_DIR, ignore_errors=True)
+
+    return [res_dir.name for res_dir in res_dirs]
+
+
+def unpack_data_dir(data_dir: ty.Union[str, Path], keep: bool = False) -> ty.List[str]:
+    """
+    Extract the packfile of a data directory into result directories.
+
+    Each result directory gets a manifest (see :func:`.write_manifest`) with
+    the digests of its files, and the stored inputs and other metadata of
+    the result. Existing result directories are not overwritten.
+
+    :param data_dir: Data directory containing the packfile.
+    :param keep: If True, the packfile is not removed after unpacking.
+    :return: Names of the result directories that were extracted.
+    """
+    data_dir = Path(data_dir)
+    extracted = []
+    with PackFile(data_dir) as pack:
+        for entry_name in pack.entry_names():
+            res_dir = data_dir / entry_name
+            if res_dir.exists():
+                continue
+            with tempfile.TemporaryDirectory(dir=data_dir) as tmp_dir:
+                _unpack_entry(pack, entry_name, Path(tmp_dir) / entry_name)
+                os.replace(Path(tmp_dir) / entry_name, res_dir)
+            extracted.append(entry_name)
+        for alias, target in pack.aliases.items():
+            if not os.path.lexists(data_dir / alias):
+                (data_dir / alias).symlink_to(target, target_is_directory=True)
+
+    if not keep:
+        os.unlink(data_dir / PACK_INDEX_FILE)
+        os.unlink(pack.pack_path)
+    return extracted
+
+
+def _unpack_entry(pack: PackFile, entry_name: str, res_dir: Path) -> None:
+    """Extract a packed result, its stored inputs and its manifest into a result directory."""
+    entry = pack.get_entry(entry_name)
+    pack.extract(entry_name, res_dir)
+    metadata = {
+        key: entry[key]
+        for key in ('runtime', 'retrieve', 'input_digests', 'inputs') if entry.get(key) is not None
+    }
+    for name, file_info in metadata.get('inputs', {}).get('files', {}).items():
+        (res_dir / INPUTS_DIR / name).parent.mkdir(parents=True, exist_ok=True)
+        pack.extract_file(file_info['digest'], res_dir / INPUTS_DIR / name, mode=file_info['mode'])
+    write_manifest(
+        res_dir, {
+            **metadata, 'layout': StorageLayout.DIRECTORY.value,
+            'files': entry['files']
+        }
+    )
+
+
+def rename_pack_entries(
+    data_dir: ty.Union[str, Path], new_names: ty.Dict[str, str], rename: bool = False
+) -> None:
+    """
+    Make packed results available under new names, without rewriting the packfile.
+
+    :param data_dir: Data directory containing the packfile.
+    :param new_names: The new name of each result, by old name.
+    :param rename: If True, the results (and aliases pointing to them) are
+        renamed, otherwise an alias with the new name is added.
+    """
+    data_dir = Path(data_dir)
+    with PackFile(data_dir) as pack:
+        entries = {
+            entry_name:
+            {key: value
+             for key, value in pack.get_entry(entry_name).items() if key != 'name'}
+            for entry_name in pack.entry_names()
+        }
+        aliases = pack.aliases
+        objects = pack.get_objects()
+        pack_name = pack.pack_path.name
+    for entry_name, new_name in new_names.items():
+        if rename:
+            entries[new_name] = entries.pop(entry_name)
+            aliases = {
+                alias: new_name if target == entry_name else target
+                for alias, target in aliases.items()
+            }
+        else:
+            aliases[new_name] = entry_name
+    _write_index(data_dir, pack_name, entries=entries, aliases=aliases, objects=objects)
+
+
+def _get_name_key(name: str) -> bytes:
+    """Get the key of a result or alias in the index."""
+    return hashlib.sha256(name.encode()).digest()[:_NAME_KEY_SIZE]
+
+
+def _write_index(
+    data_dir: Path, pack_name: str, entries: ty.Dict[str, ty.Dict[str, ty.Any]],
+    aliases: ty.Dict[str, str], objects: ty.Dict[str, ty.Dict[str, ty.Any]]
+) -> None:
+    """
+    Write the index of a packfile, see :class:`PackFile`.
+
+    :param data_dir: Data directory containing the packfile.
+    :param pack_name: File name of the packfile.
+    :param entries: Description of each result, by name.
+    :param aliases: Name of the result of each alias, by alias name.
+    :param objects: Offset, length and uncompressed size of each object, by digest.
+    """
+    descriptions = {name: {**entry, 'name': name} for name, entry in entries.items()}
+    descriptions.update((alias, {
+        'name': alias,
+        'alias': target
+    }) for alias, target in aliases.items())
+    # the descriptions follow the tables, and are followed by the names
+    blobs = [
+        json.dumps(description, sort_keys=True).encode() for description in descriptions.values()
+    ]
+    offset = _HEADER.size + len(blobs) * _ENTRY_RECORD.size + len(objects) * _OBJECT_RECORD.size
+    entry_records = []
+    for name, blob in zip(descriptions, blobs):
+        entry_records.append(_ENTRY_RECORD.pack(_get_name_key(name), offset, len(blob)))
+        offset += len(blob)
+    names = json.dumps({'entries': sorted(entries), 'aliases': aliases}, sort_keys=True).encode()
+
+    fd, tmp_index = tempfile.mkstemp(dir=data_dir, prefix=PACK_INDEX_FILE)
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(
+            _HEADER.pack(
+                INDEX_MAGIC, PACK_VERSION, pack_name.encode(), len(entry_records), len(objects),
+                offset, len(names)
+            )
+        )
+        # the records start with their keys, and hence sort by them
+        handle.writelines(sorted(entry_records))
+        handle.writelines(
+            _OBJECT_RECORD.
+            pack(bytes.fromhex(digest), info['offset'], info['length'], info['size'])
+            for digest, info in sorted(objects.items())
+        )
+        handle.writelines(blobs)
+        handle.write(names)
+    os.replace(tmp_index, data_dir / PACK_INDEX_FILE)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the ``rehash`` and ``verify`` commands, which compute the
+keys of results again from their stored inputs, without running the
+actual codes.
+"""
+
+import os
+import tempfile
+import contextlib
+import typing as ty
+from pathlib import Path
+
+from ._storage import INPUTS_DIR, read_manifest, verify_result_dir
+from ._index import INDEX_FILE, EntryIndex
+from ._pack import PackFile, rename_pack_entries
+from ._hash_rules import HashRules
+
+__all__ = ('rehash_data_dir', 'verify_data_dir')
+
+
+def rehash_data_dir(
+    data_dir: ty.Union[str, Path],
+    hash_algorithm: ty.Optional[str] = None,
+    rename: bool = False,
+    max_workers: int = 1
+) -> ty.Dict[str, str]:
+    """
+    Compute the keys of the results with stored inputs again, e.g. after
+    changing the hash algorithm or the normalization of the submit file,
+    and make the results available under their new names.
+
+    By default, an alias (symbolic link) with the new name is created for
+    each result directory, such that the result is found under both keys.
+    Packed results get an alias in the packfile instead. Results without
+    stored inputs are left untouched.
+
+    :param data_dir: Data directory containing the result directories.
+    :param hash_algorithm: Hash algorithm of the new keys. By default,
+        the hash algorithm of each result is kept.
+    :param rename: If True, the results (and aliases pointing to them)
+        are renamed instead.
+    :param max_workers: Number of processes computing keys.
+    :return: The new name of each updated result directory, by old name.
+    """
+    data_dir = Path(data_dir)
+    new_names = _map_entries(_get_entry_name, data_dir, max_workers, hash_algorithm)
+
+    # names of the packed results and their aliases
+    packed_names: ty.Set[str] = set()
+    pack = PackFile.open(data_dir)
+    if pack is not None:
+        packed_names.update(pack.entry_names(), pack.aliases)
+        pack.close()
+
+    renamed = {}
+    renamed_packed = {}
+    for entry_name, new_name in new_names.items():
+        if new_name is None or new_name == entry_name:
+            continue
+        new_path = data_dir / new_name
+        if new_path.exists() or new_path.is_symlink() or new_name in packed_names:
+            continue
+        renamed[entry_name] = new_name
+        packed_names.add(new_name)
+        if not (data_dir / entry_name).is_dir():
+            renamed_packed[entry_name] = new_name
+        elif rename:
+            os.rename(data_dir / entry_name, new_path)
+            for path in data_dir.glob('mock-*'):
+                if path.is_symlink() and os.readlink(path) == entry_name:
+                    path.unlink()
+                    path.symlink_to(new_name, target_is_directory=True)
+        else:
+            new_path.symlink_to(entry_name, target_is_directory=True)
+    if renamed_packed:
+        rename_pack_entries(data_dir, renamed_packed, rename=rename)
+
+    # the index only refers to existing result directories
+    if rename and renamed and (data_dir / INDEX_FILE).exists():
+        with EntryIndex(data_dir) as index:
+            for entry_name in renamed:
+                index.remove(entry_name)
+    return renamed
+
+
+def verify_data_dir(data_dir: ty.Union[str, Path],
+                    max_workers: int = 1) -> ty.Dict[str, ty.List[str]]:
+    """
+    Check the result directories of a data directory.
+
+    The stored files of each result (including the packed results) are
+    compared to their digests and, if its inputs are stored, the name of
+    the result is compared to the key of its inputs.
+
+    :param data_dir: Data directory containing the result directories.
+    :param max_workers: Number of processes verifying results.
+    :return: Descriptions of the problems, for the results which have any.
+    """
+    problems = _map_entries(_verify_entry, Path(data_dir), max_workers)
+    return {
+        entry_name: entry_problems
+        for entry_name, entry_problems in problems.items() if entry_problems
+    }
+
+
+def _map_entries(func: ty.Callable[..., ty.Any], data_dir: Path, max_workers: int,
+                 *args: ty.Any) -> ty.Dict[str, ty.Any]:
+    """
+    Apply a function to each result directory of the data directory, and to
+    each packed result without a result directory, in a pool of processes.
+    """
+    # imported here to keep the start-up time of the executable low
+    from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+
+    res_dirs = [path for path in data_dir.glob('mock-*') if path.is_dir() and not path.is_symlink()]
+    pack = PackFile.open(data_dir)
+    if pack is not None:
+        res_dirs.extend(
+            data_dir / entry_name for entry_name in pack.entry_names()
+            if not (data_dir / entry_name).exists()
+        )
+        pack.close()
+    res_dirs.sort()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, str(res_dir), *args) for res_dir in res_dirs]
+        return {res_dir.name: future.result() for res_dir, future in zip(res_dirs, futures)}
+
+
+def _get_entry_name(res_dir: str, hash_algorithm: ty.Optional[str] = None) -> ty.Optional[str]:
+    """
+    Get the name of a result directory according to the key of its stored
+    inputs, or ``None`` if it has no stored inputs.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from ._cli import get_hash, get_result_dir_name, split_result_dir_name
+
+    with _open_inputs(Path(res_dir)) as (inputs, inputs_dir):
+        if inputs is None:
+            return None
+        label = inputs['label']
+        hash_rules = HashRules(**inputs.get('hash_rules', {}))
+        if hash_algorithm is None:
+            hash_algorithm = split_result_dir_name(Path(res_dir).name, label)[0]
+        hash_digest = get_hash(
+            hash_algorithm=hash_algorithm, directory=inputs_dir, hash_rules=hash_rules
+        ).hexdigest()
+    return get_result_dir_name(label=label, hash_algorithm=hash_algorithm, hash_digest=hash_digest)
+
+
+@contextlib.contextmanager
+def _open_inputs(res_dir: Path) -> ty.Iterator[ty.Tuple[ty.Optional[ty.Dict[str, ty.Any]], Path]]:
+    """
+    Get the stored inputs of a result as in its manifest, and the directory
+    containing them, into which they are extracted for packed results.
+    """
+    if res_dir.is_dir():
+        manifest = read_manifest(res_dir) or {}
+        yield manifest.get('inputs'), res_dir / INPUTS_DIR
+        return
+    with PackFile(res_dir.parent) as pack:
+        inputs = pack.get_inputs(res_dir.name)
+        if inputs is None:
+            yield None, res_dir / INPUTS_DIR
+            return
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            inputs_dir = Path(tmp_dir)
+            for name, file_info in inputs['files'].items():
+                (inputs_dir / name).parent.mkdir(parents=True, exist_ok=True)
+                pack.extract_file(file_info['digest'], inputs_dir / name)
+            yield inputs, inputs_dir
+
+
+def _verify_entry(res_dir: str) -> ty.List[str]:
+    """Get the problems of a result directory or packed result, see :func:`verify_data_dir`."""
+    if Path(res_dir).is_dir():
+        problems = verify_result_dir(Path(res_dir))
+    else:
+        with PackFile(Path(res_dir).parent) as pack:
+            problems = pack.verify_entry(Path(res_dir).name)
+    if not problems:
+        entry_name = _get_entry_name(res_dir)
+        if entry_name is not None and entry_name != Path(res_dir).name:
+            problems.append(f"the stored inputs have the key of '{entry_name}'")
+    return problems
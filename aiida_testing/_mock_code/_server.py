@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Implements a resident server for running the mock code, which avoids
+starting a new Python interpreter for every calculation.
+
+The server listens on a Unix socket. For each request, it forks a
+child process (with all modules already imported), which takes over
+the working directory, environment and standard streams of the
+client, and runs :func:`aiida_testing._mock_code._cli.run`.
+"""
+
+import os
+import sys
+import json
+import array
+import struct
+import socket
+import signal
+import argparse
+import socketserver
+import typing as ty
+
+__all__ = ('request_run', 'serve')
+
+_HEADER = struct.Struct('!I')
+_STREAM_FDS = (0, 1, 2)
+
+
+def request_run(socket_path: str) -> ty.Optional[int]:
+    """
+    Ask the mock code server to run the mock code for the current process.
+
+    The working directory, environment variables and standard streams of
+    the current process are forwarded to the server.
+
+    :param socket_path: Path of the Unix socket of the server.
+    :return: The exit code of the mock code, or ``None`` if the server is
+        not available and the mock code needs to be run in-process.
+    """
+    payload = json.dumps({'cwd': os.getcwd(), 'env': dict(os.environ)}).encode()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendmsg([_HEADER.pack(len(payload))],
+                         [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', _STREAM_FDS))])
+            sock.sendall(payload)
+            response = _recv_message(sock)
+    except OSError:
+        return None
+    if response is None:
+        return None
+    return int(json.loads(response.decode())['exit_code'])
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> ty.Optional[bytes]:
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _recv_message(sock: socket.socket) -> ty.Optional[bytes]:
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    return _recv_exactly(sock, _HEADER.unpack(header)[0])
+
+
+def _send_message(sock: socket.socket, message: bytes) -> None:
+    sock.sendall(_HEADER.pack(len(message)) + message)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Runs the mock code for a single request, in a forked child process."""
+    def handle(self) -> None:
+        fds = array.array('i')
+        header, ancdata, _, _ = self.request.recvmsg(
+            _HEADER.size, socket.CMSG_SPACE(len(_STREAM_FDS) * fds.itemsize)
+        )
+        for level, kind, data in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+        if len(header) != _HEADER.size or len(fds) != len(_STREAM_FDS):
+            return
+        payload = _recv_exactly(self.request, _HEADER.unpack(header)[0])
+        if payload is None:
+            return
+        request = json.loads(payload.decode())
+
+        _send_message(
+            self.request,
+            json.dumps({
+                'exit_code': _run_as_client(request['cwd'], request['env'], list(fds))
+            }).encode()
+        )
+
+    def finish(self) -> None:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+def _run_as_client(cwd: str, env: ty.Dict[str, str], fds: ty.List[int]) -> int:
+    """Run the mock code with the working directory, environment and streams of the client."""
+    from ._cli import run  # pylint: disable=import-outside-toplevel,cyclic-import
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    os.chdir(cwd)
+    os.environ.clear()
+    os.environ.update(env)
+    for stream_fd, client_fd in zip(_STREAM_FDS, fds):
+        os.dup2(client_fd, stream_fd)
+        os.close(client_fd)
+
+    try:
+        run()
+    except SystemExit as exc:
+        if exc.code is None:
+            return 0
+        if isinstance(exc.code, int):
+            return exc.code
+        print(exc.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return 0
+
+
+class _MockCodeServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server forking a child process for each request."""
+    max_children = 256
+
+
+def serve(socket_path: str) -> None:
+    """
+    Run the mock code server until it receives ``SIGTERM`` or ``SIGINT``.
+
+    :param socket_path: Path of the Unix socket to listen on.
+    """
+    # import the mock code implementation once, before forking
+    from . import _cli  # pylint: disable=import-outside-toplevel,unused-import,cyclic-import
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    def _shutdown(signum: int, frame: ty.Any) -> None:  # pylint: disable=unused-argument
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    with _MockCodeServer(socket_path, _RequestHandler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(
+        description='Resident server for the aiida-mock-code executable.'
+    )
+    PARSER.add_argument('socket_path', help='Path of the Unix socket to listen on.')
+    serve(PARSER.parse_args().socket_path)
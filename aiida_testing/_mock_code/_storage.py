@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the storage layouts of the mock code results in the data directory.
+"""
+
+import os
+import re
+import json
+import uuid
+import shutil
+import hashlib
+import tempfile
+import typing as ty
+from enum import Enum
+from pathlib import Path
+
+from ._transfer import RestoreMode, transfer_file
+
+__all__ = (
+    'StorageLayout', 'ObjectStore', 'read_manifest', 'write_manifest', 'store_file',
+    'get_temporary_dir', 'iter_temporary_dirs', 'remove_temporary_dirs', 'verify_result_dir',
+    'quarantine_result_dir'
+)
+
+#: Name of the file describing the content of a result directory.
+MANIFEST_FILE = '.mock-manifest.json'
+
+#: Name of the directory in a result directory containing the stored inputs of the calculation.
+INPUTS_DIR = '.mock-inputs'
+
+#: Name of the directory in the data directory containing the content-addressed objects.
+OBJECTS_DIR = '.mock-objects'
+
+#: Name of the directory in the data directory to which incomplete results are moved.
+QUARANTINE_DIR = '.mock-quarantine'
+
+#: Prefix of the temporary directories in which results are recorded before publishing them.
+TEMPORARY_DIR_PREFIX = '.mock-tmp-'
+
+_TEMPORARY_DIR_REGEX = re.compile(re.escape(TEMPORARY_DIR_PREFIX) + r'(.+)-[0-9a-f]{32}')
+
+#: Hash algorithm used to address the objects.
+OBJECT_HASH_ALGORITHM = 'sha256'
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class StorageLayout(Enum):
+    """
+    An enum containing the layouts in which results can be stored.
+    """
+    #: Output files are copied into the result directory, with a
+    #: manifest of their digests.
+    DIRECTORY = 'directory'
+    #: Output files are stored once per content in the object store, and
+    #: the result directory only contains a manifest referencing them.
+    CAS = 'cas'
+
+
+class ObjectStore:
+    """
+    Content-addressable store for output files, shared by all result
+    directories of a data directory.
+
+    Objects are stored in ``<data_dir>/.mock-objects/<xx>/<digest>``,
+    where ``<xx>`` are the first two characters of the SHA-256 digest.
+
+    :param data_dir: Data directory containing the result directories.
+    """
+    def __init__(self, data_dir: ty.Union[str, Path]):
+        self.root = Path(data_dir) / OBJECTS_DIR
+
+    def get_path(self, digest: str) -> Path:
+        """Get the path of the object with the given digest."""
+        return self.root / digest[:2] / digest
+
+    def add(self, path: Path) -> str:
+        """
+        Add a file to the store, and return its digest.
+
+        The file is copied to a temporary file in the store while hashing,
+        and then moved into place. Existing objects are not modified.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.new(OBJECT_HASH_ALGORITHM)
+        with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as tmp_file:
+            try:
+                with open(path, 'rb') as src_file:
+                    for chunk in iter(lambda: src_file.read(_CHUNK_SIZE), b''):
+                        hasher.update(chunk)
+                        tmp_file.write(chunk)
+                tmp_file.close()
+                digest = hasher.hexdigest()
+                object_path = self.get_path(digest)
+                if object_path.exists():
+                    os.unlink(tmp_file.name)
+                else:
+                    object_path.parent.mkdir(exist_ok=True)
+                    os.replace(tmp_file.name, object_path)
+            except BaseException:
+                if os.path.exists(tmp_file.name):
+                    os.unlink(tmp_file.name)
+                raise
+        return digest
+
+    def restore(
+        self,
+        digest: str,
+        dest_path: Path,
+        mode: ty.Optional[int] = None,
+        restore_mode: RestoreMode = RestoreMode.COPY
+    ) -> None:
+        """
+        Copy the object with the given digest to ``dest_path``.
+
+        :param digest: Digest of the object.
+        :param dest_path: Destination path of the file.
+        :param mode: Permission bits to set on the destination file.
+        :param restore_mode: How the object is transferred, see :class:`.RestoreMode`.
+        """
+        object_path = self.get_path(digest)
+        if not object_path.is_file():
+            raise FileNotFoundError(f"Object '{digest}' not found in '{self.root}'.")
+        transfer_file(
+            object_path, dest_path, restore_mode=restore_mode, file_mode=mode, digest=digest
+        )
+
+
+def write_manifest(res_dir: Path, manifest: ty.Dict[str, ty.Any]) -> None:
+    """Write the manifest of a result directory."""
+    with open(res_dir / MANIFEST_FILE, 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+
+
+def read_manifest(res_dir: Path) -> ty.Optional[ty.Dict[str, ty.Any]]:
+    """Read the manifest of a result directory, or return ``None`` if it does not have one."""
+    try:
+        with open(res_dir / MANIFEST_FILE) as handle:
+            return ty.cast(ty.Dict[str, ty.Any], json.load(handle))
+    except FileNotFoundError:
+        return None
+
+
+def store_file(src: Path, dest: Path) -> str:
+    """
+    Copy a file, and return the SHA-256 digest of its content.
+    """
+    hasher = hashlib.new(OBJECT_HASH_ALGORITHM)
+    with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+        for chunk in iter(lambda: src_file.read(_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            dest_file.write(chunk)
+    return hasher.hexdigest()
+
+
+def _get_digest(path: Path) -> str:
+    hasher = hashlib.new(OBJECT_HASH_ALGORITHM)
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_temporary_dir(res_dir: Path) -> Path:
+    """
+    Get a unique temporary directory next to the result directory, in
+    which the result is recorded before it is published by renaming it.
+    """
+    return res_dir.parent / f'{TEMPORARY_DIR_PREFIX}{res_dir.name}-{uuid.uuid4().hex}'
+
+
+def iter_temporary_dirs(data_dir: Path) -> ty.Iterator[ty.Tuple[str, Path]]:
+    """
+    Iterate over the temporary directories of the data directory, with the
+    names of the result directories which are recorded to them.
+    """
+    for path in data_dir.glob(f'{TEMPORARY_DIR_PREFIX}*'):
+        match = _TEMPORARY_DIR_REGEX.fullmatch(path.name)
+        if match is not None and path.is_dir():
+            yield match.group(1), path
+
+
+def remove_temporary_dirs(res_dir: Path) -> ty.List[Path]:
+    """
+    Remove the temporary directories left behind by processes which were
+    killed while recording a result. May only be called while holding the
+    lock of the result, so that it is not being recorded by another process.
+
+    :return: Paths of the removed directories.
+    """
+    removed = []
+    for entry_name, path in iter_temporary_dirs(res_dir.parent):
+        if entry_name == res_dir.name:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+
+def verify_result_dir(res_dir: Path) -> ty.List[str]:
+    """
+    Check that the stored files of a result directory, including its
+    stored inputs, match its manifest.
+
+    Result directories recorded without a manifest can not be verified,
+    and are considered complete.
+
+    :return: Descriptions of the missing or modified files.
+    """
+    manifest = read_manifest(res_dir)
+    if manifest is None:
+        return []
+    object_store = None
+    if manifest.get('layout') == StorageLayout.CAS.value:
+        object_store = ObjectStore(res_dir.parent)
+
+    problems = []
+    for name, file_info in sorted(manifest.get('files', {}).items()):
+        if object_store is not None:
+            path = object_store.get_path(file_info['digest'])
+        else:
+            path = res_dir / name
+        if not path.is_file():
+            problems.append(f"'{name}' is missing")
+        elif _get_digest(path) != file_info['digest']:
+            problems.append(f"'{name}' does not match its digest")
+    for name, file_info in sorted(manifest.get('inputs', {}).get('files', {}).items()):
+        path = res_dir / INPUTS_DIR / name
+        if not path.is_file():
+            problems.append(f"input '{name}' is missing")
+        elif _get_digest(path) != file_info['digest']:
+            problems.append(f"input '{name}' does not match its digest")
+    return problems
+
+
+def quarantine_result_dir(res_dir: Path) -> ty.Optional[Path]:
+    """
+    Move an incomplete result directory out of the way, into the
+    ``.mock-quarantine`` directory of the data directory.
+
+    If the result directory is a symbolic link, its target is moved and
+    the link is removed.
+
+    :return: The new path of the result directory, or ``None`` if it was
+        already moved by another process.
+    """
+    quarantine_dir = res_dir.parent / QUARANTINE_DIR
+    quarantine_dir.mkdir(exist_ok=True)
+    target = res_dir.parent / os.readlink(res_dir) if res_dir.is_symlink() else res_dir
+    dest = quarantine_dir / f'{target.name}-{uuid.uuid4().hex}'
+    moved = True
+    try:
+        os.rename(target, dest)
+    except FileNotFoundError:
+        moved = False
+    if res_dir.is_symlink():
+        try:
+            res_dir.unlink()
+        except FileNotFoundError:
+            pass
+    return dest if moved else None
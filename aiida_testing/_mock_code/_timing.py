@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the timing of the phases of a mock code run, which is
+appended as a JSON line to a timings file.
+"""
+
+import os
+import sys
+import json
+import time
+import typing as ty
+import contextlib
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore  # pylint: disable=invalid-name
+
+__all__ = ('PhaseTimer', 'get_children_cpu_time', 'read_timings', 'summarize_timings')
+
+
+class PhaseTimer:
+    """
+    Accumulates the wall time spent in the phases of a mock code run.
+
+    Phases may be nested, in which case the time of the inner phase is
+    not counted for the outer phase, e.g. the time of the 'hash' phase
+    is not part of the 'lookup' phase around it.
+    """
+    def __init__(self) -> None:
+        self.start_time = time.monotonic()
+        self.phases: ty.Dict[str, float] = {}
+        self.info: ty.Dict[str, ty.Any] = {}
+        self._stack: ty.List[ty.List[ty.Any]] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> ty.Iterator[None]:
+        """Count the time spent in the context for the phase ``name``."""
+        now = time.monotonic()
+        if self._stack:
+            self._add_elapsed(self._stack[-1], now)
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.monotonic()
+            self._add_elapsed(self._stack.pop(), now)
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def _add_elapsed(self, frame: ty.List[ty.Any], now: float) -> None:
+        name, start_time = frame
+        self.phases[name] = self.phases.get(name, 0.) + now - start_time
+        frame[1] = now
+
+    def to_dict(self) -> ty.Dict[str, ty.Any]:
+        """Get the timings and additional information of the run."""
+        return {
+            **self.info,
+            'pid': os.getpid(),
+            'timestamp': time.time(),
+            'total': time.monotonic() - self.start_time,
+            'phases': self.phases,
+        }
+
+    def write(self, path: ty.Union[str, Path]) -> None:
+        """
+        Append the timings to a file as a single JSON line.
+
+        The line is written with a single ``write`` to a file opened in append mode,
+        so that concurrent mock code runs can share the file.
+        """
+        line = (json.dumps(self.to_dict(), sort_keys=True) + '\n').encode()
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def get_children_cpu_time() -> float:
+    """
+    Get the user and system CPU time of all terminated child processes, in seconds.
+    """
+    # the resource module is not available on Windows
+    if sys.platform == 'win32':  # pragma: no cover
+        return 0.
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def read_timings(path: ty.Union[str, Path]) -> ty.List[ty.Dict[str, ty.Any]]:
+    """
+    Read the timings of all mock code runs from a timings file.
+
+    Incomplete lines, e.g. of a run that is still writing, are skipped.
+    """
+    timings = []
+    try:
+        with open(path) as handle:
+            for line in handle:
+                try:
+                    timings.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return timings
+
+
+def summarize_timings(timings: ty.Iterable[ty.Dict[str, ty.Any]],
+                      slowest: int = 5) -> ty.Dict[str, ty.Any]:
+    """
+    Aggregate the timings of mock code runs.
+
+    Runs which restored a result are hits, runs which recorded a result
+    while regenerating test data are regenerations, and all other runs
+    are misses. The overhead of the mock code is the time of a run which
+    is not spent running the actual code. The time saved is the sum of
+    the runtimes of the actual code when the restored results were
+    recorded, where known.
+
+    :param timings: Timings of the runs, as read by :func:`read_timings`.
+    :param slowest: Number of labels with the largest total time to report.
+    :return: The totals, and for the slowest labels their number of runs, total time and overhead.
+    """
+    summary: ty.Dict[str, ty.Any] = {
+        'runs': 0,
+        'hits': 0,
+        'misses': 0,
+        'regenerations': 0,
+        'overhead': 0.,
+        'execute': 0.,
+        'time_saved': 0.,
+    }
+    labels: ty.Dict[str, ty.Dict[str, ty.Any]] = {}
+    for timing in timings:
+        execute_time = timing.get('phases', {}).get('execute', 0.)
+        overhead = timing.get('total', 0.) - execute_time
+        summary['runs'] += 1
+        summary['overhead'] += overhead
+        summary['execute'] += execute_time
+        if timing.get('outcome') == 'restored':
+            summary['hits'] += 1
+            summary['time_saved'] += timing.get('recorded_runtime') or 0.
+        elif timing.get('outcome') == 'recorded' and timing.get('regenerate'):
+            summary['regenerations'] += 1
+        else:
+            summary['misses'] += 1
+        label = labels.setdefault(timing.get('label', ''), {'runs': 0, 'total': 0., 'overhead': 0.})
+        label['runs'] += 1
+        label['total'] += timing.get('total', 0.)
+        label['overhead'] += overhead
+
+    slowest_labels = sorted(labels.items(), key=lambda item: item[1]['total'], reverse=True)
+    summary['slowest_labels'] = [
+        dict(label=name, **label) for name, label in slowest_labels[:slowest]
+    ]
+    return summary
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the transfer of stored output files to the working directory.
+"""
+
+import os
+import sys
+import stat
+import shutil
+import hashlib
+import typing as ty
+from enum import Enum
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore  # pylint: disable=invalid-name
+
+__all__ = ('RestoreMode', 'RestoreError', 'transfer_file', 'create_dirs', 'run_transfers')
+
+#: ``FICLONE`` ioctl request number on Linux, see ``ioctl_ficlone(2)``.
+FICLONE = 0x40049409
+
+_CHUNK_SIZE = 1024 * 1024
+
+_T = ty.TypeVar('_T')
+
+
+class RestoreError(Exception):
+    """
+    Raised when a stored result can not be restored to the working directory.
+    """
+
+
+class RestoreMode(Enum):
+    """
+    An enum containing the ways in which stored output files are restored.
+    """
+    #: Plain copy of the file content.
+    COPY = 'copy'
+    #: Copy-on-write clone (reflink) where the filesystem supports it,
+    #: otherwise an in-kernel copy (``copy_file_range`` / ``sendfile``).
+    CLONE = 'clone'
+    #: Copy-on-write clone where the filesystem supports it, otherwise
+    #: a hard link to the stored file if it is read-only, which guards
+    #: it against modification through the link.
+    LINK = 'link'
+
+
+def transfer_file(
+    src: Path,
+    dest: Path,
+    restore_mode: RestoreMode = RestoreMode.COPY,
+    file_mode: ty.Optional[int] = None,
+    digest: ty.Optional[str] = None,
+) -> None:
+    """
+    Transfer a stored output file to the destination path.
+
+    Files that are already present at the destination are skipped if
+    they are the same file (e.g. a hard link), or if ``digest`` is
+    given and the destination has the same size and SHA-256 digest.
+
+    :param src: Path of the stored file.
+    :param dest: Destination path.
+    :param restore_mode: How the file is transferred, see :class:`RestoreMode`.
+    :param file_mode: Permission bits to set on the destination file.
+    :param digest: SHA-256 hex digest of the stored file, if known.
+    """
+    if _is_identical(src, dest, digest=digest):
+        return
+    # do not write through existing hard or symbolic links
+    if os.path.lexists(dest) and not os.path.isdir(dest):
+        os.unlink(dest)
+
+    if restore_mode == RestoreMode.COPY:
+        shutil.copyfile(src, dest)
+    elif _reflink(src, dest):
+        pass
+    elif restore_mode == RestoreMode.LINK and _hardlink(src, dest):
+        # the permissions of a hard link are shared with the stored file
+        return
+    elif restore_mode == RestoreMode.CLONE and _copy_file_range(src, dest):
+        pass
+    else:
+        # on Linux, this uses ``sendfile`` internally
+        shutil.copyfile(src, dest)
+
+    if file_mode is not None:
+        os.chmod(dest, file_mode)
+
+
+def create_dirs(dirs: ty.Iterable[Path]) -> None:
+    """
+    Create the given directories, including their parents.
+
+    Directories are created up front and in sorted order, so that
+    parallel transfers never race on creating the same directory.
+    """
+    for path in sorted(set(dirs)):
+        os.makedirs(path, exist_ok=True)
+
+
+def run_transfers(tasks: ty.Sequence[ty.Callable[[], _T]], max_workers: int = 1) -> ty.List[_T]:
+    """
+    Run file transfer tasks, in a thread pool if ``max_workers`` is larger than one.
+
+    The destination directories must already exist, see :func:`create_dirs`.
+    If tasks fail, the error of the first failing task in the given order
+    is raised, independent of the order in which the tasks finished, and
+    the tasks which did not start yet are cancelled.
+
+    :param tasks: Callables performing a single transfer each.
+    :param max_workers: Maximum number of concurrent transfers.
+    :return: The results of the tasks, in the given order.
+    """
+    if max_workers <= 1 or len(tasks) <= 1:
+        return [task() for task in tasks]
+
+    # imported here to keep the start-up time of the executable low
+    from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        futures = [executor.submit(task) for task in tasks]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _is_identical(src: Path, dest: Path, digest: ty.Optional[str]) -> bool:
+    """
+    Check whether the destination already contains the stored file.
+    """
+    try:
+        src_stat = os.stat(src)
+        dest_stat = os.stat(dest)
+    except OSError:
+        return False
+    if not stat.S_ISREG(dest_stat.st_mode) or src_stat.st_size != dest_stat.st_size:
+        return False
+    if (src_stat.st_ino, src_stat.st_dev) == (dest_stat.st_ino, dest_stat.st_dev):
+        return True
+    if digest is None:
+        return False
+    hasher = hashlib.sha256()
+    with open(dest, 'rb') as dest_file:
+        for chunk in iter(lambda: dest_file.read(_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest() == digest
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    """
+    Try to create a copy-on-write clone of ``src`` at ``dest``.
+    """
+    # fcntl is not available on Windows
+    if sys.platform == 'win32':  # pragma: no cover
+        return False
+    try:
+        with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(src: Path, dest: Path) -> bool:
+    """
+    Try to copy ``src`` to ``dest`` in the kernel, using ``copy_file_range``.
+    """
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    try:
+        with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+            remaining = os.fstat(src_file.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(  # type: ignore  # pylint: disable=no-member
+                    src_file.fileno(), dest_file.fileno(), remaining
+                )
+                if copied == 0:
+                    break
+                remaining -= copied
+    except OSError:
+        return False
+    return remaining == 0
+
+
+def _hardlink(src: Path, dest: Path) -> bool:
+    """
+    Try to create a hard link to ``src`` at ``dest``, if ``src`` is read-only.
+
+    Writable stored files are not linked, since the calculation could modify
+    them through the link. Their permissions are left alone.
+    """
+    try:
+        if os.stat(src).st_mode & 0o222:
+            return False
+        if os.path.lexists(dest):
+            os.unlink(dest)
+        os.link(src, dest)
+    except OSError:
+        return False
+    return True
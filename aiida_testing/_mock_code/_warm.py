@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Implements the queue of missing results, and the ``warm`` command which
+records them outside of the test run.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import typing as ty
+from pathlib import Path
+
+from ._env_keys import EnvKeys
+
+__all__ = ('queue_missing_result', 'get_pending_entries', 'warm_data_dir')
+
+#: Name of the directory in the data directory containing the queued inputs.
+PENDING_DIR = '.mock-pending'
+
+#: Name of the file describing a queued input, next to the snapshot of the inputs.
+PENDING_FILE = '.mock-pending.json'
+
+#: Environment variables which are not taken over from the queued calculation.
+_EXCLUDED_ENV_KEYS = (
+    EnvKeys.EXECUTABLE_PATH, EnvKeys.REGENERATE_DATA, EnvKeys.SERVER_SOCKET, EnvKeys.QUEUE_MISSES
+)
+
+
+def queue_missing_result(res_dir: Path, sandbox_dir: Path) -> Path:
+    """
+    Add a snapshot of the inputs of a calculation whose result is missing
+    to the queue of the data directory, together with the mock code
+    settings of the calculation.
+
+    :param res_dir: The missing result directory.
+    :param sandbox_dir: Working directory of the calculation.
+    :return: Path of the queued inputs.
+    """
+    pending_dir = res_dir.parent / PENDING_DIR / res_dir.name
+    if pending_dir.exists():
+        return pending_dir
+    pending_dir.parent.mkdir(exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=pending_dir.parent))
+    try:
+        shutil.copytree(sandbox_dir, tmp_dir / 'inputs', symlinks=True)
+        settings = {
+            key.value: os.environ[key.value]
+            for key in EnvKeys if key not in _EXCLUDED_ENV_KEYS and key.value in os.environ
+        }
+        with open(tmp_dir / PENDING_FILE, 'w') as handle:
+            json.dump({
+                'entry_name': res_dir.name,
+                'env': settings
+            },
+                      handle,
+                      indent=2,
+                      sort_keys=True)
+        os.rename(tmp_dir, pending_dir)
+    except OSError:
+        # e.g. another process queued the same inputs in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return pending_dir
+
+
+def get_pending_entries(data_dir: Path) -> ty.List[ty.Dict[str, ty.Any]]:
+    """
+    Get the queued inputs of a data directory.
+
+    :return: The descriptions of the queued inputs, with their directory as 'path'.
+    """
+    entries = []
+    for path in sorted((data_dir / PENDING_DIR).glob('*/' + PENDING_FILE)):
+        with open(path) as handle:
+            entry = json.load(handle)
+        entry['path'] = path.parent
+        entries.append(entry)
+    return entries
+
+
+def warm_data_dir(data_dir: Path,
+                  executables: ty.Dict[str, str],
+                  max_workers: int = 1) -> ty.Dict[str, ty.Optional[str]]:
+    """
+    Record the results of the queued inputs of a data directory, by running
+    the actual codes in a pool of processes.
+
+    Inputs of labels without an executable are kept in the queue.
+
+    :param data_dir: Data directory containing the queue.
+    :param executables: Paths of the actual executables, by code label.
+    :param max_workers: Maximum number of codes running concurrently.
+    :return: For each processed entry, ``None`` if it was recorded, or the error message.
+    """
+    # imported here to keep the start-up time of the executable low
+    from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+
+    entries = [
+        entry for entry in get_pending_entries(data_dir)
+        if executables.get(entry['env'][EnvKeys.LABEL.value])
+    ]
+    results: ty.Dict[str, ty.Optional[str]] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            entry['entry_name']: executor.submit(
+                _record_entry, entry, str(data_dir.absolute()),
+                executables[entry['env'][EnvKeys.LABEL.value]]
+            )
+            for entry in entries
+        }
+        for entry in entries:
+            results[entry['entry_name']] = futures[entry['entry_name']].result()
+            if results[entry['entry_name']] is None:
+                shutil.rmtree(entry['path'])
+    return results
+
+
+def _record_entry(entry: ty.Dict[str, ty.Any], data_dir: str,
+                  executable_path: str) -> ty.Optional[str]:
+    """
+    Run the mock code on a copy of queued inputs, and return an error message if it fails.
+    """
+    from ._cli import run  # pylint: disable=import-outside-toplevel,cyclic-import
+
+    with tempfile.TemporaryDirectory() as sandbox_dir:
+        shutil.copytree(entry['path'] / 'inputs', Path(sandbox_dir) / 'inputs', symlinks=True)
+        os.chdir(Path(sandbox_dir) / 'inputs')
+        # the worker processes are reused for several entries
+        for key in EnvKeys:
+            os.environ.pop(key.value, None)
+        os.environ.update(entry['env'])
+        os.environ.update({
+            EnvKeys.DATA_DIR.value: data_dir,
+            EnvKeys.EXECUTABLE_PATH.value: executable_path,
+            EnvKeys.REGENERATE_DATA.value: 'False',
+        })
+        try:
+            run()
+        except SystemExit as exc:
+            if exc.code:
+                return str(exc.code)
+        except Exception as exc:  # pylint: disable=broad-except
+            return f'{type(exc).__name__}: {exc}'
+        finally:
+            os.chdir(data_dir)
+        if not (Path(data_dir) / entry['entry_name']).exists():
+            return f"Recorded a different result than '{entry['entry_name']}', the inputs were modified."
+    return None
@@ -9,8 +9,17 @@ from ._fixtures import *
 # Note: This is necessary for the sphinx doc - otherwise it does not find aiida_testing.mock_code.mock_code_factory
 __all__ = (
     "pytest_addoption",
+    "pytest_sessionstart",
+    "pytest_sessionfinish",
+    "pytest_testnodedown",
+    "pytest_terminal_summary",
     "testing_config_action",
     "mock_regenerate_test_data",
     "testing_config",
+    "mock_code_server",
+    "mock_code_concurrency",
+    "mock_code_timings_file",
+    "mock_code_registry",
     "mock_code_factory",
+    "mock_code_factory_session",
 )
@@ -3,17 +3,6 @@
 Defines the environment variable names for the mock code execution.
 """
 
-from enum import Enum
+from .._mock_code._env_keys import EnvKeys
 
-
-class EnvKeys(Enum):
-    """
-    An enum containing the environment variables defined for
-    the mock code execution.
-    """
-    LABEL = 'AIIDA_MOCK_LABEL'
-    DATA_DIR = 'AIIDA_MOCK_DATA_DIR'
-    EXECUTABLE_PATH = 'AIIDA_MOCK_EXECUTABLE_PATH'
-    IGNORE_FILES = 'AIIDA_MOCK_IGNORE_FILES'
-    IGNORE_PATHS = 'AIIDA_MOCK_IGNORE_PATHS'
-    REGENERATE_DATA = 'AIIDA_MOCK_REGENERATE_DATA'
+__all__ = ('EnvKeys', )
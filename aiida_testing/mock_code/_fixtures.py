@@ -3,10 +3,16 @@
 Defines a pytest fixture for creating mock AiiDA codes.
 """
 
+import re
+import sys
+import json
+import shlex
+import time
 import uuid
 import shutil
-import inspect
 import pathlib
+import tempfile
+import subprocess
 import typing as ty
 import warnings
 import collections
@@ -14,19 +20,45 @@ import collections
 import click
 import pytest
 
-from aiida.orm import Code
-
-from ._env_keys import EnvKeys
+from aiida.common.exceptions import NotExistent
+from aiida.orm import Code, Computer, load_code
+
+from .._mock_code._env_keys import EnvKeys
+from .._mock_code._hashing import split_hash_algorithm, validate_hash_algorithm
+from .._mock_code._hash_rules import HashRules
+from .._mock_code._digest_cache import get_default_digest_cache_path
+from .._mock_code._storage import StorageLayout
+from .._mock_code._transfer import RestoreMode
+from .._mock_code._locking import DEFAULT_LOCK_TIMEOUT
+from .._mock_code._timing import read_timings, summarize_timings
 from .._config import Config, CONFIG_FILE_NAME, ConfigActions
 
 __all__ = (
     "pytest_addoption",
+    "pytest_sessionstart",
+    "pytest_sessionfinish",
+    "pytest_testnodedown",
+    "pytest_terminal_summary",
     "testing_config_action",
     "mock_regenerate_test_data",
     "testing_config",
+    "mock_code_server",
+    "mock_code_concurrency",
+    "mock_code_timings_file",
+    "mock_code_registry",
     "mock_code_factory",
+    "mock_code_factory_session",
 )
 
+#: Seconds to wait for the mock code server to start.
+SERVER_START_TIMEOUT = 30.
+
+#: Label of the computer of the mock codes created by ``mock_code_factory_session``.
+SESSION_COMPUTER_LABEL = 'localhost-mock-code'
+
+#: Entry point of the scheduler plugin restoring existing results in-process.
+IN_PROCESS_SCHEDULER = 'aiida_testing.direct_in_process'
+
 
 def pytest_addoption(parser):
     """Add pytest command line options."""
@@ -43,6 +75,97 @@ def pytest_addoption(parser):
         default=False,
         help="Regenerate test data."
     )
+    parser.addoption(
+        "--mock-code-server",
+        action="store_true",
+        default=False,
+        help="Run mock codes through a resident server process, instead of starting a new Python " \
+             "interpreter for each calculation."
+    )
+    parser.addoption(
+        "--mock-code-capacity",
+        type=int,
+        default=None,
+        help="Maximum number of cores used by actual codes running concurrently on this machine " \
+             "(e.g. when regenerating test data with pytest-xdist). Overrides the capacity in " \
+             f"{CONFIG_FILE_NAME}; 0 disables the limit."
+    )
+    parser.addoption(
+        "--mock-code-timings",
+        default=None,
+        help="File to which the time spent in each phase of the mock code runs is appended as " \
+             "JSON lines (default: a file in the pytest temporary directory)."
+    )
+    parser.addoption(
+        "--mock-code-report",
+        default=None,
+        help="File to which the summary of the mock code runs of the session is written as JSON."
+    )
+
+
+# pylint: disable=protected-access
+def pytest_sessionstart(session):
+    """Remember the start of the session, to select the timings of its mock code runs."""
+    session.config._mock_code_session_start = time.time()
+    session.config._mock_code_timings = []
+
+
+def pytest_sessionfinish(session):
+    """Collect the timings of the mock code runs, or send them to the pytest-xdist controller."""
+    config = session.config
+    timings_file = getattr(config, '_mock_code_timings_file', None)
+    if timings_file is None:
+        return
+    timings = [
+        timing for timing in read_timings(timings_file)
+        if timing.get('timestamp', 0.) >= config._mock_code_session_start
+    ]
+    if hasattr(config, 'workeroutput'):
+        config.workeroutput['mock_code_timings'] = timings
+    else:
+        config._mock_code_timings.extend(timings)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):  # pylint: disable=unused-argument
+    """Collect the timings of the mock code runs of a pytest-xdist worker."""
+    node.config._mock_code_timings.extend(node.workeroutput.get('mock_code_timings', []))
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Summarize the mock code runs of the session, and write the report file if requested."""
+    config = terminalreporter.config
+    # workers sharing a timings file each send all of its runs
+    timings = list({(timing['pid'], timing['timestamp']): timing
+                    for timing in getattr(config, '_mock_code_timings', [])}.values())
+    report_file = config.getoption("--mock-code-report")
+    if not timings and not report_file:
+        return
+
+    summary = summarize_timings(timings)
+    if report_file:
+        with open(report_file, 'w') as handle:
+            json.dump(summary, handle, indent=2)
+    if not timings:
+        return
+    terminalreporter.write_sep('-', 'mock code summary')
+    terminalreporter.write_line(
+        f"{summary['runs']} runs: {summary['hits']} hits, {summary['misses']} misses, "
+        f"{summary['regenerations']} regenerations"
+    )
+    terminalreporter.write_line(
+        f"mock code overhead: {summary['overhead']:.2f} s, actual codes: {summary['execute']:.2f} s, "
+        f"estimated time saved: {summary['time_saved']:.2f} s"
+    )
+    terminalreporter.write_line("slowest labels:")
+    for label in summary['slowest_labels']:
+        terminalreporter.write_line(
+            f"  {label['label']}: {label['total']:.2f} s in {label['runs']} runs "
+            f"({label['overhead']:.2f} s overhead)"
+        )
+
+
+# pylint: enable=protected-access
 
 
 @pytest.fixture(scope='session')
@@ -75,10 +198,90 @@ def testing_config(testing_config_action):  # pylint: disable=redefined-outer-na
         config.to_file()
 
 
+@pytest.fixture(scope='session')
+def mock_code_server(request):
+    """
+    Start the mock code server for the test session, if enabled by the
+    ``--mock-code-server`` command line option.
+
+    Yields the path of the Unix socket of the server, or None if it is not enabled.
+    Mock codes fall back to running in-process if the server is not available.
+    """
+    if not request.config.getoption("--mock-code-server"):
+        yield None
+        return
+
+    with tempfile.TemporaryDirectory() as socket_dir:
+        socket_path = str(pathlib.Path(socket_dir) / 'mock-code.sock')
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, '-m', 'aiida_testing._mock_code._server', socket_path]
+        )
+        try:
+            start_time = time.monotonic()
+            while not pathlib.Path(socket_path).exists():
+                if process.poll(
+                ) is not None or time.monotonic() - start_time > SERVER_START_TIMEOUT:
+                    warnings.warn("The mock code server could not be started.")
+                    break
+                time.sleep(0.05)
+            yield socket_path
+        finally:
+            process.terminate()
+            process.wait()
+
+
+@pytest.fixture(scope='session')
+def mock_code_concurrency(request, testing_config):  # pylint: disable=redefined-outer-name
+    """
+    Get the limit on the cores used by actual codes running concurrently.
+
+    Returns a dict with the total number of cores 'capacity' (0 if not limited),
+    and the number of cores used by each code label 'weights' (default 1). The
+    capacity is read from the ``--mock-code-capacity`` command line option,
+    or else from the ``mock_code_concurrency`` section of the config file.
+    """
+    concurrency = testing_config.get('mock_code_concurrency', {})
+    capacity = request.config.getoption("--mock-code-capacity")
+    if capacity is None:
+        capacity = concurrency.get('capacity', 0)
+    return {'capacity': capacity, 'weights': dict(concurrency.get('weights', {}))}
+
+
+@pytest.fixture(scope='session')
+def mock_code_timings_file(request, tmp_path_factory):
+    """
+    Get the path of the file to which mock codes append the timings of their runs.
+
+    The path is read from the ``--mock-code-timings`` command line option, and
+    defaults to ``mock-code-timings.jsonl`` in the temporary directory of the
+    test session (of each worker, when using ``pytest-xdist``).
+    """
+    timings_file = pathlib.Path(
+        request.config.getoption("--mock-code-timings")
+        or tmp_path_factory.getbasetemp() / 'mock-code-timings.jsonl'
+    ).absolute()
+    # read back at the end of the session, see pytest_sessionfinish
+    request.config._mock_code_timings_file = timings_file  # pylint: disable=protected-access
+    return timings_file
+
+
+@pytest.fixture(scope='session')
+def mock_code_registry():
+    """
+    Get the registry of the mock codes stored in the test session.
+
+    Maps the computer, entry point and settings of each mock code to the UUID
+    of its Code node, such that mock codes with the same settings are only
+    stored once.
+    """
+    return {}
+
+
 @pytest.fixture(scope='function')
 def mock_code_factory(
-    aiida_localhost, testing_config, testing_config_action, mock_regenerate_test_data
-):  # pylint: disable=redefined-outer-name
+    aiida_localhost, testing_config, testing_config_action, mock_regenerate_test_data,
+    mock_code_server, mock_code_concurrency, mock_code_timings_file, mock_code_registry
+):  # pylint: disable=redefined-outer-name,too-many-arguments
     """
     Fixture to create a mock AiiDA Code.
 
@@ -86,6 +289,51 @@ def mock_code_factory(
         Read config file if present ('read'), require config file ('require') or generate new config file ('generate').
 
 
+    """
+    return _make_mock_code_factory(
+        get_localhost=lambda: aiida_localhost,
+        testing_config=testing_config,
+        testing_config_action=testing_config_action,
+        mock_regenerate_test_data=mock_regenerate_test_data,
+        mock_code_server=mock_code_server,
+        mock_code_concurrency=mock_code_concurrency,
+        mock_code_timings_file=mock_code_timings_file,
+        mock_code_registry=mock_code_registry
+    )
+
+
+@pytest.fixture(scope='session')
+def mock_code_factory_session(
+    aiida_profile, tmp_path_factory, testing_config, testing_config_action,
+    mock_regenerate_test_data, mock_code_server, mock_code_concurrency, mock_code_timings_file,
+    mock_code_registry
+):  # pylint: disable=redefined-outer-name,too-many-arguments,unused-argument
+    """
+    Fixture to create a mock AiiDA Code, which can be used by module- and
+    session-scoped fixtures, see :py:func:`mock_code_factory`.
+
+    The codes are set up on a localhost computer of the test session, whose
+    working directory is in the temporary directory of the session.
+    """
+    workdir = tmp_path_factory.mktemp('mock-code-workdir')
+    return _make_mock_code_factory(
+        get_localhost=lambda: _get_localhost_computer(SESSION_COMPUTER_LABEL, workdir),
+        testing_config=testing_config,
+        testing_config_action=testing_config_action,
+        mock_regenerate_test_data=mock_regenerate_test_data,
+        mock_code_server=mock_code_server,
+        mock_code_concurrency=mock_code_concurrency,
+        mock_code_timings_file=mock_code_timings_file,
+        mock_code_registry=mock_code_registry
+    )
+
+
+def _make_mock_code_factory(
+    get_localhost, testing_config, testing_config_action, mock_regenerate_test_data,
+    mock_code_server, mock_code_concurrency, mock_code_timings_file, mock_code_registry
+):  # pylint: disable=redefined-outer-name,too-many-arguments
+    """
+    Get the function creating mock codes on the computer returned by ``get_localhost``.
     """
     def _get_mock_code(
         label: str,
@@ -94,15 +342,35 @@ def mock_code_factory(
         ignore_files: ty.Iterable[str] = ('_aiidasubmit.sh', ),
         ignore_paths: ty.Iterable[str] = ('_aiidasubmit.sh', ),
         executable_name: str = '',
+        hash_algorithm: str = 'md5',
+        digest_cache: ty.Union[bool, str, pathlib.Path] = False,
+        storage_layout: str = StorageLayout.DIRECTORY.value,
+        restore_mode: str = RestoreMode.COPY.value,
+        use_index: bool = False,
+        transfer_workers: int = 1,
+        lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
+        log_file: ty.Union[None, str, pathlib.Path] = None,
+        verify_results: bool = False,
+        queue_misses: bool = False,
+        store_inputs: bool = False,
+        in_process: bool = False,
+        retrieve_only: ty.Union[bool, ty.Iterable[str]] = False,
+        hash_workers: int = 1,
+        record_runtime: bool = False,
         _config: dict = testing_config,
         _config_action: str = testing_config_action,
         _regenerate_test_data: bool = mock_regenerate_test_data,
-    ):  # pylint: disable=too-many-arguments
+        _concurrency: dict = mock_code_concurrency,
+        _timings_file: pathlib.Path = mock_code_timings_file,
+    ):  # pylint: disable=too-many-arguments,too-many-locals
         """
         Creates a mock AiiDA code. If the same inputs have been run previously,
         the results are copied over from the corresponding sub-directory of
         the ``data_dir_abspath``. Otherwise, the code is executed.
 
+        Codes with the same settings are stored only once per test session,
+        and returned again by subsequent calls.
+
         Parameters
         ----------
         label :
@@ -121,6 +389,66 @@ def mock_code_factory(
             after the code has been executed.
         executable_name :
             Name of code executable to search for in PATH, if configuration file does not specify location already.
+        hash_algorithm :
+            Name of the algorithm used to hash the inputs, e.g. 'md5', 'blake2b' or, if the ``xxhash``
+            package is installed, 'xxh3_128'. Results stored with the default 'md5' are also found when
+            a different algorithm is used. Algorithms with the suffix '-tree', e.g. 'blake2b-tree', hash
+            each file separately, which allows re-using the digests of unchanged files.
+        digest_cache :
+            Path of a database in which the digests of input files are cached. If True, a database in the
+            user cache directory is used. Only effective for the per-file ('-tree') hash algorithms.
+        storage_layout :
+            Layout in which new results are stored: 'directory' copies the output files into the result
+            directory, 'cas' stores each distinct file only once in the content-addressable object store
+            of the data directory, and writes a manifest referencing the files to the result directory.
+            Results stored in either layout can be read back regardless of this setting.
+        restore_mode :
+            How stored results are copied to the calculation folder: 'copy' copies the content, 'clone'
+            creates copy-on-write clones (reflinks) where the filesystem supports them and falls back to an
+            in-kernel copy, and 'link' falls back to hard links to the stored files which are read-only instead.
+            Files already present with identical content are not copied again.
+        use_index :
+            If True, results are looked up in and recorded to an SQLite index in the data directory,
+            which stores their size, runtime, executable and usage.
+        transfer_workers :
+            Number of threads used to copy output files when recording and restoring results. Using
+            several threads can speed up results with many files, in particular on network filesystems.
+        lock_timeout :
+            Seconds to wait for a result which is being recorded by another process (e.g. another
+            pytest-xdist worker) with the same inputs, before failing the calculation. If zero, wait
+            indefinitely.
+        log_file :
+            Path of a file to which the mock code executable logs whether it restored, recorded, or
+            waited for a result.
+        verify_results :
+            If True, stored results are checked against the digests in their manifest before they are
+            used. Incomplete or modified results are moved to the '.mock-quarantine' directory of the
+            data directory, and recorded again.
+        queue_misses :
+            If True, the inputs of calculations whose results are missing, and for which no executable
+            is available, are queued in the data directory. They can then be recorded in parallel with
+            ``aiida-mock-code warm``.
+        store_inputs :
+            If True, the inputs of recorded calculations are stored with their outputs, such that
+            their keys can be computed again with ``aiida-mock-code rehash``.
+        in_process :
+            If True, existing results are restored by the test process when the calculation is submitted,
+            without running the submit script and the ``aiida-mock-code`` executable. The code is set up
+            on a computer of the ``aiida_testing.direct_in_process`` scheduler, and calculations whose result
+            does not exist yet are run as usual.
+        retrieve_only :
+            If True, only the output files retrieved by AiiDA, i.e. those matching the ``retrieve_list``
+            and ``retrieve_temporary_list`` of the calculation, are recorded and restored. Alternatively,
+            a list of relative paths (UNIX shell style patterns allowed) of the files to record and restore.
+            Large scratch files which the parser does not read are then neither stored nor restored.
+        hash_workers :
+            Number of threads hashing the input files concurrently. Requires a per-file ('-tree') hash
+            algorithm, whose keys do not depend on the number of threads. Speeds up calculations with
+            many large input files.
+        record_runtime :
+            If True, the runtime of the actual code is stored in the manifest of recorded results, and
+            reported as their ``recorded_runtime`` in the timings when they are restored. It is off by
+            default, since the runtime changes each time a result is regenerated.
         _config :
             Dict with contents of configuration file
         _config_action :
@@ -128,6 +456,11 @@ def mock_code_factory(
             If 'generate', add new key (label) to config dictionary.
         _regenerate_test_data :
             If True, regenerate test data instead of reusing.
+        _concurrency :
+            Dict with the total number of cores 'capacity' for actual codes running concurrently,
+            and the number of cores used by each code label 'weights'.
+        _timings_file :
+            Path of the file to which the timings of the mock code runs are appended.
 
         .. deprecated:: 0.1.0
             Keyword `ingore_files` is deprecated and will be removed in `v1.0`. Use `ignore_paths` instead.
@@ -143,9 +476,18 @@ def mock_code_factory(
             assert isinstance(arg, collections.Iterable) and not isinstance(arg, str), \
                 f"'ignore_files' and 'ignore_paths' arguments must be tuples or lists, found {type(arg)}"
 
-        # we want to set a custom prepend_text, which is why the code
-        # can not be reused.
-        code_label = f'mock-{label}-{uuid.uuid4()}'
+        hashing_env = _get_hashing_env(label, hash_algorithm, digest_cache, hash_workers, _config)
+
+        # raises a ValueError for unknown layouts or modes
+        StorageLayout(storage_layout)
+        RestoreMode(restore_mode)
+
+        if isinstance(retrieve_only, str):
+            raise ValueError("'retrieve_only' must be a boolean, or a list of patterns.")
+        retrieve_patterns = '' if isinstance(retrieve_only, bool) else ':'.join(retrieve_only)
+
+        if transfer_workers < 1:
+            raise ValueError(f"'transfer_workers' must be at least 1, got {transfer_workers}.")
 
         data_dir_pl = pathlib.Path(data_dir_abspath)
         if not data_dir_pl.exists():
@@ -172,25 +514,148 @@ def mock_code_factory(
         if _config_action == ConfigActions.GENERATE.value:
             mock_code_config[label] = code_executable_path
 
+        localhost = get_localhost()
+        computer = _get_in_process_computer(localhost) if in_process else localhost
+        prepend_text = _get_prepend_text([
+            (EnvKeys.LABEL, label),
+            (EnvKeys.DATA_DIR, data_dir_abspath),
+            (EnvKeys.EXECUTABLE_PATH, code_executable_path),
+            (EnvKeys.IGNORE_FILES, ':'.join(ignore_files)),
+            (EnvKeys.IGNORE_PATHS, ':'.join(ignore_paths)),
+            (EnvKeys.REGENERATE_DATA, bool(_regenerate_test_data)),
+            *hashing_env,
+            (EnvKeys.STORAGE_LAYOUT, storage_layout),
+            (EnvKeys.RESTORE_MODE, restore_mode),
+            (EnvKeys.SERVER_SOCKET, mock_code_server or ''),
+            (EnvKeys.INDEX, bool(use_index)),
+            (EnvKeys.TRANSFER_WORKERS, transfer_workers),
+            (EnvKeys.LOCK_TIMEOUT, lock_timeout),
+            # the executable runs in the calculation folder
+            (EnvKeys.LOG_FILE, pathlib.Path(log_file).absolute() if log_file else ''),
+            (EnvKeys.VERIFY_RESULTS, bool(verify_results)),
+            (EnvKeys.CONCURRENCY_CAPACITY, _concurrency['capacity']),
+            (EnvKeys.CONCURRENCY_WEIGHT, _concurrency['weights'].get(label, 1)),
+            (EnvKeys.QUEUE_MISSES, bool(queue_misses)),
+            (EnvKeys.STORE_INPUTS, bool(store_inputs)),
+            (EnvKeys.TIMINGS_FILE, _timings_file),
+            (EnvKeys.RETRIEVE_ONLY, retrieve_only is not False),
+            (EnvKeys.RETRIEVE_PATTERNS, retrieve_patterns),
+            (EnvKeys.RECORD_RUNTIME, bool(record_runtime)),
+        ])
+
+        # the settings of the code are all part of its prepend text
+        registry_key = (computer.uuid, entry_point, mock_executable_path, prepend_text)
+        code = _load_registered_code(mock_code_registry, registry_key)
+        if code is not None:
+            return code
+
         code = Code(
-            input_plugin_name=entry_point,
-            remote_computer_exec=[aiida_localhost, mock_executable_path]
-        )
-        code.label = code_label
-        code.set_prepend_text(
-            inspect.cleandoc(
-                f"""
-                export {EnvKeys.LABEL.value}="{label}"
-                export {EnvKeys.DATA_DIR.value}="{data_dir_abspath}"
-                export {EnvKeys.EXECUTABLE_PATH.value}="{code_executable_path}"
-                export {EnvKeys.IGNORE_FILES.value}="{':'.join(ignore_files)}"
-                export {EnvKeys.IGNORE_PATHS.value}="{':'.join(ignore_paths)}"
-                export {EnvKeys.REGENERATE_DATA.value}={'True' if _regenerate_test_data else 'False'}
-                """
-            )
+            input_plugin_name=entry_point, remote_computer_exec=[computer, mock_executable_path]
         )
-
+        code.label = f'mock-{label}-{uuid.uuid4()}'
+        code.set_prepend_text(prepend_text)
         code.store()
+        mock_code_registry[registry_key] = code.uuid
         return code
 
     return _get_mock_code
+
+
+def _get_hashing_env(
+    label: str, hash_algorithm: str, digest_cache: ty.Union[bool, str, pathlib.Path],
+    hash_workers: int, config: ty.Dict[str, ty.Any]
+) -> ty.List[ty.Tuple[EnvKeys, ty.Any]]:
+    """
+    Validate the hashing settings of a mock code, and get the environment variables passing them
+    to the mock code executable. See :func:`_make_mock_code_factory` for the parameters.
+    """
+    # raises a ValueError for unknown or unavailable algorithms
+    validate_hash_algorithm(hash_algorithm)
+
+    if digest_cache is True:
+        digest_cache = get_default_digest_cache_path()
+
+    # normalization of the inputs when hashing, see the ``mock_code_hash_rules`` of the config file
+    hash_rules = config.get('mock_code_hash_rules', {}).get(label, {})
+    try:
+        HashRules(**hash_rules)
+    except re.error as exc:
+        raise ValueError(f"Invalid hash rules for code label '{label}': {exc}") from exc
+
+    if hash_workers < 1:
+        raise ValueError(f"'hash_workers' must be at least 1, got {hash_workers}.")
+    if hash_workers > 1 and not split_hash_algorithm(hash_algorithm)[1]:
+        raise ValueError(
+            f"'hash_workers' requires a per-file ('-tree') hash algorithm, got '{hash_algorithm}'."
+        )
+
+    return [
+        (EnvKeys.HASH_ALGORITHM, hash_algorithm),
+        (EnvKeys.DIGEST_CACHE, digest_cache or ''),
+        (EnvKeys.HASH_RULES, json.dumps(hash_rules, sort_keys=True) if hash_rules else ''),
+        (EnvKeys.HASH_WORKERS, hash_workers),
+    ]
+
+
+def _get_prepend_text(env: ty.Iterable[ty.Tuple[EnvKeys, ty.Any]]) -> str:
+    """
+    Get the prepend text of a mock code, which exports its settings to the mock code executable.
+
+    Booleans are exported as 'True' or 'False', and all values are quoted for the shell.
+    """
+    return '\n'.join(f'export {key.value}={shlex.quote(str(value))}' for key, value in env)
+
+
+# the return type is an optional ``Code``, which is not followed by mypy (see mypy.ini)
+def _load_registered_code(
+    registry: ty.Dict[ty.Tuple[str, ...], str], key: ty.Tuple[str, ...]
+) -> ty.Any:
+    """
+    Load the code registered for the given key, or return None if there is none,
+    or if it has been deleted since (e.g. by a reset of the database).
+    """
+    code_uuid = registry.get(key)
+    if code_uuid is None:
+        return None
+    try:
+        return load_code(uuid=code_uuid)
+    except NotExistent:
+        del registry[key]
+        return None
+
+
+# the computers are ``Computer`` nodes, which are not followed by mypy (see mypy.ini)
+def _get_in_process_computer(localhost: ty.Any) -> ty.Any:
+    """
+    Get the computer restoring existing results in-process, which uses
+    the working directory of the given localhost computer.
+    """
+    return _get_localhost_computer(
+        f'{localhost.label}-in-process',
+        workdir=localhost.get_workdir(),
+        scheduler_type=IN_PROCESS_SCHEDULER
+    )
+
+
+# the computer is a ``Computer`` node, which is not followed by mypy (see mypy.ini)
+def _get_localhost_computer(
+    label: str, workdir: ty.Union[str, pathlib.Path], scheduler_type: str = 'direct'
+) -> ty.Any:
+    """
+    Get the localhost computer with the given label, which is set up if it does not exist.
+    """
+    try:
+        return Computer.objects.get(label=label)
+    except NotExistent:
+        computer = Computer(
+            label=label,
+            description='localhost computer set up for mock codes',
+            hostname='localhost',
+            workdir=str(workdir),
+            transport_type='local',
+            scheduler_type=scheduler_type
+        )
+        computer.store()
+        computer.set_minimum_job_poll_interval(0.)
+        computer.configure()
+    return computer
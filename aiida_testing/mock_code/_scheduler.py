@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Defines a scheduler plugin which restores existing results of mock codes
+in the process submitting the calculations.
+"""
+
+import uuid
+
+from aiida.schedulers.datastructures import JobInfo, JobState
+from aiida.schedulers.plugins.direct import DirectScheduler
+
+from .._mock_code._in_process import restore_in_process
+
+__all__ = ("InProcessDirectScheduler", )
+
+#: Prefix of the job IDs of calculations whose results were restored in-process.
+IN_PROCESS_JOB_ID_PREFIX = 'mock-restored-'
+
+
+class InProcessDirectScheduler(DirectScheduler):  # type: ignore
+    """
+    Direct scheduler which restores existing results of mock codes when
+    the calculation is submitted, in the process submitting it.
+
+    Restored calculations are not run, and get a job ID with the prefix
+    ``mock-restored-``. These jobs are not passed to ``ps``, but reported
+    as finished on the next update. All other calculations (including those
+    of mock codes whose result does not exist yet) are submitted as usual.
+
+    Only works with the local transport, since the working directory of
+    the calculation is accessed directly.
+    """
+    def submit_from_script(self, working_directory, submit_script):
+        """
+        Restore the existing result of a mock code calculation, or submit
+        the calculation as the direct scheduler does.
+
+        :return: The job ID of the restored or submitted calculation.
+        """
+        if restore_in_process(working_directory, submit_script):
+            return f'{IN_PROCESS_JOB_ID_PREFIX}{uuid.uuid4()}'
+        return super().submit_from_script(working_directory, submit_script)
+
+    def get_jobs(self, jobs=None, user=None, as_dict=False):
+        """
+        Get the jobs of the direct scheduler, with the calculations restored
+        in-process reported as done.
+        """
+        if isinstance(jobs, str):
+            jobs = [jobs]
+        restored = [job_id for job_id in jobs or () if job_id.startswith(IN_PROCESS_JOB_ID_PREFIX)]
+        # without job IDs, ps would list all processes of the user
+        if jobs and len(restored) == len(jobs):
+            joblist = []
+        else:
+            joblist = super().get_jobs(
+                jobs=[job_id for job_id in jobs if job_id not in restored] if jobs else jobs,
+                user=user
+            )
+        for job_id in restored:
+            job = JobInfo()
+            job.job_id = job_id
+            job.job_state = JobState.DONE
+            joblist.append(job)
+        if as_dict:
+            return {job.job_id: job for job in joblist}
+        return joblist
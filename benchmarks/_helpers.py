@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers of the benchmarks of the mock code executable, which create
+synthetic calculation directories and measure the resource usage.
+"""
+import os
+import json
+import typing as ty
+from pathlib import Path
+
+#: Size of the blocks in which the content of synthetic files is written.
+BLOCK_SIZE = 1024 * 1024
+
+#: Submit file of a calculation of a mock code, as written by AiiDA.
+SUBMIT_CONTENT = """#!/bin/bash
+exec > _scheduler-stdout.txt
+exec 2> _scheduler-stderr.txt
+
+export AIIDA_MOCK_LABEL="diff"
+export AIIDA_MOCK_DATA_DIR="/path/to/data"
+export AIIDA_MOCK_EXECUTABLE_PATH="/usr/bin/diff"
+
+'/path/to/bin/aiida-mock-code' '--' 'file1.txt' 'file2.txt' > 'patch.diff'
+"""
+
+
+def _write_file(path: Path, size: int) -> None:
+    """Write a file of ``size`` bytes with incompressible content."""
+    block = os.urandom(min(size, BLOCK_SIZE))
+    with open(path, 'wb') as handle:
+        for offset in range(0, size, BLOCK_SIZE):
+            handle.write(block[:size - offset])
+
+
+def create_synthetic_dir(
+    path: Path,
+    num_files: int,
+    files_per_dir: int = 50,
+    file_size: int = 1024,
+    depth: int = 2
+) -> ty.List[str]:
+    """
+    Create a directory tree with ``num_files`` files of ``file_size`` bytes,
+    spread over directories holding ``files_per_dir`` files each, which are
+    nested ``depth`` levels deep.
+
+    :return: The relative POSIX paths of the directories that were created.
+    """
+    dirnames = []
+    for idx in range(num_files):
+        dir_idx = idx // files_per_dir
+        parts = [f'dir{dir_idx % 10}'] + [f'level{level}' for level in range(depth - 2)]
+        relative_dir = '/'.join(parts[:depth - 1] + [f'sub{dir_idx}'])
+        if idx % files_per_dir == 0:
+            os.makedirs(path / relative_dir, exist_ok=True)
+            dirnames.append(relative_dir)
+        _write_file(path / relative_dir / f'file{idx}.txt', file_size)
+    return dirnames
+
+
+def create_calculation_dir(
+    path: Path, num_files: int, file_size: int = 1024, depth: int = 2
+) -> None:
+    """
+    Create the working directory of a calculation, as prepared by AiiDA:
+    a submit file, the ``.aiida`` directory, and the input files.
+    """
+    create_synthetic_dir(path, num_files=num_files, file_size=file_size, depth=depth)
+    (path / '_aiidasubmit.sh').write_text(SUBMIT_CONTENT)
+    (path / '.aiida').mkdir()
+    (path / '.aiida' / 'calcinfo.json').write_text('{}')
+    (path / '.aiida' / 'job_tmpl.json').write_text('{}')
+
+
+def _read_proc_io() -> ty.Dict[str, int]:
+    """Read the I/O counters of the current process, which are only available on Linux."""
+    try:
+        with open('/proc/self/io') as handle:
+            return {key: int(value) for key, value in (line.split(':') for line in handle)}
+    except OSError:
+        return {}
+
+
+def measure_resources(func: ty.Callable[..., ty.Any], **kwargs: ty.Any) -> ty.Dict[str, int]:
+    """
+    Call ``func`` once in a forked child process, and measure its resource usage:
+
+    * ``peak_rss_kb``: peak resident set size of the child, which starts
+      with the resident memory of the benchmark process
+    * ``syscr``, ``syscw``: number of read and write system calls (Linux only)
+    * ``rchar``, ``wchar``: number of bytes read and written (Linux only)
+    * ``nvcsw``, ``nivcsw``: voluntary and involuntary context switches
+    """
+    if not hasattr(os, 'fork'):
+        return {}
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            os.close(read_fd)
+            before = _read_proc_io()
+            func(**kwargs)
+            after = _read_proc_io()
+            counters = {key: after[key] - before[key] for key in after}
+            os.write(write_fd, json.dumps(counters).encode())
+            exit_code = 0
+        finally:
+            os._exit(exit_code)  # pylint: disable=protected-access
+    os.close(write_fd)
+    with os.fdopen(read_fd) as handle:
+        output = handle.read()
+    _, status, rusage = os.wait4(pid, 0)
+    if status != 0:
+        raise RuntimeError(f'Measuring the resource usage of {func.__name__} failed.')
+    usage = {
+        key: value
+        for key, value in json.loads(output).items() if key in ('syscr', 'syscw', 'rchar', 'wchar')
+    }
+    usage.update(peak_rss_kb=rusage.ru_maxrss, nvcsw=rusage.ru_nvcsw, nivcsw=rusage.ru_nivcsw)
+    return usage
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Configuration and fixtures for the benchmarks of the mock code executable.
+
+Apart from the latency of calculations through the AiiDA engine, the
+benchmarks only use the standard library parts of ``aiida-testing``,
+and do not need an AiiDA profile or network access.
+"""
+import importlib.util
+import typing as ty
+from pathlib import Path
+
+import pytest
+
+from _helpers import create_synthetic_dir, measure_resources
+
+# the fixtures of the AiiDA test profile are only needed by the engine benchmarks
+if importlib.util.find_spec('aiida') is not None:
+    pytest_plugins = ['aiida.manage.tests.pytest_fixtures', 'aiida_testing.mock_code']  # pylint: disable=invalid-name
+
+#: Values of the benchmark parameters for each ``--benchmark-scale``.
+SCALES = {
+    'num_files': {
+        'small': [10, 1000],
+        'large': [10, 1000, 10000, 100000]
+    },
+    'depth': {
+        'small': [1, 4],
+        'large': [1, 4, 16]
+    },
+    'file_size': {
+        'small': [1024, 1024**2],
+        'large': [1024, 1024**2, 1024**3]
+    },
+    'num_calculations': {
+        'small': [10],
+        'large': [10, 100]
+    },
+}
+
+
+def pytest_addoption(parser):
+    """Add the command line option selecting the size of the benchmarks."""
+    parser.addoption(
+        '--benchmark-scale',
+        choices=tuple(SCALES['num_files']),
+        default='small',
+        help="Size of the synthetic directories: 'small' (default) runs in about a minute, "
+        "'large' adds directories with up to 100k files and files of 1 GB."
+    )
+
+
+def pytest_generate_tests(metafunc):
+    """Parametrize the benchmarks by the parameters of ``SCALES`` they use."""
+    scale = metafunc.config.getoption('--benchmark-scale')
+    for name, values in SCALES.items():
+        if name in metafunc.fixturenames:
+            metafunc.parametrize(name, values[scale])
+
+
+@pytest.fixture
+def synthetic_dir_factory(tmp_path_factory):
+    """
+    Fixture returning a function that creates a synthetic output directory.
+    """
+    def _create(num_files: int, **kwargs: ty.Any) -> ty.Tuple[Path, ty.List[str]]:
+        path = tmp_path_factory.mktemp('synthetic')
+        return path, create_synthetic_dir(path, num_files=num_files, **kwargs)
+
+    return _create
+
+
+@pytest.fixture
+def run_benchmark(benchmark):
+    """
+    Fixture returning a function that benchmarks ``func(**kwargs)``, calling
+    ``setup`` before each round, and adds the resource usage of a single
+    call and the throughput of ``nbytes`` to the ``extra_info`` of the benchmark.
+    """
+    def _run(
+        func: ty.Callable[..., ty.Any],
+        kwargs: ty.Dict[str, ty.Any],
+        setup: ty.Optional[ty.Callable[[], None]] = None,
+        nbytes: ty.Optional[int] = None,
+        rounds: int = 5
+    ) -> None:
+        if setup is not None:
+            setup()
+        benchmark.extra_info.update(measure_resources(func, **kwargs))
+        benchmark.pedantic(func, kwargs=kwargs, setup=setup, rounds=rounds)
+        # the statistics are not collected with --benchmark-disable
+        if nbytes is not None and benchmark.stats is not None:
+            benchmark.extra_info['throughput_mb_s'] = nbytes / benchmark.stats.stats.mean / 1e6
+
+    return _run
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for recording the outputs of a mock code with ``copy_files``,
+showing how it scales with the number of files, their depth and the
+number of ignore patterns.
+"""
+import shutil
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from aiida_testing._mock_code._cli import copy_files  # pylint: disable=wrong-import-position
+from aiida_testing._mock_code._storage import ObjectStore  # pylint: disable=wrong-import-position
+
+
+@pytest.mark.parametrize('num_patterns', [0, 10, 100])
+def test_copy_files(  # pylint: disable=too-many-arguments
+    run_benchmark, synthetic_dir_factory, tmp_path, num_files, depth, num_patterns
+):
+    """
+    Benchmark ``copy_files`` with a mix of ignored file names, files and
+    directories. Half of the directories is ignored, and hence pruned.
+    """
+    src_dir, dirnames = synthetic_dir_factory(num_files, depth=depth)
+    ignore_paths = [f'{dirname}/**' for dirname in dirnames[::2]]
+    ignore_paths += [f'**/nonexistent{idx}.txt' for idx in range(num_patterns)]
+    ignore_files = [f'*.ignored{idx}' for idx in range(num_patterns)]
+    dest_dir = tmp_path / 'dest'
+
+    def _setup():
+        shutil.rmtree(dest_dir, ignore_errors=True)
+
+    run_benchmark(
+        copy_files,
+        kwargs=dict(
+            src_dir=src_dir,
+            dest_dir=dest_dir,
+            ignore_files=ignore_files,
+            ignore_paths=ignore_paths
+        ),
+        setup=_setup
+    )
+    assert not (dest_dir / dirnames[0]).exists()
+    if len(dirnames) > 1:
+        assert (dest_dir / dirnames[1]).is_dir()
+
+
+@pytest.mark.parametrize('use_object_store', [False, True])
+def test_copy_large_files(
+    run_benchmark, synthetic_dir_factory, tmp_path, file_size, use_object_store
+):
+    """
+    Benchmark the throughput of ``copy_files`` for large output files, in the
+    directory and content-addressable storage layouts.
+    """
+    src_dir, _ = synthetic_dir_factory(4, file_size=file_size)
+    dest_dir = tmp_path / 'dest'
+    data_dir = tmp_path / 'data'
+
+    def _setup():
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    run_benchmark(
+        copy_files,
+        kwargs=dict(
+            src_dir=src_dir,
+            dest_dir=dest_dir,
+            ignore_files=[],
+            ignore_paths=[],
+            object_store=ObjectStore(data_dir) if use_object_store else None
+        ),
+        setup=_setup,
+        nbytes=4 * file_size,
+        rounds=3
+    )
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the end-to-end latency of mocked calculations through the AiiDA engine.
+
+The ``diff`` calculation of ``aiida-diff`` is run with a mock code, as in
+``tests/mock_code/test_diff.py``, against the test profile. Besides the
+latency, the ``extra_info`` of each benchmark contains its breakdown into
+the steps of the engine and the time spent in the mock code executable.
+"""
+import time
+import asyncio
+import functools
+import collections
+import typing as ty
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('aiida_diff')
+
+# pylint: disable=wrong-import-position
+from aiida import orm
+from aiida.engine import run_get_node
+from aiida.engine.daemon import execmanager
+from aiida.engine.processes.calcjobs import CalcJob
+from aiida.engine.utils import instantiate_process
+from aiida.manage.manager import get_manager
+from aiida.plugins import CalculationFactory, DataFactory
+
+from aiida_testing._mock_code._timing import read_timings, summarize_timings
+
+CALC_ENTRY_POINT = 'diff'
+
+TESTS_DIR = Path(__file__).resolve().parent.parent / 'tests' / 'mock_code'
+
+#: Data directory with the result of the ``diff`` calculation.
+TEST_DATA_DIR = TESTS_DIR / 'data'
+
+IGNORE_PATHS = ('_aiidasubmit.sh', 'file*txt')
+
+#: Counts of the summary of the mock code runs added to the benchmarks.
+MOCK_CODE_COUNTS = ('runs', 'hits', 'misses', 'regenerations')
+
+#: Start and end time of a step.
+Interval = ty.Tuple[float, float]
+
+
+class StepTimer:
+    """
+    Records the start and end of the steps of the engine for each calculation,
+    by the primary key of its node.
+    """
+    def __init__(self) -> None:
+        self.steps: ty.Dict[int, ty.Dict[str, Interval]] = collections.defaultdict(dict)
+        self.starts: ty.Dict[int, float] = {}
+        self.ends: ty.Dict[int, float] = {}
+
+    def wrap(self, func: ty.Callable[..., ty.Any],
+             get_node: ty.Callable[..., orm.Node]) -> ty.Callable[..., ty.Any]:
+        """Wrap ``func`` such that its calls are recorded as the step of the node given by ``get_node``."""
+        @functools.wraps(func)
+        def _wrapped(*args: ty.Any, **kwargs: ty.Any) -> ty.Any:
+            start_time = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.steps[get_node(*args).pk][func.__name__] = (start_time, time.monotonic())
+
+        return _wrapped
+
+    def get_breakdown(self, pk: int) -> ty.Dict[str, float]:
+        """
+        Get the time of each step of a calculation:
+
+        * ``setup``: from the start of the process to the preparation of the inputs
+        * ``presubmit``: writing the input files of the calculation to a sandbox folder
+        * ``upload``: copying the input files to the working directory
+        * ``submit``: submitting the job to the scheduler
+        * ``wait``: from the submission to the retrieval, including the run of the
+          mock code and the polling of the scheduler
+        * ``retrieve``: copying the output files to the repository
+        * ``parse``: running the parser
+        * ``finalize``: from the parser to the termination of the process
+        """
+        steps = self.steps[pk]
+        breakdown = {name: end_time - start_time for name, (start_time, end_time) in steps.items()}
+        breakdown['setup'] = steps['presubmit'][0] - self.starts[pk]
+        breakdown['wait'] = steps['retrieve_calculation'][0] - steps['submit_calculation'][1]
+        breakdown['finalize'] = self.ends[pk] - steps['parse'][1]
+        breakdown['total'] = self.ends[pk] - self.starts[pk]
+        return {name.replace('_calculation', ''): value for name, value in breakdown.items()}
+
+    def get_mean_breakdown(self) -> ty.Dict[str, float]:
+        """Get the mean time of each step, over all calculations."""
+        breakdowns = [self.get_breakdown(pk) for pk in self.ends]
+        return {
+            name: sum(breakdown[name] for breakdown in breakdowns) / len(breakdowns)
+            for name in breakdowns[0]
+        }
+
+
+@pytest.fixture
+def step_timer(monkeypatch):
+    """
+    Fixture returning a :class:`StepTimer` recording the steps of the calculations run in the test.
+    """
+    timer = StepTimer()
+    for name in ('upload_calculation', 'submit_calculation', 'retrieve_calculation'):
+        monkeypatch.setattr(
+            execmanager, name, timer.wrap(getattr(execmanager, name), lambda node, *_: node)
+        )
+    for name in ('presubmit', 'parse'):
+        monkeypatch.setattr(
+            CalcJob, name, timer.wrap(getattr(CalcJob, name), lambda process, *_: process.node)
+        )
+    return timer
+
+
+@pytest.fixture
+def generate_diff_inputs():
+    """
+    Fixture returning a function that generates the inputs of the diff calculation.
+    """
+    with open(TESTS_DIR / 'test_diff' / 'file1.txt', 'rb') as f1_obj:
+        file1 = orm.SinglefileData(file=f1_obj).store()
+    with open(TESTS_DIR / 'test_diff' / 'file2.txt', 'rb') as f2_obj:
+        file2 = orm.SinglefileData(file=f2_obj).store()
+    parameters = DataFactory('diff')(dict={'ignore-case': False}).store()
+
+    def _generate_diff_inputs(code: orm.Code) -> ty.Dict[str, ty.Any]:
+        return {
+            'code': code,
+            'file1': file1,
+            'file2': file2,
+            'parameters': parameters,
+            'metadata': {
+                'options': {
+                    'withmpi': False,
+                    'resources': {
+                        'num_machines': 1,
+                        'num_mpiprocs_per_machine': 1
+                    }
+                }
+            },
+        }
+
+    return _generate_diff_inputs
+
+
+@pytest.fixture(params=['restored', 'recorded'])
+def diff_code(request, benchmark, mock_code_factory, tmp_path, aiida_localhost):
+    """
+    Fixture returning a mock code of the diff calculation, which either restores
+    the existing result or runs ``diff`` and records its result for each calculation.
+    """
+    start_time = time.monotonic()
+    if request.param == 'restored':
+        code = mock_code_factory(
+            label='diff',
+            data_dir_abspath=TEST_DATA_DIR,
+            entry_point=CALC_ENTRY_POINT,
+            ignore_paths=IGNORE_PATHS,
+            _regenerate_test_data=False,
+        )
+    else:
+        code = mock_code_factory(
+            label='diff',
+            data_dir_abspath=tmp_path,
+            entry_point=CALC_ENTRY_POINT,
+            ignore_paths=IGNORE_PATHS,
+            _regenerate_test_data=True,
+        )
+    benchmark.extra_info.update(
+        code_setup=time.monotonic() - start_time,
+        minimum_job_poll_interval=aiida_localhost.get_minimum_job_poll_interval()
+    )
+    return code
+
+
+def _run_sequential(timer: StepTimer, inputs: ty.Dict[str, ty.Any]) -> None:
+    """Run a diff calculation, and check that it succeeded."""
+    start_time = time.monotonic()
+    _, node = run_get_node(CalculationFactory(CALC_ENTRY_POINT), **inputs)
+    timer.starts[node.pk] = start_time
+    timer.ends[node.pk] = time.monotonic()
+    assert node.is_finished_ok
+
+
+def _run_concurrent(timer: StepTimer, inputs: ty.List[ty.Dict[str, ty.Any]]) -> None:
+    """Run diff calculations concurrently in the event loop of the runner, and check that they succeeded."""
+    runner = get_manager().get_runner()
+    start_time = time.monotonic()
+    processes = [
+        instantiate_process(runner, CalculationFactory(CALC_ENTRY_POINT), **process_inputs)
+        for process_inputs in inputs
+    ]
+
+    async def _run(process):
+        timer.starts[process.node.pk] = start_time
+        await process.step_until_terminated()
+        timer.ends[process.node.pk] = time.monotonic()
+
+    async def _run_all():
+        await asyncio.gather(*(_run(process) for process in processes))
+
+    runner.loop.run_until_complete(_run_all())
+    assert all(process.node.is_finished_ok for process in processes)
+
+
+def _add_extra_info(
+    benchmark, timer: StepTimer, timings_file: Path, start_timestamp: float
+) -> None:
+    """Add the breakdown of the latency and the summary of the mock code runs to the benchmark."""
+    timings = [
+        timing for timing in read_timings(timings_file) if timing['timestamp'] >= start_timestamp
+    ]
+    summary = summarize_timings(timings, slowest=0)
+    breakdown = timer.get_mean_breakdown()
+    breakdown['mock_code'] = (summary['overhead'] + summary['execute']) / max(summary['runs'], 1)
+    benchmark.extra_info.update(
+        breakdown=breakdown,
+        latency_max=max(timer.get_breakdown(pk)['total'] for pk in timer.ends),
+        num_calculations=len(timer.ends),
+        mock_code={key: summary[key]
+                   for key in MOCK_CODE_COUNTS},
+    )
+
+
+def test_sequential(
+    benchmark, step_timer, diff_code, generate_diff_inputs, mock_code_timings_file, num_calculations
+):  # pylint: disable=redefined-outer-name,too-many-arguments
+    """Latency of diff calculations run one after the other."""
+    start_timestamp = time.time()
+    benchmark.pedantic(
+        _run_sequential,
+        setup=lambda: ((step_timer, generate_diff_inputs(diff_code)), {}),
+        rounds=num_calculations
+    )
+    _add_extra_info(benchmark, step_timer, mock_code_timings_file, start_timestamp)
+
+
+def test_concurrent(
+    benchmark, step_timer, diff_code, generate_diff_inputs, mock_code_timings_file, num_calculations
+):  # pylint: disable=redefined-outer-name,too-many-arguments
+    """Latency of running diff calculations concurrently, in a single round."""
+    start_timestamp = time.time()
+    benchmark.pedantic(
+        _run_concurrent,
+        args=(step_timer, [generate_diff_inputs(diff_code) for _ in range(num_calculations)]),
+        rounds=1
+    )
+    _add_extra_info(benchmark, step_timer, mock_code_timings_file, start_timestamp)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for hashing the inputs of a calculation with ``get_hash``, and
+for normalizing the submit file with ``strip_submit_content``.
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# pylint: disable=wrong-import-position
+from _helpers import SUBMIT_CONTENT, create_calculation_dir
+from aiida_testing._mock_code._hashing import get_hash, strip_submit_content
+
+#: Hash algorithms benchmarked, including the per-file scheme.
+HASH_ALGORITHMS = ['md5', 'blake2b', 'blake2b-tree']
+
+
+@pytest.mark.parametrize('hash_algorithm', HASH_ALGORITHMS)
+def test_get_hash_many_files(  # pylint: disable=too-many-arguments
+    run_benchmark, tmp_path, monkeypatch, num_files, depth, hash_algorithm
+):
+    """Benchmark hashing calculation directories with many small input files."""
+    create_calculation_dir(tmp_path, num_files=num_files, depth=depth)
+    monkeypatch.chdir(tmp_path)
+    run_benchmark(get_hash, kwargs=dict(hash_algorithm=hash_algorithm), nbytes=num_files * 1024)
+
+
+@pytest.mark.parametrize('hash_algorithm', HASH_ALGORITHMS)
+def test_get_hash_large_files(run_benchmark, tmp_path, monkeypatch, file_size, hash_algorithm):
+    """Benchmark the throughput of hashing large input files."""
+    create_calculation_dir(tmp_path, num_files=2, file_size=file_size)
+    monkeypatch.chdir(tmp_path)
+    run_benchmark(
+        get_hash, kwargs=dict(hash_algorithm=hash_algorithm), nbytes=2 * file_size, rounds=3
+    )
+
+
+@pytest.mark.parametrize('hash_workers', [1, 2, 4])
+def test_get_hash_parallel(run_benchmark, tmp_path, monkeypatch, file_size, hash_workers):
+    """Benchmark hashing several large input files concurrently, with the per-file scheme."""
+    create_calculation_dir(tmp_path, num_files=4, file_size=file_size)
+    monkeypatch.chdir(tmp_path)
+    run_benchmark(
+        get_hash,
+        kwargs=dict(hash_algorithm='blake2b-tree', max_workers=hash_workers),
+        nbytes=4 * file_size,
+        rounds=3
+    )
+
+
+@pytest.mark.parametrize('num_lines', [10, 1000, 100000])
+def test_strip_submit_content(run_benchmark, num_lines):
+    """Benchmark normalizing submit files with many (e.g. ``prepend_text``) lines."""
+    lines = SUBMIT_CONTENT.splitlines()
+    content = '\n'.join(
+        lines[:-1] + [f'export VARIABLE_{idx}={idx}' for idx in range(num_lines)] + lines[-1:]
+    ).encode()
+    run_benchmark(
+        strip_submit_content, kwargs=dict(aiidasubmit_content_bytes=content), nbytes=len(content)
+    )
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for restoring stored results with ``restore_files``, for each
+storage layout and restore mode.
+"""
+import shutil
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# pylint: disable=wrong-import-position
+from aiida_testing._mock_code._cli import copy_files, restore_files
+from aiida_testing._mock_code._pack import PackFile, pack_data_dir
+from aiida_testing._mock_code._storage import ObjectStore
+from aiida_testing._mock_code._transfer import RestoreMode
+
+
+@pytest.mark.parametrize('layout', ['directory', 'cas', 'pack'])
+@pytest.mark.parametrize('restore_mode', [mode.value for mode in RestoreMode])
+def test_restore_files(  # pylint: disable=too-many-arguments
+    run_benchmark, synthetic_dir_factory, tmp_path, num_files, layout, restore_mode
+):
+    """Benchmark restoring a result with many small output files."""
+    src_dir, _ = synthetic_dir_factory(num_files)
+    data_dir = tmp_path / 'data'
+    res_dir = data_dir / 'mock-label-digest'
+    copy_files(
+        src_dir=src_dir,
+        dest_dir=res_dir,
+        ignore_files=[],
+        ignore_paths=[],
+        object_store=ObjectStore(data_dir) if layout == 'cas' else None
+    )
+    pack = None
+    if layout == 'pack':
+        if restore_mode != RestoreMode.COPY.value:
+            pytest.skip('Packed results are always extracted.')
+        pack_data_dir(data_dir)
+        pack = PackFile(data_dir)
+    dest_dir = tmp_path / 'dest'
+
+    def _setup():
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        dest_dir.mkdir()
+
+    try:
+        run_benchmark(
+            restore_files,
+            kwargs=dict(
+                res_dir=res_dir,
+                dest_dir=dest_dir,
+                restore_mode=RestoreMode(restore_mode),
+                pack=pack
+            ),
+            setup=_setup,
+            nbytes=num_files * 1024
+        )
+    finally:
+        if pack is not None:
+            pack.close()
+    assert len(list(dest_dir.glob('**/*.txt'))) == num_files
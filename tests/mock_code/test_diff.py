@@ -83,6 +83,65 @@ def test_basic(mock_code_factory, generate_diff_inputs):  # pylint: disable=rede
     check_diff_output(res)
 
 
+def test_in_process(mock_code_factory, generate_diff_inputs):  # pylint: disable=redefined-outer-name
+    """
+    Check that mock code restores the result in-process, if inputs are recognized.
+    """
+    mock_code = mock_code_factory(
+        label='diff',
+        data_dir_abspath=TEST_DATA_DIR,
+        entry_point=CALC_ENTRY_POINT,
+        ignore_paths=('_aiidasubmit.sh', 'file*txt'),
+        in_process=True
+    )
+
+    res, node = run_get_node(
+        CalculationFactory(CALC_ENTRY_POINT), code=mock_code, **generate_diff_inputs()
+    )
+    assert node.is_finished_ok
+    assert node.get_job_id().startswith('mock-restored-')
+    check_diff_output(res)
+
+
+def test_code_reuse(mock_code_factory, mock_code_factory_session):
+    """
+    Check that mock codes with the same settings are only stored once.
+    """
+    kwargs = dict(
+        label='diff',
+        data_dir_abspath=TEST_DATA_DIR,
+        entry_point=CALC_ENTRY_POINT,
+        ignore_paths=('_aiidasubmit.sh', 'file*txt')
+    )
+    mock_code = mock_code_factory(**kwargs)
+    assert mock_code_factory(**kwargs).uuid == mock_code.uuid
+    assert mock_code_factory(
+        **dict(kwargs, ignore_paths=('_aiidasubmit.sh', ))
+    ).uuid != mock_code.uuid
+
+    session_code = mock_code_factory_session(**kwargs)
+    assert session_code.uuid != mock_code.uuid
+    assert mock_code_factory_session(**kwargs).uuid == session_code.uuid
+
+
+def test_session_code(mock_code_factory_session, generate_diff_inputs):  # pylint: disable=redefined-outer-name
+    """
+    Check that mock codes of the session-scoped factory restore results.
+    """
+    mock_code = mock_code_factory_session(
+        label='diff',
+        data_dir_abspath=TEST_DATA_DIR,
+        entry_point=CALC_ENTRY_POINT,
+        ignore_paths=('_aiidasubmit.sh', 'file*txt')
+    )
+
+    res, node = run_get_node(
+        CalculationFactory(CALC_ENTRY_POINT), code=mock_code, **generate_diff_inputs()
+    )
+    assert node.is_finished_ok
+    check_diff_output(res)
+
+
 def test_inexistent_data(mock_code_factory, generate_diff_inputs):  # pylint: disable=redefined-outer-name
     """
     Check that the mock code runs external executable if there is no existing data.
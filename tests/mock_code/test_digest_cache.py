@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Test the persistent cache for digests of input files.
+"""
+import os
+import shutil
+
+from aiida_testing._mock_code import _hashing
+from aiida_testing._mock_code._hashing import get_hash
+from aiida_testing._mock_code._digest_cache import DigestCache
+
+
+def test_tree_hash_reuses_digests(tmp_path, monkeypatch):
+    """Test that unchanged files are not hashed again when using the digest cache."""
+    sandbox = tmp_path / 'sandbox'
+    (sandbox / 'sub').mkdir(parents=True)
+    (sandbox / 'aiida.in').write_text('input')
+    (sandbox / 'sub' / 'pseudo.upf').write_text('pseudo')
+    monkeypatch.chdir(sandbox)
+    cache_path = tmp_path / 'digests.sqlite'
+
+    hashed_files = []
+    update_file_hash = _hashing.update_file_hash
+
+    def _update_file_hash(hasher, path):
+        hashed_files.append(path.name)
+        update_file_hash(hasher, path)
+
+    monkeypatch.setattr(_hashing, 'update_file_hash', _update_file_hash)
+
+    reference = get_hash('sha256-tree').hexdigest()
+    with DigestCache(cache_path) as digest_cache:
+        assert get_hash('sha256-tree', digest_cache=digest_cache).hexdigest() == reference
+    assert sorted(hashed_files) == ['aiida.in', 'aiida.in', 'pseudo.upf', 'pseudo.upf']
+
+    hashed_files.clear()
+    (sandbox / 'aiida.in').write_text('changed input')
+    os.utime(sandbox / 'aiida.in', ns=(0, 0))
+    with DigestCache(cache_path) as digest_cache:
+        assert get_hash('sha256-tree', digest_cache=digest_cache).hexdigest() != reference
+    assert hashed_files == ['aiida.in']
+
+
+def test_fresh_copy_of_same_size(tmp_path, monkeypatch):
+    """Test that a fresh copy of a file is hashed again, even if it only differs in the middle."""
+    sandbox = tmp_path / 'sandbox'
+    sandbox.mkdir()
+    content = bytearray(os.urandom(2 * 1024 * 1024))
+    (sandbox / 'large.dat').write_bytes(content)
+    monkeypatch.chdir(sandbox)
+    cache_path = tmp_path / 'digests.sqlite'
+
+    reference = get_hash('sha256-tree').hexdigest()
+    with DigestCache(cache_path) as digest_cache:
+        assert get_hash('sha256-tree', digest_cache=digest_cache).hexdigest() == reference
+
+    content[100000] ^= 1
+    (tmp_path / 'changed.dat').write_bytes(content)
+    shutil.copy(tmp_path / 'changed.dat', tmp_path / 'large.dat')
+    os.replace(tmp_path / 'large.dat', sandbox / 'large.dat')
+    expected = get_hash('sha256-tree').hexdigest()
+    assert expected != reference
+    with DigestCache(cache_path) as digest_cache:
+        assert get_hash('sha256-tree', digest_cache=digest_cache).hexdigest() == expected
+
+
+def test_eviction(tmp_path):
+    """Test that the least recently used digests are evicted."""
+    cache_path = tmp_path / 'digests.sqlite'
+    paths = []
+    for idx in range(5):
+        paths.append(tmp_path / f'file{idx}')
+        paths[-1].write_text(str(idx))
+
+    for path in paths:
+        with DigestCache(cache_path, max_entries=3) as digest_cache:
+            digest_cache.set(digest_cache.get_key(path), 'md5', path.name)
+
+    with DigestCache(cache_path, max_entries=3) as digest_cache:
+        cached = [digest_cache.get(digest_cache.get_key(path), 'md5') for path in paths]
+    assert cached == [None, None, 'file2', 'file3', 'file4']
+
+
+def test_unusable_cache(tmp_path):
+    """Test that an inaccessible database disables the cache."""
+    (tmp_path / 'not-a-directory').write_text('')
+    with DigestCache(tmp_path / 'not-a-directory' / 'digests.sqlite') as digest_cache:
+        key = digest_cache.get_key(tmp_path / 'not-a-directory')
+        digest_cache.set(key, 'md5', 'digest')
+        assert digest_cache.get(key, 'md5') is None
+
+
+def test_parallel_tree_hash(tmp_path, monkeypatch):
+    """Test that hashing files concurrently gives the same key, and shares the cache between threads."""
+    sandbox = tmp_path / 'sandbox'
+    for idx in range(20):
+        (sandbox / f'dir{idx % 3}').mkdir(parents=True, exist_ok=True)
+        (sandbox / f'dir{idx % 3}' / f'file{idx}.dat').write_bytes(os.urandom(10000))
+    (sandbox / 'dir0.txt').write_text('sorted after dir0/, but before dir1/')
+    monkeypatch.chdir(sandbox)
+    cache_path = tmp_path / 'digests.sqlite'
+
+    reference = get_hash('sha256-tree').hexdigest()
+    with DigestCache(cache_path) as digest_cache:
+        assert get_hash('sha256-tree', digest_cache=digest_cache,
+                        max_workers=4).hexdigest() == reference
+
+    hashed_files = []
+    monkeypatch.setattr(
+        _hashing, 'update_file_hash', lambda hasher, path: hashed_files.append(path)
+    )
+    with DigestCache(cache_path) as digest_cache:
+        assert get_hash('sha256-tree', digest_cache=digest_cache,
+                        max_workers=4).hexdigest() == reference
+    assert hashed_files == []
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Test comparing the inputs of a missing result to those of the existing results.
+"""
+import hashlib
+
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._hashing import get_hash, get_input_digests
+from aiida_testing._mock_code._explain import explain_miss, format_explanation
+from aiida_testing._mock_code._in_process import read_submit_env
+from aiida_testing._mock_code._pack import PackFile, pack_data_dir
+from aiida_testing._mock_code._storage import read_manifest
+
+
+def _create_sandbox(
+    sandbox,
+    data_dir,
+    inputs,
+    executable_path='cat',
+    store_inputs=False,
+    label='cat'
+):  # pylint: disable=too-many-arguments
+    """Create the working directory of a calculation of a mock code running ``cat``."""
+    sandbox.mkdir()
+    (sandbox / '_aiidasubmit.sh').write_text(
+        "#!/bin/bash\n"
+        f"export AIIDA_MOCK_LABEL=\"{label}\"\n"
+        f"export AIIDA_MOCK_DATA_DIR=\"{data_dir}\"\n"
+        f"export AIIDA_MOCK_EXECUTABLE_PATH=\"{executable_path}\"\n"
+        "export AIIDA_MOCK_IGNORE_FILES=\"_aiidasubmit.sh\"\n"
+        "export AIIDA_MOCK_IGNORE_PATHS=\"_aiidasubmit.sh\"\n"
+        "export AIIDA_MOCK_REGENERATE_DATA=False\n"
+        f"export AIIDA_MOCK_STORE_INPUTS={store_inputs}\n"
+        "'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'\n"
+    )
+    for name, content in inputs.items():
+        (sandbox / name).write_text(content)
+    (sandbox / '.aiida').mkdir()
+    (sandbox / '.aiida' / 'calcinfo.json').write_text('{}')
+
+
+def _run_mock_code(sandbox, monkeypatch):
+    """Run the mock code in the working directory of a calculation."""
+    for key, value in read_submit_env(sandbox / '_aiidasubmit.sh').items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.chdir(sandbox)
+    _cli.run()
+
+
+@pytest.mark.parametrize('hash_algorithm', ['md5', 'sha256-tree'])
+def test_input_digests(tmp_path, monkeypatch, hash_algorithm):
+    """Test that the digest of each input file is recorded, and that they are the leaves of the tree hash."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _create_sandbox(tmp_path / 'recorded', data_dir, {'aiida.in': 'input'})
+    monkeypatch.setenv('AIIDA_MOCK_HASH_ALGORITHM', hash_algorithm)
+    _run_mock_code(tmp_path / 'recorded', monkeypatch)
+
+    res_dir, = data_dir.glob('mock-cat-*')
+    input_digests = read_manifest(res_dir)['input_digests']
+    assert input_digests['algorithm'] == hash_algorithm.replace('-tree', '')
+    assert sorted(input_digests['files']) == ['_aiidasubmit.sh', 'aiida.in']
+    # the digests are collected while hashing the inputs, with either scheme
+    collected = {}
+    get_hash(hash_algorithm, directory=tmp_path / 'recorded', input_digests=collected)
+    assert collected == get_input_digests(hash_algorithm, directory=tmp_path / 'recorded')
+
+    digests = get_input_digests('sha256', directory=tmp_path / 'recorded')
+    tree_lines = ''.join(f'{name}\0{digest}\n' for name, digest in digests.items())
+    assert get_hash('sha256-tree', directory=tmp_path / 'recorded').hexdigest() == \
+        hashlib.sha256(tree_lines.encode()).hexdigest()
+
+    pack_data_dir(data_dir)
+    with PackFile(data_dir) as pack:
+        assert pack.get_input_digests(res_dir.name) == input_digests
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_explain_miss(tmp_path, monkeypatch, packed):
+    """Test that the results are ranked by the number of differing input files."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _create_sandbox(tmp_path / 'near', data_dir, {'aiida.in': 'input', 'extra.txt': 'extra'})
+    _run_mock_code(tmp_path / 'near', monkeypatch)
+    _create_sandbox(tmp_path / 'far', data_dir, {'aiida.in': 'other input'})
+    _run_mock_code(tmp_path / 'far', monkeypatch)
+    if packed:
+        pack_data_dir(data_dir)
+
+    sandbox = tmp_path / 'sandbox'
+    _create_sandbox(sandbox, data_dir, {'aiida.in': 'input', 'new.txt': 'new'})
+    near, far = explain_miss(sandbox, data_dir, 'cat')
+    assert near['added'] == ['new.txt']
+    assert near['removed'] == ['extra.txt']
+    assert near['changed'] == []
+    assert far['added'] == ['new.txt']
+    assert far['changed'] == ['aiida.in']
+    assert len(explain_miss(sandbox, data_dir, 'cat', max_entries=1)) == 1
+    assert explain_miss(sandbox, data_dir, 'other') == []
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_explain_miss_label_prefix(tmp_path, monkeypatch, packed):
+    """Test that the results of labels starting with the same prefix are not compared."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _create_sandbox(tmp_path / 'cat', data_dir, {'aiida.in': 'input'})
+    _run_mock_code(tmp_path / 'cat', monkeypatch)
+    _create_sandbox(tmp_path / 'cat-copy', data_dir, {'aiida.in': 'input'}, label='cat-copy')
+    _run_mock_code(tmp_path / 'cat-copy', monkeypatch)
+    if packed:
+        pack_data_dir(data_dir)
+
+    sandbox = tmp_path / 'sandbox'
+    _create_sandbox(sandbox, data_dir, {'aiida.in': 'other input'})
+    comparison, = explain_miss(sandbox, data_dir, 'cat')
+    assert comparison['entry_name'].startswith('mock-cat-'
+                                               ) and 'copy' not in comparison['entry_name']
+    comparison, = explain_miss(sandbox, data_dir, 'cat-copy')
+    assert comparison['entry_name'].startswith('mock-cat-copy-')
+
+
+def test_explain_miss_diff(tmp_path, monkeypatch, capsys):
+    """Test that the changes of text inputs are shown if the inputs are stored."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _create_sandbox(tmp_path / 'recorded', data_dir, {'aiida.in': 'a\nb\nc\n'}, store_inputs=True)
+    _run_mock_code(tmp_path / 'recorded', monkeypatch)
+
+    sandbox = tmp_path / 'sandbox'
+    _create_sandbox(
+        sandbox, data_dir, {'aiida.in': 'a\nB\nc\n'}, executable_path='', store_inputs=True
+    )
+    with pytest.raises(SystemExit) as exc_info:
+        _run_mock_code(sandbox, monkeypatch)
+    assert 'explain-miss' in str(exc_info.value)
+
+    comparison, = explain_miss(sandbox, data_dir, 'cat')
+    assert comparison['changed'] == ['aiida.in']
+    assert comparison['diffs']['aiida.in'][-3:] == ['-b', '+B', ' c']
+    assert 'changed: aiida.in' in format_explanation([comparison])
+
+    # the data directory and label are read from the submit script
+    monkeypatch.delenv('AIIDA_MOCK_LABEL')
+    _cli.main(['explain-miss', str(sandbox)])
+    assert '    +B' in capsys.readouterr().out.splitlines()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Test the hashing of the mock code inputs.
+"""
+import os
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from aiida_testing._mock_code import _hashing
+from aiida_testing._mock_code._cli import find_result_dir
+from aiida_testing._mock_code._hashing import get_hash, SUBMIT_FILE
+
+INPUT_PATHS = (
+    Path('aiida.in'),
+    Path('a-b/file.txt'),
+    Path('a/sub/file.txt'),
+    Path('a0'),
+    Path('.aiida/calcinfo.json'),
+    Path(SUBMIT_FILE),
+)
+
+
+@pytest.fixture
+def sandbox_directory(tmp_path, monkeypatch):
+    """
+    Prepare mock sandbox directory of a calculation, and change into it.
+    """
+    for path in INPUT_PATHS:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(f"Content of {path}\n" * 1000)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+
+
+def _get_hash_in_memory() -> str:
+    """Reference implementation of the MD5 hash, reading all files into memory."""
+    md5sum = hashlib.md5()
+    for path in sorted(Path('.').glob('**/*')):
+        if path.is_file() and not path.match('.aiida/**'):
+            content = path.read_bytes()
+            if path.name == SUBMIT_FILE:
+                content = b'\n'.join(content.splitlines())
+            md5sum.update(path.name.encode())
+            md5sum.update(content)
+    return md5sum.hexdigest()
+
+
+def test_md5_unchanged(sandbox_directory, monkeypatch):  # pylint: disable=redefined-outer-name,unused-argument
+    """Test that the streamed MD5 hash is identical to hashing the files in memory."""
+    monkeypatch.setattr(_hashing, 'HASH_CHUNK_SIZE', 7)
+    assert get_hash().hexdigest() == _get_hash_in_memory()
+
+
+def test_hash_algorithm(sandbox_directory):  # pylint: disable=redefined-outer-name,unused-argument
+    """Test that the hash algorithm can be chosen."""
+    assert get_hash('blake2b').name == 'blake2b'
+    assert get_hash('blake2b').hexdigest() != get_hash().hexdigest()
+
+    with pytest.raises(ValueError):
+        get_hash('no-such-algorithm')
+
+
+@pytest.mark.usefixtures('sandbox_directory')
+def test_find_legacy_result_dir(tmp_path_factory):
+    """Test that results stored under the MD5 hash are found with a different algorithm."""
+    data_dir = tmp_path_factory.mktemp('data')
+    legacy_res_dir = data_dir / f'mock-label-{get_hash().hexdigest()}'
+    legacy_res_dir.mkdir()
+
+    res_dir = find_result_dir(data_dir=data_dir, label='label', hash_algorithm='blake2b')
+    assert res_dir.name == f"mock-label-blake2b-{get_hash('blake2b').hexdigest()}"
+    assert res_dir.resolve() == legacy_res_dir.resolve()
+    assert os.readlink(res_dir) == legacy_res_dir.name
+
+    res_dir = find_result_dir(
+        data_dir=tmp_path_factory.mktemp('data'), label='label', hash_algorithm='blake2b'
+    )
+    assert not res_dir.exists()
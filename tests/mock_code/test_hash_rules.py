@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Test the rules normalizing and excluding input files when hashing.
+"""
+import json
+
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._hashing import get_hash
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._hash_rules import HashRules
+from aiida_testing._mock_code._rehash import verify_data_dir
+
+RULES = {
+    'substitutions': [{
+        'pattern': r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}',
+        'replacement': 'UUID',
+        'files': ['*.in']
+    }],
+    'drop_lines': [{
+        'pattern': r'^# created at ',
+    }],
+    'name_only': ['pseudo'],
+    'exclude': ['*.log'],
+}
+
+
+def _create_inputs(directory, timestamp, uuid, pseudo='Si', log=''):
+    """Create the inputs of a calculation, which differ in volatile or irrelevant content."""
+    directory.mkdir()
+    (directory / 'aiida.in').write_text(f'# created at {timestamp}\nuuid = {uuid}\nsteps = 10\n')
+    (directory / 'pseudo').mkdir()
+    (directory / 'pseudo' / 'Si.UPF').write_text(pseudo)
+    (directory / 'aiida.log').write_text(log)
+
+
+def test_normalize_lines():
+    """Test that lines are dropped before the substitutions are applied, for the matching files."""
+    rules = HashRules(**RULES)
+    lines = [b'# created at 12:00\n', b'id 12345678-1234-1234-1234-123456789abc\n']
+    assert list(rules.normalize_lines('aiida.in', lines)) == [b'id UUID\n']
+    assert list(rules.normalize_lines('other.txt', lines)) == lines[1:]
+    assert rules.is_name_only('pseudo/Si.UPF')
+    assert rules.is_excluded('aiida.log')
+    assert not HashRules(name_only=['pseudo']).applies_to('aiida.in')
+
+
+@pytest.mark.parametrize('hash_algorithm', ['md5', 'sha256-tree'])
+def test_hash_rules(tmp_path, hash_algorithm):
+    """Test that inputs differing only in the normalized content have the same key."""
+    _create_inputs(tmp_path / 'a', '12:00', '12345678-1234-1234-1234-123456789abc', log='a')
+    _create_inputs(tmp_path / 'b', '13:00', 'abcdef01-1234-1234-1234-123456789abc', pseudo='Ge')
+    _create_inputs(tmp_path / 'c', '13:00', 'abcdef01-1234-1234-1234-123456789abc', pseudo='Ge2')
+    rules = HashRules(**RULES)
+
+    def _get_hash(name, hash_rules=rules):
+        return get_hash(hash_algorithm, directory=tmp_path / name,
+                        hash_rules=hash_rules).hexdigest()
+
+    assert _get_hash('a') == _get_hash('b')
+    # files hashed by name only are still distinguished by their size
+    assert _get_hash('a') != _get_hash('c')
+    assert _get_hash('a', None) != _get_hash('b', None)
+    # empty rules do not change the key
+    assert _get_hash('a', HashRules()) == _get_hash('a', None)
+
+
+def test_record_with_hash_rules(tmp_path, monkeypatch):
+    """Test that a result recorded with hash rules is restored for normalized inputs, and keeps its key."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for key, value in (
+        (EnvKeys.LABEL, 'cat'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, 'cat'),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+        (EnvKeys.STORE_INPUTS, 'True'),
+        (EnvKeys.HASH_RULES, json.dumps(RULES)),
+    ):
+        monkeypatch.setenv(key.value, value)
+
+    for name, timestamp in (('recorded', '12:00'), ('restored', '13:00')):
+        sandbox = tmp_path / name
+        _create_inputs(sandbox, timestamp, '12345678-1234-1234-1234-123456789abc')
+        (sandbox / '_aiidasubmit.sh').write_text("#!/bin/bash\ncat aiida.in > aiida.out\n")
+        monkeypatch.chdir(sandbox)
+        _cli.run()
+
+    assert len(list(data_dir.glob('mock-cat-*'))) == 1
+    assert (tmp_path / 'restored' / 'aiida.out').read_text().startswith('# created at 12:00')
+    assert verify_data_dir(data_dir) == {}
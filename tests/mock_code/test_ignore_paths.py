@@ -3,10 +3,12 @@
 Test that ignoring paths works as expected.
 """
 import os
+import fnmatch
 from pathlib import Path
 import pytest
 
 from aiida_testing.mock_code._cli import copy_files
+from aiida_testing._mock_code._storage import MANIFEST_FILE
 
 OUTPUT_PATHS = (
     Path('file1.txt'),
@@ -16,6 +18,15 @@ OUTPUT_PATHS = (
     Path('my/subfolder/file4.txt'),
 )
 
+EXTRA_OUTPUT_PATHS = (
+    Path('.hidden'),
+    Path('.aiida/calcinfo.json'),
+    Path('my/file1.txt'),
+    Path('my/subfolder/deep/file3.txt'),
+    Path('subfolder/deep/file5.dat'),
+    Path('other/.hidden/file6.txt'),
+)
+
 
 @pytest.fixture
 def run_directory(tmp_path_factory):
@@ -94,3 +105,75 @@ def test_ignore_files(run_directory, tmp_path_factory):  # pylint: disable=redef
     # all should be there
     copy_files(src_dir=run_directory, dest_dir=storage_directory, ignore_files=(), ignore_paths=())
     assert (storage_directory / 'my' / 'subfolder' / 'file3.txt').is_file()
+
+
+def _get_copied_paths_reference(src_dir, ignore_files, ignore_paths):
+    """
+    Get the paths copied by the original, glob-based implementation of ``copy_files``.
+    """
+    exclude_paths = {filepath for path in ignore_paths for filepath in src_dir.glob(path)}
+    exclude_files = {path.relative_to(src_dir) for path in exclude_paths if path.is_file()}
+    exclude_dirs = {path.relative_to(src_dir) for path in exclude_paths if path.is_dir()}
+
+    copied = set()
+    for dirpath, _, filenames in os.walk(src_dir):
+        relative_dir = Path(dirpath).relative_to(src_dir)
+        dirs_to_check = list(relative_dir.parents) + [relative_dir]
+        if relative_dir.parts and relative_dir.parts[0] == '.aiida':
+            continue
+        if any(exclude_dir in dirs_to_check for exclude_dir in exclude_dirs):
+            continue
+        for filename in filenames:
+            if any(fnmatch.fnmatch(filename, expr) for expr in ignore_files):
+                continue
+            if relative_dir / filename in exclude_files:
+                continue
+            copied.add((relative_dir / filename).as_posix())
+    return copied
+
+
+@pytest.mark.parametrize(
+    'ignore_files, ignore_paths', [
+        ((), ()),
+        ((), ('*', )),
+        ((), ('**', )),
+        ((), ('my', )),
+        ((), ('my/', )),
+        ((), ('my/**', )),
+        ((), ('my/*', )),
+        ((), ('*/subfolder', )),
+        ((), ('**/file3.txt', )),
+        ((), ('**/*.txt', )),
+        ((), ('my/**/file4.txt', )),
+        ((), ('file[12].txt', )),
+        ((), ('file[!1].txt', )),
+        ((), ('?ile1.txt', '.hidden')),
+        ((), ('.aiida', 'sub*/**')),
+        (('*.txt', ), ()),
+        (('file?.txt', '*.sh'), ('my/subfolder/file3.txt', )),
+        (('.*', ), ('**/deep', )),
+    ]
+)
+def test_copy_files_matches_reference(tmp_path_factory, ignore_files, ignore_paths):
+    """
+    Test that the compiled ignore patterns select the same files as
+    globbing each ignored path in the source directory.
+    """
+    src_dir = tmp_path_factory.mktemp('output')
+    for path in OUTPUT_PATHS + EXTRA_OUTPUT_PATHS:
+        os.makedirs(src_dir / os.path.dirname(path), exist_ok=True)
+        (src_dir / path).write_text('Test content')
+
+    storage_directory = tmp_path_factory.mktemp('storage')
+    copy_files(
+        src_dir=src_dir,
+        dest_dir=storage_directory,
+        ignore_files=ignore_files,
+        ignore_paths=ignore_paths
+    )
+    copied = {
+        Path(dirpath, filename).relative_to(storage_directory).as_posix()
+        for dirpath, _, filenames in os.walk(storage_directory) for filename in filenames
+        if filename != MANIFEST_FILE
+    }
+    assert copied == _get_copied_paths_reference(src_dir, ignore_files, ignore_paths)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Test that the mock code executable only imports lightweight modules.
+"""
+import sys
+import subprocess
+
+import pytest
+
+#: Modules which must not be imported by the mock code executable.
+FORBIDDEN_MODULES = ('aiida', 'pytest', 'click', 'yaml', 'voluptuous', 'aiida_testing.mock_code')
+
+#: Maximum cumulative import time of the executable module, in microseconds.
+IMPORT_TIME_BUDGET = 300000
+
+
+def _get_import_times(module):
+    """Get the cumulative import time in microseconds of all modules imported by ``module``."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True,
+                            check=True)
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        import_times[name.strip()] = int(cumulative)
+    return import_times
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime requires Python 3.7')
+@pytest.mark.parametrize(
+    'module', [
+        'aiida_testing._mock_code._main', 'aiida_testing._mock_code._cli',
+        'aiida_testing._mock_code._server'
+    ]
+)
+def test_import_time(module):
+    """Test that the mock code executable does not import heavy modules, and stays within its time budget."""
+    import_times = _get_import_times(module)
+    forbidden = sorted(
+        name for name in import_times if any(
+            name == forbidden or name.startswith(forbidden + '.') for forbidden in FORBIDDEN_MODULES
+        )
+    )
+    assert not forbidden
+    assert import_times[module] < IMPORT_TIME_BUDGET
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime requires Python 3.7')
+def test_entry_point_imports():
+    """Test that the entry point of the executable does not import the modules running the mock code."""
+    import_times = _get_import_times('aiida_testing._mock_code._main')
+    assert 'aiida_testing._mock_code._cli' not in import_times
+    assert 'aiida_testing._mock_code._hashing' not in import_times
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Test restoring existing results in the process submitting the calculation.
+"""
+import os
+
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._in_process import read_submit_env, restore_in_process
+from aiida_testing._mock_code._timing import read_timings
+
+
+def _create_sandbox(sandbox, data_dir, content, regenerate=False, hash_algorithm='md5'):
+    """Create the working directory of a calculation of a mock code running ``cat``."""
+    sandbox.mkdir()
+    (sandbox / '_aiidasubmit.sh').write_text(
+        "#!/bin/bash\n"
+        "export AIIDA_MOCK_LABEL=\"cat\"\n"
+        f"export AIIDA_MOCK_DATA_DIR=\"{data_dir}\"\n"
+        "export AIIDA_MOCK_EXECUTABLE_PATH=\"cat\"\n"
+        "export AIIDA_MOCK_IGNORE_FILES=\"_aiidasubmit.sh\"\n"
+        "export AIIDA_MOCK_IGNORE_PATHS=\"_aiidasubmit.sh\"\n"
+        f"export AIIDA_MOCK_REGENERATE_DATA={regenerate}\n"
+        f"export AIIDA_MOCK_HASH_ALGORITHM=\"{hash_algorithm}\"\n"
+        f"export AIIDA_MOCK_TIMINGS_FILE=\"{data_dir.parent / 'timings.jsonl'}\"\n"
+        "'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'\n"
+    )
+    (sandbox / 'aiida.in').write_text(content)
+    (sandbox / '.aiida').mkdir()
+    (sandbox / '.aiida' / 'calcinfo.json').write_text('{}')
+
+
+def _record(sandbox, monkeypatch):
+    """Record the result of a calculation with the mock code executable."""
+    for key, value in read_submit_env(sandbox / '_aiidasubmit.sh').items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.chdir(sandbox)
+    _cli.run()
+
+
+def test_read_submit_env(tmp_path):
+    """Test that the mock code settings are read from the submit script."""
+    _create_sandbox(tmp_path / 'sandbox', tmp_path / 'my data', 'input')
+    env = read_submit_env(tmp_path / 'sandbox' / '_aiidasubmit.sh')
+    assert env['AIIDA_MOCK_LABEL'] == 'cat'
+    assert env['AIIDA_MOCK_DATA_DIR'] == str(tmp_path / 'my data')
+    assert env['AIIDA_MOCK_REGENERATE_DATA'] == 'False'
+    assert len(env) == 8
+
+
+@pytest.mark.parametrize('hash_algorithm', ['md5', 'sha256-tree'])
+def test_restore_in_process(tmp_path, monkeypatch, hash_algorithm):
+    """Test that an existing result is restored without running the submit script."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _create_sandbox(tmp_path / 'recorded', data_dir, 'input', hash_algorithm=hash_algorithm)
+    _record(tmp_path / 'recorded', monkeypatch)
+    assert len(list(data_dir.glob('mock-cat-*'))) == 1
+
+    sandbox = tmp_path / 'sandbox'
+    _create_sandbox(sandbox, data_dir, 'input', hash_algorithm=hash_algorithm)
+    monkeypatch.chdir(tmp_path)
+    assert restore_in_process(sandbox, '_aiidasubmit.sh')
+    assert (sandbox / 'aiida.out').read_text() == 'input'
+    timings = read_timings(tmp_path / 'timings.jsonl')
+    assert [timing['outcome'] for timing in timings] == ['recorded', 'restored']
+    assert timings[-1]['in_process']
+
+
+def test_restore_in_process_miss(tmp_path, monkeypatch):
+    """Test that nothing is done for missing results, and when regenerating test data."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _create_sandbox(tmp_path / 'recorded', data_dir, 'input')
+    _record(tmp_path / 'recorded', monkeypatch)
+
+    for name, content, regenerate in (('missing', 'other input', False),
+                                      ('regenerated', 'input', True)):
+        _create_sandbox(tmp_path / name, data_dir, content, regenerate=regenerate)
+        assert not restore_in_process(tmp_path / name, '_aiidasubmit.sh')
+        assert not (tmp_path / name / 'aiida.out').exists()
+
+    (tmp_path / 'not_mocked').mkdir()
+    (tmp_path / 'not_mocked' / '_aiidasubmit.sh').write_text("#!/bin/bash\n'cat' < 'aiida.in'\n")
+    assert not restore_in_process(tmp_path / 'not_mocked', '_aiidasubmit.sh')
+
+
+def test_restore_in_process_error(tmp_path, monkeypatch):
+    """Test that a result which can not be restored is left to the mock code executable."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _create_sandbox(tmp_path / 'recorded', data_dir, 'input')
+    _record(tmp_path / 'recorded', monkeypatch)
+    res_dir, = data_dir.glob('mock-cat-*')
+    os.mkfifo(res_dir / 'fifo')
+
+    _create_sandbox(tmp_path / 'sandbox', data_dir, 'input')
+    assert not restore_in_process(tmp_path / 'sandbox', '_aiidasubmit.sh')
+    monkeypatch.chdir(tmp_path / 'sandbox')
+    with pytest.raises(SystemExit) as exc_info:
+        _cli.run()
+    assert "Can not copy 'fifo'" in str(exc_info.value)
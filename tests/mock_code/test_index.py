@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Test the index of the results in a data directory.
+"""
+import time
+
+import pytest
+
+from aiida_testing._mock_code._cli import main, split_result_dir_name
+from aiida_testing._mock_code._index import EntryIndex, INDEX_FILE
+
+
+@pytest.fixture(autouse=True)
+def hits_cache_home(tmp_path, monkeypatch):
+    """Keep the hit statistics of the indexed results in a temporary cache directory."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+def test_record_and_hit(tmp_path):
+    """Test that recorded results and their usage are indexed."""
+    res_dir = tmp_path / 'mock-label-0123'
+    res_dir.mkdir()
+    (res_dir / 'aiida.out').write_text('output')
+
+    with EntryIndex(tmp_path) as index:
+        index.record(
+            'label', 'md5', '0123', 'mock-label-0123', size=6, runtime=12.5, executable='/bin/true'
+        )
+        index.hit('label', 'md5', '0123', 'mock-label-0123', res_dir)
+        assert index.lookup('label', 'md5', '0123') == 'mock-label-0123'
+        assert index.lookup('label', 'md5', '4567') is None
+
+        # results which were recorded without index are added
+        index.hit('other', 'md5', '4567', 'mock-other-4567', res_dir)
+
+    with EntryIndex(tmp_path) as index:
+        entries = {entry['entry_name']: entry for entry in index.get_entries()}
+    assert entries['mock-label-0123']['hits'] == 1
+    assert entries['mock-label-0123']['runtime'] == 12.5
+    assert entries['mock-other-4567']['size'] == 6
+    assert entries['mock-other-4567']['created'] is None
+
+    # the hit statistics are not stored in the data directory
+    assert sorted(path.name for path in tmp_path.glob(f'{INDEX_FILE}*')) == [INDEX_FILE]
+    with EntryIndex(tmp_path, hits_path=tmp_path / 'other-hits.sqlite') as index:
+        entries = {entry['entry_name']: entry for entry in index.get_entries()}
+    assert entries['mock-label-0123']['hits'] == 0
+
+
+def test_prune(tmp_path, capsys):
+    """Test that results which were not used recently are removed."""
+    with EntryIndex(tmp_path) as index:
+        for digest in ('0123', '4567'):
+            (tmp_path / f'mock-label-{digest}').mkdir()
+            index.record(
+                'label', 'md5', digest, f'mock-label-{digest}', size=0, runtime=1., executable=''
+            )
+    (tmp_path / 'mock-label-blake2b-89ab').symlink_to('mock-label-0123')
+    with EntryIndex(tmp_path) as index:
+        index._execute(  # pylint: disable=protected-access
+            'UPDATE entries SET created = ? WHERE digest = ?', (time.time() - 10 * 86400, '0123')
+        )
+
+    main(['prune', str(tmp_path), '--unused-days', '5'])
+    assert sorted(path.name for path in tmp_path.glob('mock-*')) == ['mock-label-4567']
+
+    main(['report', str(tmp_path)])
+    assert '1 results' in capsys.readouterr().out
+
+
+def test_split_result_dir_name():
+    """Test that the hash algorithm and digest are parsed from result directory names."""
+    assert split_result_dir_name('mock-diff-broken-0123', 'diff-broken') == ('md5', '0123')
+    assert split_result_dir_name('mock-diff-blake2b-tree-0123', 'diff') == ('blake2b-tree', '0123')
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Test the semaphore limiting the cores used by concurrently running actual codes.
+"""
+import time
+import threading
+
+from aiida_testing._mock_code._limiter import ExecutionSlots
+
+
+def test_execution_slots(tmp_path):
+    """Test that codes wait until enough slots are free, and weights are capped by the capacity."""
+    heavy = ExecutionSlots(2, weight=4, slots_dir=tmp_path)
+    assert heavy.weight == 2
+    assert heavy.acquire() < 1
+
+    light = ExecutionSlots(2, weight=1, slots_dir=tmp_path)
+    acquired = threading.Event()
+
+    def _acquire():
+        light.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=_acquire)
+    thread.start()
+    time.sleep(0.5)
+    assert not acquired.is_set()
+
+    heavy.release()
+    thread.join(timeout=5)
+    assert acquired.is_set()
+    with ExecutionSlots(2, weight=1, slots_dir=tmp_path):
+        pass
+    light.release()
+
+
+def test_unlimited(tmp_path):
+    """Test that a capacity of zero does not limit the running codes."""
+    slots = ExecutionSlots(0, weight=4, slots_dir=tmp_path / 'slots')
+    assert slots.acquire() == 0
+    assert not (tmp_path / 'slots').exists()
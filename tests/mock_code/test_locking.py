@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Test that concurrent mock code runs with the same inputs record the result once.
+"""
+import os
+import sys
+import json
+import fcntl
+import socket
+import subprocess
+
+import pytest
+
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._locking import EntryLock, LockTimeoutError
+
+SUBMIT_CONTENT = "#!/bin/bash\n'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'\n"
+
+MOCK_CODE_SCRIPT = 'from aiida_testing._mock_code._cli import main; main()'
+
+EXECUTABLE_CONTENT = """#!/bin/bash
+echo run >> {counter}
+sleep 1
+cat
+"""
+
+
+def test_single_flight(tmp_path):
+    """
+    Test that of several processes missing the same result, only one runs
+    the executable, and the others wait and restore its result.
+    """
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    executable = tmp_path / 'code.sh'
+    executable.write_text(EXECUTABLE_CONTENT.format(counter=tmp_path / 'counter'))
+    executable.chmod(0o755)
+    log_file = tmp_path / 'mock.log'
+
+    env = dict(os.environ)
+    env.update({
+        EnvKeys.LABEL.value: 'label',
+        EnvKeys.DATA_DIR.value: str(data_dir),
+        EnvKeys.EXECUTABLE_PATH.value: str(executable),
+        EnvKeys.IGNORE_FILES.value: '_aiidasubmit.sh',
+        EnvKeys.IGNORE_PATHS.value: '',
+        EnvKeys.REGENERATE_DATA.value: 'False',
+        EnvKeys.LOG_FILE.value: str(log_file),
+    })
+    processes = []
+    for idx in range(3):
+        sandbox = tmp_path / f'sandbox{idx}'
+        sandbox.mkdir()
+        (sandbox / '_aiidasubmit.sh').write_text(SUBMIT_CONTENT)
+        (sandbox / 'aiida.in').write_text('input')
+        processes.append(
+            subprocess.Popen([sys.executable, '-c', MOCK_CODE_SCRIPT], cwd=sandbox, env=env)
+        )
+    assert [process.wait() for process in processes] == [0, 0, 0]
+
+    assert (tmp_path / 'counter').read_text() == 'run\n'
+    for idx in range(3):
+        assert (tmp_path / f'sandbox{idx}' / 'aiida.out').read_text() == 'input'
+    log = log_file.read_text()
+    assert log.count('Recording') == 1
+    assert log.count('Waiting for') == 2
+    assert log.count('recorded by another process') == 2
+
+
+def _hold_lock(lock_path, pid):
+    """Acquire the lock file as if it was held by the process ``pid``."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    os.write(fd, json.dumps({'pid': pid, 'host': socket.gethostname()}).encode())
+    return fd
+
+
+def test_lock_timeout(tmp_path):
+    """Test that waiting for a lock held by a running process times out."""
+    fd = _hold_lock(tmp_path / 'locks' / 'mock-label-digest.lock', os.getpid())
+    try:
+        with pytest.raises(LockTimeoutError):
+            EntryLock(tmp_path, 'mock-label-digest', timeout=0.3,
+                      locks_dir=tmp_path / 'locks').acquire()
+    finally:
+        os.close(fd)
+
+
+def test_stale_lock(tmp_path):
+    """Test that a lock held on behalf of a process which no longer exists is broken."""
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    fd = _hold_lock(tmp_path / 'locks' / 'mock-label-digest.lock', process.pid)
+    try:
+        lock = EntryLock(tmp_path, 'mock-label-digest', timeout=5, locks_dir=tmp_path / 'locks')
+        assert lock.acquire()
+        lock.release()
+    finally:
+        os.close(fd)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Test packing and unpacking of data directories.
+"""
+from pathlib import Path
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._cli import main, restore_files
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._pack import PackFile, PACK_INDEX_FILE
+from aiida_testing._mock_code._rehash import verify_data_dir
+from aiida_testing._mock_code._storage import INPUTS_DIR, read_manifest
+
+OUTPUT_PATHS = (
+    Path('_scheduler-stderr.txt'),
+    Path('aiida.out'),
+    Path('out/data.xml'),
+)
+
+
+def _make_data_dir(data_dir):
+    for label in ('first', 'second'):
+        for path in OUTPUT_PATHS:
+            file_path = data_dir / f'mock-{label}-0123' / path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_text(f'{label} {path.name}' if path.name == 'aiida.out' else path.name)
+    (data_dir / 'mock-first-alias').symlink_to('mock-first-0123')
+
+
+def test_pack_roundtrip(tmp_path, capsys):
+    """Test that packed results can be restored, and unpacked into result directories."""
+    data_dir = tmp_path / 'data'
+    _make_data_dir(data_dir)
+    main(['pack', str(data_dir)])
+    assert 'Packed 2 result directories' in capsys.readouterr().out
+    assert not list(data_dir.glob('mock-*'))
+
+    with PackFile(data_dir) as pack:
+        assert 'mock-first-0123' in pack
+        assert 'mock-first-alias' in pack
+        assert 'mock-third-0123' not in pack
+        dest_dir = tmp_path / 'restored'
+        dest_dir.mkdir()
+        restore_files(res_dir=data_dir / 'mock-first-alias', dest_dir=dest_dir, pack=pack)
+    assert (dest_dir / 'aiida.out').read_text() == 'first aiida.out'
+    assert (dest_dir / 'out' / 'data.xml').read_text() == 'data.xml'
+
+    # re-packing keeps the packed results
+    main(['pack', str(data_dir)])
+    main(['unpack', str(data_dir)])
+    assert not (data_dir / PACK_INDEX_FILE).exists()
+    assert sorted(path.name for path in data_dir.iterdir()) == \
+        ['mock-first-0123', 'mock-first-alias', 'mock-second-0123']
+    assert (data_dir / 'mock-second-0123' / 'aiida.out').read_text() == 'second aiida.out'
+    assert (data_dir / 'mock-first-alias' / 'out' / 'data.xml').read_text() == 'data.xml'
+
+
+def test_pack_roundtrip_manifest(tmp_path, monkeypatch):
+    """Test that the manifests and stored inputs of the results survive packing and unpacking."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for key, value in (
+        (EnvKeys.LABEL, 'cat'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, 'cat'),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+        (EnvKeys.STORE_INPUTS, 'True'),
+        (EnvKeys.RECORD_RUNTIME, 'True'),
+        (EnvKeys.RETRIEVE_ONLY, 'True'),
+        (EnvKeys.RETRIEVE_PATTERNS, 'aiida.out'),
+    ):
+        monkeypatch.setenv(key.value, value)
+    sandbox = tmp_path / 'sandbox'
+    sandbox.mkdir()
+    (sandbox / '_aiidasubmit.sh'
+     ).write_text("#!/bin/bash\n'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'\n")
+    (sandbox / 'aiida.in').write_text('input')
+    monkeypatch.chdir(sandbox)
+    _cli.run()
+    monkeypatch.delenv(EnvKeys.LABEL.value)
+
+    res_dir, = data_dir.glob('mock-cat-*')
+    manifest = read_manifest(res_dir)
+    assert {'runtime', 'retrieve', 'input_digests', 'inputs'} <= set(manifest)
+    main(['pack', str(data_dir)])
+    main(['unpack', str(data_dir)])
+    assert read_manifest(res_dir) == manifest
+    assert (res_dir / INPUTS_DIR / 'aiida.in').read_text() == 'input'
+    assert verify_data_dir(data_dir) == {}
+
+
+def test_pack_index_lookup(tmp_path):
+    """Test that all results and objects are found in the sorted tables of the index."""
+    names = [f'mock-label-{number:04x}' for number in range(50)]
+    for name in names:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'aiida.out').write_text(name)
+    main(['pack', str(tmp_path)])
+    with PackFile(tmp_path) as pack:
+        assert pack.entry_names() == names
+        for name in names:
+            digest = pack.get_files(name)['aiida.out']['digest']
+            assert b''.join(pack.iter_chunks(digest)).decode() == name
+        assert 'mock-label-0032' not in pack
+        assert len(pack.get_objects()) == len(names)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Test computing the keys of results again from their stored inputs.
+"""
+import os
+
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._pack import PackFile, pack_data_dir
+from aiida_testing._mock_code._storage import INPUTS_DIR, read_manifest
+from aiida_testing._mock_code._rehash import rehash_data_dir, verify_data_dir
+
+SUBMIT_CONTENT = """#!/bin/bash
+export AIIDA_MOCK_LABEL=cat
+'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'
+"""
+
+
+@pytest.fixture
+def recorded_data_dir(tmp_path, monkeypatch):
+    """Record a result with stored inputs, and return the data directory."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for key, value in (
+        (EnvKeys.LABEL, 'cat'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, 'cat'),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+        (EnvKeys.STORE_INPUTS, 'True'),
+    ):
+        monkeypatch.setenv(key.value, value)
+    sandbox = tmp_path / 'sandbox'
+    (sandbox / '.aiida').mkdir(parents=True)
+    (sandbox / '.aiida' / 'calcinfo.json').write_text('{}')
+    (sandbox / '_aiidasubmit.sh').write_text(SUBMIT_CONTENT)
+    (sandbox / 'aiida.in').write_text('input')
+    monkeypatch.chdir(sandbox)
+    _cli.run()
+    monkeypatch.chdir(tmp_path)
+    return data_dir
+
+
+def test_store_inputs(recorded_data_dir):  # pylint: disable=redefined-outer-name
+    """Test that the inputs are stored normalized, and are not restored."""
+    res_dir, = recorded_data_dir.glob('mock-cat-*')
+    assert sorted(read_manifest(res_dir)['inputs']['files']) == ['_aiidasubmit.sh', 'aiida.in']
+    assert 'AIIDA_MOCK' not in (res_dir / INPUTS_DIR / '_aiidasubmit.sh').read_text()
+    assert verify_data_dir(recorded_data_dir) == {}
+
+    restored = recorded_data_dir.parent / 'restored'
+    restored.mkdir()
+    _cli.restore_files(res_dir, restored)
+    assert sorted(os.listdir(restored)) == ['aiida.in', 'aiida.out']
+
+
+@pytest.mark.parametrize('rename', [False, True])
+def test_rehash(recorded_data_dir, rename):  # pylint: disable=redefined-outer-name
+    """Test that results are made available under the keys of another hash algorithm."""
+    res_dir, = recorded_data_dir.glob('mock-cat-*')
+    renamed = rehash_data_dir(
+        recorded_data_dir, hash_algorithm='sha256', rename=rename, max_workers=2
+    )
+
+    new_dir = recorded_data_dir / renamed[res_dir.name]
+    assert new_dir.name.startswith('mock-cat-sha256-')
+    assert new_dir.is_symlink() != rename
+    assert res_dir.exists() != rename
+    assert (new_dir / 'aiida.out').read_text() == 'input'
+    assert verify_data_dir(recorded_data_dir, max_workers=2) == {}
+    # the keys are up to date
+    assert rehash_data_dir(recorded_data_dir, hash_algorithm='sha256') == {}
+
+
+def test_verify(recorded_data_dir):  # pylint: disable=redefined-outer-name
+    """Test that results whose stored inputs do not match their name are reported."""
+    res_dir, = recorded_data_dir.glob('mock-cat-*')
+    (res_dir / 'aiida.out').write_text('modified')
+    (res_dir / INPUTS_DIR / 'aiida.in').write_text('modified')
+    assert verify_data_dir(recorded_data_dir) == {
+        res_dir.name:
+        ["'aiida.out' does not match its digest", "input 'aiida.in' does not match its digest"]
+    }
+
+
+@pytest.mark.parametrize('rename', [False, True])
+def test_rehash_packed(recorded_data_dir, rename):  # pylint: disable=redefined-outer-name
+    """Test that the stored inputs are packed, such that packed results can be rehashed and verified."""
+    res_dir, = recorded_data_dir.glob('mock-cat-*')
+    pack_data_dir(recorded_data_dir)
+    assert not res_dir.exists()
+    assert verify_data_dir(recorded_data_dir) == {}
+
+    renamed = rehash_data_dir(recorded_data_dir, hash_algorithm='sha256', rename=rename)
+    assert renamed[res_dir.name].startswith('mock-cat-sha256-')
+    with PackFile(recorded_data_dir) as pack:
+        assert renamed[res_dir.name] in pack
+        assert (res_dir.name in pack) != rename
+    assert verify_data_dir(recorded_data_dir) == {}
+    assert rehash_data_dir(recorded_data_dir, hash_algorithm='sha256') == {}
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Test recording and restoring only the output files retrieved by AiiDA.
+"""
+import json
+
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._cli import restore_files, get_retrieve_patterns
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._pack import PackFile, pack_data_dir
+from aiida_testing._mock_code._storage import read_manifest
+
+SUBMIT_CONTENT = (
+    "#!/bin/bash\n"
+    "mkdir -p out scratch\n"
+    "'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'\n"
+    "cp aiida.in out/data.xml\n"
+    "cp aiida.in scratch/wavefunctions.dat\n"
+    "cp aiida.in charge-density.dat\n"
+)
+
+CALCINFO = {
+    'retrieve_list': ['aiida.out', ['out/*.xml', '.', 2], '_scheduler-stdout.txt'],
+    'retrieve_temporary_list': ['aiida.out'],
+}
+
+RETRIEVED_FILES = ['aiida.out', 'out/data.xml']
+
+
+def _run_mock_code(sandbox, monkeypatch, data_dir, retrieve_patterns=''):
+    """Run a mock code running ``cat``, which only records the retrieved files."""
+    sandbox.mkdir()
+    (sandbox / '_aiidasubmit.sh').write_text(SUBMIT_CONTENT)
+    (sandbox / 'aiida.in').write_text('input')
+    (sandbox / '.aiida').mkdir()
+    (sandbox / '.aiida' / 'calcinfo.json').write_text(json.dumps(CALCINFO))
+    for key, value in (
+        (EnvKeys.LABEL, 'cat'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, 'cat'),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+        (EnvKeys.RETRIEVE_ONLY, 'True'),
+        (EnvKeys.RETRIEVE_PATTERNS, retrieve_patterns),
+    ):
+        monkeypatch.setenv(key.value, value)
+    monkeypatch.chdir(sandbox)
+    _cli.run()
+
+
+def _list_files(directory):
+    return sorted(
+        path.relative_to(directory).as_posix() for path in directory.glob('**/*')
+        if path.is_file() and not path.relative_to(directory).as_posix().startswith('.')
+    )
+
+
+def test_get_retrieve_patterns(tmp_path):
+    """Test that the patterns are read from the calculation, unless given explicitly."""
+    (tmp_path / '.aiida').mkdir()
+    (tmp_path / '.aiida' / 'calcinfo.json').write_text(json.dumps(CALCINFO))
+    env = {EnvKeys.RETRIEVE_ONLY.value: 'True'}
+    assert get_retrieve_patterns(env, tmp_path) == \
+        ['aiida.out', 'out/*.xml', '_scheduler-stdout.txt']
+    assert get_retrieve_patterns({
+        **env, EnvKeys.RETRIEVE_PATTERNS.value: 'a:b/*'
+    }, tmp_path) == ['a', 'b/*']
+    assert get_retrieve_patterns({}, tmp_path) is None
+    assert get_retrieve_patterns(env, tmp_path / 'missing') is None
+
+
+def test_record_retrieved(tmp_path, monkeypatch):
+    """Test that only the retrieved files are recorded and restored, and that the result notes them."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _run_mock_code(tmp_path / 'recorded', monkeypatch, data_dir)
+    res_dir, = data_dir.glob('mock-cat-*')
+    assert _list_files(res_dir) == RETRIEVED_FILES
+    assert read_manifest(res_dir)['retrieve'] == ['aiida.out', 'out/*.xml', '_scheduler-stdout.txt']
+
+    _run_mock_code(tmp_path / 'restored', monkeypatch, data_dir)
+    assert (tmp_path / 'restored' / 'out' / 'data.xml').read_text() == 'input'
+    assert not (tmp_path / 'restored' / 'charge-density.dat').exists()
+
+    pack_data_dir(data_dir)
+    with PackFile(data_dir) as pack:
+        assert pack.get_retrieve_patterns(res_dir.name) == \
+            ['aiida.out', 'out/*.xml', '_scheduler-stdout.txt']
+        assert sorted(pack.get_files(res_dir.name)) == RETRIEVED_FILES
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_restore_retrieved(tmp_path, monkeypatch, packed):
+    """Test that only the files matching the patterns are restored from a result holding all files."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _run_mock_code(tmp_path / 'recorded', monkeypatch, data_dir, retrieve_patterns='*:*/*')
+    res_dir, = data_dir.glob('mock-cat-*')
+    assert len(_list_files(res_dir)) == 5
+
+    pack = None
+    if packed:
+        pack_data_dir(data_dir)
+        pack = PackFile(data_dir)
+    dest_dir = tmp_path / 'restored'
+    dest_dir.mkdir()
+    restore_files(res_dir, dest_dir, pack=pack, retrieve_patterns=['aiida.out', 'out'])
+    assert _list_files(dest_dir) == RETRIEVED_FILES
+    if pack is not None:
+        pack.close()
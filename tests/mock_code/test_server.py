@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Test the resident mock code server.
+"""
+import sys
+import time
+import subprocess
+
+import pytest
+
+from aiida_testing._mock_code._hashing import get_hash
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._server import request_run
+from aiida_testing._mock_code._main import main
+
+
+@pytest.fixture
+def server_socket(tmp_path_factory):
+    """Start the mock code server, and yield the path of its socket."""
+    socket_path = tmp_path_factory.mktemp('server') / 'mock-code.sock'
+    process = subprocess.Popen([
+        sys.executable, '-m', 'aiida_testing._mock_code._server',
+        str(socket_path)
+    ])
+    for _ in range(200):
+        if socket_path.exists():
+            break
+        time.sleep(0.05)
+    yield str(socket_path)
+    process.terminate()
+    process.wait()
+    assert not socket_path.exists()
+
+
+def test_server_restores_results(server_socket, tmp_path, monkeypatch):  # pylint: disable=redefined-outer-name
+    """Test that the server restores existing results into the working directory of the client."""
+    sandbox = tmp_path / 'sandbox'
+    sandbox.mkdir()
+    (sandbox / 'aiida.in').write_text('input')
+    monkeypatch.chdir(sandbox)
+
+    data_dir = tmp_path / 'data'
+    res_dir = data_dir / f'mock-label-{get_hash().hexdigest()}'
+    res_dir.mkdir(parents=True)
+    (res_dir / 'aiida.out').write_text('output')
+
+    for key, value in (
+        (EnvKeys.LABEL, 'label'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, ''),
+        (EnvKeys.IGNORE_FILES, ''),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+    ):
+        monkeypatch.setenv(key.value, value)
+
+    assert request_run(server_socket) == 0
+    assert (sandbox / 'aiida.out').read_text() == 'output'
+
+    # missing results, and no executable
+    (sandbox / 'aiida.in').write_text('other input')
+    assert request_run(server_socket) == 1
+
+    # the entry point of the executable delegates to the server
+    (sandbox / 'aiida.in').write_text('input')
+    (sandbox / 'aiida.out').unlink()
+    monkeypatch.setenv(EnvKeys.SERVER_SOCKET.value, server_socket)
+    with pytest.raises(SystemExit) as exc_info:
+        main()
+    assert exc_info.value.code == 0
+    assert (sandbox / 'aiida.out').read_text() == 'output'
+
+
+def test_server_not_running(tmp_path):
+    """Test that the client reports a server that is not running."""
+    assert request_run(str(tmp_path / 'mock-code.sock')) is None
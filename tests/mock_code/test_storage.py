@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Test the storage layouts of the mock code results.
+"""
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._cli import copy_files, restore_files
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._storage import (
+    StorageLayout, ObjectStore, OBJECTS_DIR, MANIFEST_FILE, QUARANTINE_DIR, TEMPORARY_DIR_PREFIX,
+    read_manifest, verify_result_dir, quarantine_result_dir
+)
+
+OUTPUT_PATHS = (
+    Path('_scheduler-stderr.txt'),
+    Path('aiida.out'),
+    Path('out/data.xml'),
+)
+
+
+def _write_outputs(directory, content):
+    for path in OUTPUT_PATHS:
+        (directory / path).parent.mkdir(parents=True, exist_ok=True)
+        (directory / path).write_text(f'{content} {path.name}')
+    os.chmod(directory / 'aiida.out', 0o600)
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_cas_roundtrip(tmp_path, max_workers):
+    """Test that outputs stored in the object store are restored, and identical files are stored once."""
+    data_dir = tmp_path / 'data'
+    for label in ('first', 'second'):
+        run_dir = tmp_path / f'run-{label}'
+        _write_outputs(run_dir, 'Test content')
+        copy_files(
+            src_dir=run_dir,
+            dest_dir=data_dir / f'mock-{label}',
+            ignore_files=(),
+            ignore_paths=('_scheduler-stderr.txt', ),
+            object_store=ObjectStore(data_dir),
+            max_workers=max_workers
+        )
+        assert [path.name for path in (data_dir / f'mock-{label}').iterdir()] == [MANIFEST_FILE]
+
+    assert len(list((data_dir / OBJECTS_DIR).glob('*/*'))) == 2
+
+    dest_dir = tmp_path / 'restored'
+    (dest_dir / 'out').mkdir(parents=True)
+    (dest_dir / 'out' / 'stale.txt').write_text('')
+    restore_files(res_dir=data_dir / 'mock-second', dest_dir=dest_dir, max_workers=max_workers)
+    assert sorted(path.relative_to(dest_dir).as_posix() for path in dest_dir.glob('**/*')) == \
+        ['aiida.out', 'out', 'out/data.xml']
+    assert (dest_dir / 'out' / 'data.xml').read_text() == 'Test content data.xml'
+    assert stat.S_IMODE((dest_dir / 'aiida.out').stat().st_mode) == 0o600
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_directory_restore(tmp_path, max_workers):
+    """Test that outputs stored as plain files are restored."""
+    res_dir = tmp_path / 'mock-label'
+    _write_outputs(res_dir, 'Test content')
+    dest_dir = tmp_path / 'restored'
+    dest_dir.mkdir()
+    restore_files(res_dir=res_dir, dest_dir=dest_dir, max_workers=max_workers)
+    assert (dest_dir / 'out' / 'data.xml').read_text() == 'Test content data.xml'
+
+
+@pytest.mark.parametrize('storage_layout', list(StorageLayout))
+def test_verify_result_dir(tmp_path, storage_layout):
+    """Test that missing or modified files of a result are detected, and the result quarantined."""
+    run_dir = tmp_path / 'run'
+    _write_outputs(run_dir, 'Test content')
+    data_dir = tmp_path / 'data'
+    res_dir = data_dir / 'mock-label'
+    copy_files(
+        src_dir=run_dir,
+        dest_dir=res_dir,
+        ignore_files=(),
+        ignore_paths=(),
+        object_store=ObjectStore(data_dir) if storage_layout == StorageLayout.CAS else None
+    )
+    assert read_manifest(res_dir)['layout'] == storage_layout.value
+    assert verify_result_dir(res_dir) == []
+
+    if storage_layout == StorageLayout.CAS:
+        digest = read_manifest(res_dir)['files']['out/data.xml']['digest']
+        ObjectStore(data_dir).get_path(digest).unlink()
+    else:
+        (res_dir / 'out' / 'data.xml').unlink()
+        (res_dir / 'aiida.out').write_text('Truncated')
+    assert len(verify_result_dir(res_dir)) == (1 if storage_layout == StorageLayout.CAS else 2)
+
+    quarantined = quarantine_result_dir(res_dir)
+    assert not res_dir.exists()
+    assert quarantined.parent == data_dir / QUARANTINE_DIR
+
+
+def test_interrupted_recording(tmp_path, monkeypatch):
+    """Test that a recording which fails while storing the outputs does not leave a result behind."""
+    sandbox = tmp_path / 'sandbox'
+    sandbox.mkdir()
+    (sandbox /
+     '_aiidasubmit.sh').write_text("#!/bin/bash\n'/path/to/aiida-mock-code' > 'aiida.out'\n")
+    monkeypatch.chdir(sandbox)
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for key, value in (
+        (EnvKeys.LABEL, 'label'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, 'true'),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+    ):
+        monkeypatch.setenv(key.value, value)
+
+    def _fail(src, dest):
+        raise OSError('No space left on device')
+
+    with monkeypatch.context() as context:
+        context.setattr(_cli, 'store_file', _fail)
+        with pytest.raises(OSError):
+            _cli.run()
+    assert not list(data_dir.iterdir())
+
+    _cli.run()
+    res_dirs = list(data_dir.glob('mock-label-*'))
+    assert len(res_dirs) == 1
+    assert verify_result_dir(res_dirs[0]) == []
+
+
+def test_stale_temporary_dirs(tmp_path, monkeypatch):
+    """Test that the temporary directories of killed recordings are removed, and that the runtime is opt-in."""
+    submit_content = "#!/bin/bash\n'/path/to/aiida-mock-code' > 'aiida.out'\n"
+    sandbox = tmp_path / 'sandbox'
+    sandbox.mkdir()
+    (sandbox / '_aiidasubmit.sh').write_text(submit_content)
+    monkeypatch.chdir(sandbox)
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for key, value in (
+        (EnvKeys.LABEL, 'label'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, 'true'),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+    ):
+        monkeypatch.setenv(key.value, value)
+    _cli.run()
+    res_dir, = data_dir.glob('mock-label-*')
+    assert 'runtime' not in read_manifest(res_dir)
+
+    stale_dirs = [
+        data_dir / f'{TEMPORARY_DIR_PREFIX}{entry_name}-{32 * "0"}'
+        for entry_name in (res_dir.name, 'mock-label-0123')
+    ]
+    for path in stale_dirs:
+        path.mkdir()
+        (path / 'aiida.out').write_text('')
+    monkeypatch.setenv(EnvKeys.REGENERATE_DATA.value, 'True')
+    monkeypatch.setenv(EnvKeys.RECORD_RUNTIME.value, 'True')
+    (sandbox / '_aiidasubmit.sh').write_text(submit_content)
+    (sandbox / 'aiida.out').unlink()
+    _cli.run()
+    assert read_manifest(res_dir)['runtime'] >= 0
+    assert not stale_dirs[0].exists()
+    assert stale_dirs[1].exists()
+
+    monkeypatch.delenv(EnvKeys.LABEL.value)
+    _cli.main(['prune', str(data_dir), '--unused-days', '1'])
+    assert not stale_dirs[1].exists()
+    assert res_dir.is_dir()
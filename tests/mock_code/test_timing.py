@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Test the timing of the phases of mock code runs.
+"""
+import time
+
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._timing import PhaseTimer, read_timings, summarize_timings
+
+SUBMIT_CONTENT = "#!/bin/bash\n'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'\n"
+
+
+def test_nested_phases():
+    """Test that the time of nested phases is not counted for the outer phase."""
+    timer = PhaseTimer()
+    with timer.phase('outer'):
+        time.sleep(0.05)
+        with timer.phase('inner'):
+            time.sleep(0.1)
+        with timer.phase('inner'):
+            time.sleep(0.1)
+    assert 0.2 <= timer.phases['inner'] < 0.3
+    assert 0.05 <= timer.phases['outer'] < 0.15
+
+
+def test_timings_file(tmp_path, monkeypatch):
+    """Test that recording and restoring a result each append their timings."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    timings_file = tmp_path / 'timings.jsonl'
+    for key, value in (
+        (EnvKeys.LABEL, 'cat'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, 'cat'),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+        (EnvKeys.TIMINGS_FILE, str(timings_file)),
+        (EnvKeys.RECORD_RUNTIME, 'True'),
+    ):
+        monkeypatch.setenv(key.value, value)
+    for name in ('recorded', 'restored'):
+        sandbox = tmp_path / name
+        sandbox.mkdir()
+        (sandbox / '_aiidasubmit.sh').write_text(SUBMIT_CONTENT)
+        (sandbox / 'aiida.in').write_text('input')
+        monkeypatch.chdir(sandbox)
+        _cli.run()
+
+    recorded, restored = read_timings(timings_file)
+    assert recorded['outcome'] == 'recorded'
+    assert {'env', 'lookup', 'hash', 'lock', 'execute', 'store'} <= set(recorded['phases'])
+    assert recorded['execute_cpu'] >= 0
+    assert restored['outcome'] == 'restored'
+    assert {'env', 'lookup', 'hash', 'restore'} <= set(restored['phases'])
+    assert 'execute' not in restored['phases']
+    assert restored['recorded_runtime'] == pytest.approx(recorded['phases']['execute'], abs=0.01)
+    for timings in (recorded, restored):
+        assert timings['label'] == 'cat'
+        # the outputs are aiida.in and aiida.out
+        assert timings['bytes'] == 10
+        assert sum(timings['phases'].values()) <= timings['total']
+
+
+def test_summarize_timings():
+    """Test the aggregation of the timings of several runs."""
+    timings = [
+        {
+            'label': 'a',
+            'outcome': 'restored',
+            'total': 1.,
+            'recorded_runtime': 10.,
+            'phases': {}
+        },
+        {
+            'label': 'a',
+            'outcome': 'restored',
+            'total': 1.,
+            'phases': {}
+        },
+        {
+            'label': 'b',
+            'outcome': 'recorded',
+            'total': 5.,
+            'phases': {
+                'execute': 4.
+            }
+        },
+        {
+            'label': 'b',
+            'outcome': 'recorded',
+            'regenerate': True,
+            'total': 3.,
+            'phases': {
+                'execute': 2.
+            }
+        },
+        {
+            'label': 'c',
+            'outcome': 'missing',
+            'total': 0.5,
+            'phases': {}
+        },
+    ]
+    summary = summarize_timings(timings, slowest=2)
+    assert {key: summary[key]
+            for key in ('runs', 'hits', 'misses', 'regenerations')} == {
+                'runs': 5,
+                'hits': 2,
+                'misses': 2,
+                'regenerations': 1
+            }
+    assert summary['overhead'] == pytest.approx(4.5)
+    assert summary['execute'] == pytest.approx(6.)
+    assert summary['time_saved'] == pytest.approx(10.)
+    assert summary['slowest_labels'] == [
+        {
+            'label': 'b',
+            'runs': 2,
+            'total': 8.,
+            'overhead': 2.
+        },
+        {
+            'label': 'a',
+            'runs': 2,
+            'total': 2.,
+            'overhead': 2.
+        },
+    ]
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Test the transfer of stored output files.
+"""
+import os
+import time
+import hashlib
+
+import pytest
+
+from aiida_testing._mock_code._transfer import RestoreMode, transfer_file, create_dirs, run_transfers
+
+
+@pytest.mark.parametrize('restore_mode', list(RestoreMode))
+def test_transfer_file(tmp_path, restore_mode):
+    """Test that the file content is transferred in all restore modes."""
+    src = tmp_path / 'stored.txt'
+    src.write_text('Test content')
+    dest = tmp_path / 'restored.txt'
+    dest.write_text('Stale content')
+
+    transfer_file(src, dest, restore_mode=restore_mode)
+    assert dest.read_text() == 'Test content'
+    if restore_mode == RestoreMode.LINK and os.path.samefile(src, dest):
+        # hard links are guarded against modification of the stored file
+        assert not src.stat().st_mode & 0o222
+
+
+def test_link_read_only(tmp_path):
+    """Test that only read-only stored files are hard linked, and the stored files are not modified."""
+    src = tmp_path / 'stored.txt'
+    src.write_text('Test content')
+    src_mode = src.stat().st_mode
+    dest = tmp_path / 'restored.txt'
+
+    transfer_file(src, dest, restore_mode=RestoreMode.LINK)
+    assert dest.read_text() == 'Test content'
+    assert src.stat().st_mode == src_mode
+    assert not os.path.samefile(src, dest)
+
+    src.chmod(0o444)
+    transfer_file(src, dest, restore_mode=RestoreMode.LINK)
+    assert dest.read_text() == 'Test content'
+    assert src.stat().st_mode & 0o777 == 0o444
+
+
+def test_skip_identical(tmp_path, monkeypatch):
+    """Test that files with identical content are not transferred again."""
+    src = tmp_path / 'stored.txt'
+    src.write_text('Test content')
+    dest = tmp_path / 'restored.txt'
+    dest.write_text('Test content')
+    digest = hashlib.sha256(b'Test content').hexdigest()
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('file should not be copied')
+
+    monkeypatch.setattr('shutil.copyfile', _fail)
+    transfer_file(src, dest, digest=digest)
+
+    dest.write_text('Test_content')
+    with pytest.raises(AssertionError):
+        transfer_file(src, dest, digest=digest)
+
+
+def test_run_transfers_first_error(tmp_path):
+    """
+    Test that parallel transfers return their results in order, and raise
+    the error of the first failing task even if a later task fails first.
+    """
+    create_dirs([tmp_path / 'a' / 'b', tmp_path / 'a'])
+    assert (tmp_path / 'a' / 'b').is_dir()
+
+    def _task(idx, delay=0., error=False):
+        def _run():
+            time.sleep(delay)
+            if error:
+                raise OSError(f'task {idx}')
+            return idx
+
+        return _run
+
+    assert run_transfers([_task(idx) for idx in range(10)], max_workers=4) == list(range(10))
+
+    tasks = [_task(0), _task(1, delay=0.2, error=True), _task(2, error=True), _task(3)]
+    for max_workers in (1, 4):
+        with pytest.raises(OSError, match='task 1'):
+            run_transfers(tasks, max_workers=max_workers)
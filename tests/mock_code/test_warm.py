@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Test queueing the inputs of missing results, and recording them with ``aiida-mock-code warm``.
+"""
+import pytest
+
+from aiida_testing._mock_code import _cli
+from aiida_testing._mock_code._env_keys import EnvKeys
+from aiida_testing._mock_code._warm import get_pending_entries
+
+SUBMIT_CONTENT = "#!/bin/bash\n'/path/to/aiida-mock-code' < 'aiida.in' > 'aiida.out'\n"
+
+
+def _run_mock_code(sandbox, monkeypatch, content):
+    """Run the mock code on the given input, without an executable."""
+    sandbox.mkdir()
+    (sandbox / '_aiidasubmit.sh').write_text(SUBMIT_CONTENT)
+    (sandbox / 'aiida.in').write_text(content)
+    monkeypatch.chdir(sandbox)
+    _cli.run()
+
+
+def _set_mock_code_env(monkeypatch, data_dir):
+    """Set the environment of a mock code without executable, which queues missing results."""
+    for key, value in (
+        (EnvKeys.LABEL, 'cat'),
+        (EnvKeys.DATA_DIR, str(data_dir)),
+        (EnvKeys.EXECUTABLE_PATH, ''),
+        (EnvKeys.IGNORE_FILES, '_aiidasubmit.sh'),
+        (EnvKeys.IGNORE_PATHS, ''),
+        (EnvKeys.REGENERATE_DATA, 'False'),
+        (EnvKeys.QUEUE_MISSES, 'True'),
+    ):
+        monkeypatch.setenv(key.value, value)
+
+
+def test_warm(tmp_path, monkeypatch):
+    """Test that queued inputs are recorded by the executables from the configuration file."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    _set_mock_code_env(monkeypatch, data_dir)
+    for idx in range(3):
+        with pytest.raises(SystemExit, match='queued'):
+            _run_mock_code(tmp_path / f'sandbox{idx}', monkeypatch, f'input {idx}')
+    assert len(get_pending_entries(data_dir)) == 3
+
+    # the maintenance commands are only available outside of calculations
+    for key in EnvKeys:
+        monkeypatch.delenv(key.value, raising=False)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / '.aiida-testing-config.yml').write_text('mock_code:\n  cat: cat\n  other: ""\n')
+    _cli.main(['warm', str(data_dir), '--jobs', '2'])
+    assert get_pending_entries(data_dir) == []
+    assert len(list(data_dir.glob('mock-cat-*'))) == 3
+
+    _set_mock_code_env(monkeypatch, data_dir)
+    _run_mock_code(tmp_path / 'restored', monkeypatch, 'input 1')
+    assert (tmp_path / 'restored' / 'aiida.out').read_text() == 'input 1'